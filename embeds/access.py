@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from urllib.parse import urlparse
+
+from django.http import HttpRequest
+
+from plants.identity_cache import CachedIdentity
+from plants.models import UserIdentity
+
+
+def host_from_url(url: str | None) -> str:
+    if not url:
+        return ""
+    parsed = urlparse(url)
+    return (parsed.hostname or "").lower()
+
+
+def request_embed_host(request: HttpRequest) -> str:
+    # JS embeds send Origin; iframe embeds typically provide Referer.
+    return host_from_url(request.headers.get("Origin")) or host_from_url(request.headers.get("Referer"))
+
+
+def host_allowed(embed_host: str, owner_host: str) -> bool:
+    if not embed_host or not owner_host:
+        return False
+    return embed_host == owner_host or embed_host.endswith(f".{owner_host}")
+
+
+def embed_allowed(request: HttpRequest, identity: UserIdentity | CachedIdentity) -> bool:
+    viewer = request.identity
+    if viewer and viewer.id == identity.id:
+        return True
+
+    return host_allowed(request_embed_host(request), host_from_url(identity.me_url))
@@ -1,67 +1,38 @@
 from __future__ import annotations
 
-from urllib.parse import quote, urlparse
+from urllib.parse import quote
 
 from django.conf import settings
 from django.http import HttpRequest, HttpResponse, JsonResponse
-from django.shortcuts import get_object_or_404, render
+from django.shortcuts import render
 from django.views.decorators.clickjacking import xframe_options_exempt
 from django.views.decorators.http import require_GET
 
 from picks.models import Pick
-from plants.models import UserIdentity
+from plants.identity_cache import get_full_identity_or_404, get_identity_or_404
+from plants.svg_cache import ROLL_SVG_MAX_PLANTS, THUMB
+from plants.svg_storage import offloaded_svg_url, offloaded_svg_urls
 
-
-def _session_identity(request: HttpRequest) -> UserIdentity | None:
-    identity_id = request.session.get("identity_id")
-    if not identity_id:
-        return None
-    return UserIdentity.objects.filter(id=identity_id).first()
-
-
-def _host_from_url(url: str | None) -> str:
-    if not url:
-        return ""
-    parsed = urlparse(url)
-    return (parsed.hostname or "").lower()
-
-
-def _request_embed_host(request: HttpRequest) -> str:
-    # JS embeds send Origin; iframe embeds typically provide Referer.
-    return _host_from_url(request.headers.get("Origin")) or _host_from_url(request.headers.get("Referer"))
-
-
-def _host_allowed(embed_host: str, owner_host: str) -> bool:
-    if not embed_host or not owner_host:
-        return False
-    return embed_host == owner_host or embed_host.endswith(f".{owner_host}")
-
-
-def _embed_allowed(request: HttpRequest, identity: UserIdentity) -> bool:
-    viewer = _session_identity(request)
-    if viewer and viewer.id == identity.id:
-        return True
-
-    return _host_allowed(_request_embed_host(request), _host_from_url(identity.me_url))
+from .access import embed_allowed, host_allowed, host_from_url
 
 
 @require_GET
 @xframe_options_exempt
 def embed_plant_view(request: HttpRequest, username: str) -> HttpResponse:
-    identity = get_object_or_404(UserIdentity, username=username)
-    if not _embed_allowed(request, identity):
+    identity = get_full_identity_or_404(username, viewer=request.identity)
+    if not embed_allowed(request, identity):
         return HttpResponse("Forbidden: embed domain not allowed", status=403)
-    viewer = _session_identity(request)
+    viewer = request.identity
     has_picked = bool(viewer and Pick.objects.filter(picker=viewer, picked=identity).exists())
     return render(
         request,
         "embeds/embed_plant.html",
         {
             "identity": identity,
-            "identity_domain": _host_from_url(identity.me_url),
+            "identity_domain": host_from_url(identity.me_url),
             "viewer": viewer,
             "has_picked": has_picked,
-            "pick_count": Pick.objects.filter(picked=identity).count(),
+            "pick_count": identity.incoming_pick_count,
             "public_base": settings.PUBLIC_BASE_URL,
         },
     )
@@ -70,35 +41,44 @@ def embed_plant_view(request: HttpRequest, username: str) -> HttpResponse:
 @require_GET
 @xframe_options_exempt
 def embed_roll_view(request: HttpRequest, username: str) -> HttpResponse:
-    identity = get_object_or_404(UserIdentity, username=username)
-    if not _embed_allowed(request, identity):
+    identity = get_identity_or_404(username)
+    if not embed_allowed(request, identity):
         return HttpResponse("Forbidden: embed domain not allowed", status=403)
-    picks = Pick.objects.filter(picker=identity).select_related("picked").order_by("-created_at")
-    return render(request, "embeds/embed_roll.html", {"identity": identity, "picks": picks, "public_base": settings.PUBLIC_BASE_URL})
+    picks = Pick.objects.filter(picker_id=identity.id).select_related("picked").order_by("-created_at")
+    return render(request, "embeds/embed_roll.html", {
+        "identity": identity,
+        "picks": picks,
+        "public_base": settings.PUBLIC_BASE_URL,
+        # roll.svg holds the first page of picks; later ones load their own thumbs.
+        "sprite_size": ROLL_SVG_MAX_PLANTS,
+    })
 
 
 @require_GET
 def plant_json_view(request: HttpRequest, username: str) -> JsonResponse:
-    identity = get_object_or_404(UserIdentity, username=username)
+    identity = get_full_identity_or_404(username, viewer=request.identity)
     origin = request.headers.get("Origin", "")
-    if not _embed_allowed(request, identity):
+    if not embed_allowed(request, identity):
         return JsonResponse({"detail": "Forbidden: embed domain not allowed"}, status=403)
-    viewer = _session_identity(request)
+    viewer = request.identity
     has_picked = bool(viewer and Pick.objects.filter(picker=viewer, picked=identity).exists())
     response = JsonResponse(
         {
             "username": identity.username,
             "me_url": identity.me_url,
-            "identity_domain": _host_from_url(identity.me_url),
+            "identity_domain": host_from_url(identity.me_url),
             "display_name": identity.display_name,
-            "plant_svg_url": f"{settings.PUBLIC_BASE_URL}/u/{identity.username}/plant.svg",
+            "plant_svg_url": (
+                offloaded_svg_url(identity.username)
+                or f"{settings.PUBLIC_BASE_URL}/u/{identity.username}/plant.svg"
+            ),
             "profile_url": f"{settings.PUBLIC_BASE_URL}/u/{identity.username}/",
             "login_to_pick_url": f"{settings.PUBLIC_BASE_URL}/login/?next={quote(f'/u/{identity.username}/')}",
-            "pick_count": Pick.objects.filter(picked=identity).count(),
+            "pick_count": identity.incoming_pick_count,
             "has_picked": has_picked,
         }
     )
-    if origin and _host_allowed(_host_from_url(origin), _host_from_url(identity.me_url)):
+    if origin and host_allowed(host_from_url(origin), host_from_url(identity.me_url)):
         response["Access-Control-Allow-Origin"] = origin
         response["Vary"] = "Origin"
     return response
@@ -106,23 +86,32 @@ def plant_json_view(request: HttpRequest, username: str) -> JsonResponse:
 
 @require_GET
 def roll_json_view(request: HttpRequest, username: str) -> JsonResponse:
-    identity = get_object_or_404(UserIdentity, username=username)
+    identity = get_identity_or_404(username)
     origin = request.headers.get("Origin", "")
-    if not _embed_allowed(request, identity):
+    if not embed_allowed(request, identity):
         return JsonResponse({"detail": "Forbidden: embed domain not allowed"}, status=403)
+    picks = list(Pick.objects.filter(picker_id=identity.id).select_related("picked").order_by("-created_at"))
+    offloaded = offloaded_svg_urls((row.picked.username for row in picks), THUMB)
     rows = [
         {
             "username": row.picked.username,
             "me_url": row.picked.me_url,
             "display_name": row.picked.display_name,
-            "plant_svg_url": f"{settings.PUBLIC_BASE_URL}/u/{row.picked.username}/plant.svg",
+            "plant_svg_url": (
+                offloaded.get(row.picked.username)
+                or f"{settings.PUBLIC_BASE_URL}/u/{row.picked.username}/plant.svg?size=thumb"
+            ),
             "profile_url": f"{settings.PUBLIC_BASE_URL}/u/{row.picked.username}/",
             "picked_at": row.created_at.isoformat(),
         }
-        for row in Pick.objects.filter(picker=identity).select_related("picked").order_by("-created_at")
+        for row in picks
     ]
-    response = JsonResponse({"username": identity.username, "roll": rows})
-    if origin and _host_allowed(_host_from_url(origin), _host_from_url(identity.me_url)):
+    response = JsonResponse({
+        "username": identity.username,
+        "roll_svg_url": f"{settings.PUBLIC_BASE_URL}/u/{identity.username}/roll.svg",
+        "roll": rows,
+    })
+    if origin and host_allowed(host_from_url(origin), host_from_url(identity.me_url)):
         response["Access-Control-Allow-Origin"] = origin
         response["Vary"] = "Origin"
     return response
@@ -133,10 +122,10 @@ def roll_json_view(request: HttpRequest, username: str) -> JsonResponse:
 def embed_harvests_view(request: HttpRequest, username: str) -> HttpResponse:
     from harvests.models import Harvest
 
-    identity = get_object_or_404(UserIdentity, username=username)
-    if not _embed_allowed(request, identity):
+    identity = get_identity_or_404(username)
+    if not embed_allowed(request, identity):
         return HttpResponse("Forbidden: embed domain not allowed", status=403)
-    harvests = Harvest.objects.filter(identity=identity)
+    harvests = Harvest.objects.filter(identity_id=identity.id)
     return render(request, "embeds/embed_harvests.html", {"identity": identity, "harvests": harvests})
 
 
@@ -144,9 +133,9 @@ def embed_harvests_view(request: HttpRequest, username: str) -> HttpResponse:
 def harvests_json_view(request: HttpRequest, username: str) -> JsonResponse:
     from harvests.models import Harvest
 
-    identity = get_object_or_404(UserIdentity, username=username)
+    identity = get_identity_or_404(username)
     origin = request.headers.get("Origin", "")
-    if not _embed_allowed(request, identity):
+    if not embed_allowed(request, identity):
         return JsonResponse({"detail": "Forbidden: embed domain not allowed"}, status=403)
     rows = [
         {
@@ -156,10 +145,10 @@ def harvests_json_view(request: HttpRequest, username: str) -> JsonResponse:
             "tags": h.tags_list(),
             "harvested_at": h.harvested_at.isoformat(),
         }
-        for h in Harvest.objects.filter(identity=identity)
+        for h in Harvest.objects.filter(identity_id=identity.id)
     ]
     response = JsonResponse({"username": identity.username, "count": len(rows), "harvests": rows})
-    if origin and _host_allowed(_host_from_url(origin), _host_from_url(identity.me_url)):
+    if origin and host_allowed(host_from_url(origin), host_from_url(identity.me_url)):
         response["Access-Control-Allow-Origin"] = origin
         response["Vary"] = "Origin"
     return response
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import math
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, TypeVar
+
+from django.core.cache import cache
+
+T = TypeVar("T")
+
+LOCK_TIMEOUT = 30  # seconds a recompute may hold the lock before another worker takes over
+LOCK_POLL_INTERVAL = 0.05
+TTL_JITTER = 0.1  # +/- fraction applied to every timeout
+XFETCH_BETA = 1.0
+
+
+@dataclass(frozen=True, slots=True)
+class _Entry:
+    """Cached value plus what XFetch needs to decide on an early refresh."""
+
+    value: Any
+    fresh_until: float
+    compute_seconds: float
+
+
+def _lock_key(key: str) -> str:
+    return f"lock:{key}"
+
+
+def acquire_lock(key: str, timeout: int = LOCK_TIMEOUT) -> str | None:
+    """Take the single-flight lock for ``key``; returns the owner token or None."""
+    token = uuid.uuid4().hex
+    return token if cache.add(_lock_key(key), token, timeout=timeout) else None
+
+
+def release_lock(key: str, token: str) -> None:
+    lock_key = _lock_key(key)
+    if cache.get(lock_key) == token:
+        cache.delete(lock_key)
+
+
+def wait_for(key: str, timeout: float) -> Any:
+    """Poll ``key`` until another worker fills it; None if it never shows up."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            return value.value if isinstance(value, _Entry) else value
+    return None
+
+
+def jittered(timeout: int, jitter: float = TTL_JITTER) -> int:
+    """Spread expiries so keys written together do not all expire together."""
+    if timeout <= 0 or jitter <= 0:
+        return timeout
+    return max(1, round(timeout * random.uniform(1 - jitter, 1 + jitter)))
+
+
+def _should_refresh(entry: _Entry, now: float, beta: float) -> bool:
+    # XFetch: recompute early with a probability that rises as expiry nears,
+    # scaled by how long the value took to build last time.
+    if now >= entry.fresh_until:
+        return True
+    if entry.compute_seconds <= 0 or beta <= 0:
+        return False
+    return now - entry.compute_seconds * beta * math.log(1.0 - random.random()) >= entry.fresh_until
+
+
+def _store(key: str, compute: Callable[[], T], timeout: int, stale_timeout: int) -> T:
+    started = time.monotonic()
+    value = compute()
+    compute_seconds = time.monotonic() - started
+    fresh_for = jittered(timeout)
+    entry = _Entry(value, time.time() + fresh_for, compute_seconds)
+    cache.set(key, entry, timeout=fresh_for + stale_timeout)
+    return value
+
+
+def get_or_compute(
+    key: str,
+    compute: Callable[[], T],
+    timeout: int,
+    *,
+    stale_timeout: int | None = None,
+    beta: float = XFETCH_BETA,
+    lock_timeout: int = LOCK_TIMEOUT,
+) -> T:
+    """Read-through cache with single-flight recompute.
+
+    Only the worker holding the Redis lock for ``key`` runs ``compute``.
+    Everyone else keeps serving the previous value for up to ``stale_timeout``
+    seconds past expiry (default: one more ``timeout``), or, on a cold miss,
+    waits for the lock holder's result. Values written with plain
+    ``cache.set`` are treated as fresh until they expire.
+    """
+    if stale_timeout is None:
+        stale_timeout = timeout
+    entry = cache.get(key)
+    if entry is not None and not isinstance(entry, _Entry):
+        return entry
+    if entry is not None and not _should_refresh(entry, time.time(), beta):
+        return entry.value
+
+    token = acquire_lock(key, lock_timeout)
+    if token is None and entry is not None:
+        return entry.value
+    if token is None:
+        value = wait_for(key, lock_timeout)
+        if value is not None:
+            return value
+        token = acquire_lock(key, lock_timeout)
+    if token is None:
+        # The lock holder stalled and another worker took over; don't queue up again.
+        return compute()
+    try:
+        return _store(key, compute, timeout, stale_timeout)
+    finally:
+        release_lock(key, token)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+
+from django.core.cache import cache
+from django.db import transaction
+
+from gardn.redis_client import get_redis, redis_key
+
+
+# Generation counters expire once idle this long; every entry cached under one
+# has a shorter timeout (a day at most), so nothing outlives its counter.
+GENERATION_TIMEOUT = 30 * 86400
+
+
+def _generation_floor() -> int:
+    # Microseconds: a counter bumped less than once per microsecond never
+    # catches up with the clock, so one that expired and restarts here is
+    # above every value it had before, and entries stored under those values
+    # cannot be served again.
+    return time.time_ns() // 1000
+
+
+@dataclass(slots=True)
+class _Invalidations:
+    """Cache keys to delete and generation counters to bump once the transaction commits."""
+
+    deletes: set[str] = field(default_factory=set)
+    bumps: set[str] = field(default_factory=set)
+    flushed: bool = False
+
+    def flush(self) -> None:
+        deletes, bumps = self.deletes, self.bumps
+        self.deletes, self.bumps, self.flushed = set(), set(), True
+        if not deletes and not bumps:
+            return
+        pipe = get_redis(write=True).pipeline(transaction=False)
+        if deletes:
+            pipe.delete(*(redis_key(key) for key in deletes))
+        floor = _generation_floor()
+        for key in bumps:
+            key = redis_key(key)
+            pipe.set(key, floor, nx=True)
+            pipe.incr(key)
+            pipe.expire(key, GENERATION_TIMEOUT)
+        invalidate_local = getattr(cache, "invalidate_local", None)
+        if invalidate_local is not None:
+            # Written with the raw client, so tell the workers' in-process copies (gardn.l1_cache) here.
+            invalidate_local(deletes | bumps, pipeline=pipe)
+        pipe.execute()
+
+
+def _schedule(deletes: tuple[str, ...] = (), bumps: tuple[str, ...] = ()) -> None:
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        _Invalidations(set(deletes), set(bumps)).flush()  # what on_commit would do right away
+        return
+    # One batch per savepoint nesting, so a rolled-back savepoint takes its
+    # keys with it: Django drops the on_commit callbacks registered inside it
+    # (all of them, on a rolled-back transaction), and a batch with no flush
+    # left pending is discarded here rather than sent with a later commit.
+    pending_flushes = [func for _, func, _ in connection.run_on_commit]
+    batches = {
+        scope: batch
+        for scope, batch in getattr(connection, "gardn_invalidations", {}).items()
+        if not batch.flushed and batch.flush in pending_flushes
+    }
+    connection.gardn_invalidations = batches
+    batch = batches.setdefault(frozenset(connection.savepoint_ids), _Invalidations())
+    batch.deletes.update(deletes)
+    batch.bumps.update(bumps)
+    # Registered per call: the first to run sends the whole batch, the rest find it empty.
+    transaction.on_commit(batch.flush)
+
+
+def delete_on_commit(*keys: str) -> None:
+    """Delete cache ``keys`` when the current transaction commits (now, outside one).
+
+    Deleting before the commit lets a concurrent reader cache the old rows
+    again; deferring also lets one pipeline carry every key the transaction
+    touched, each once.
+    """
+    _schedule(deletes=keys)
+
+
+def bump_on_commit(*keys: str) -> None:
+    """Increment generation counters when the current transaction commits (now, outside one)."""
+    _schedule(bumps=keys)
@@ -0,0 +1,284 @@
+# gardn/l1_cache.py
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.redis import RedisCache
+
+logger = logging.getLogger(__name__)
+
+L1_TIMEOUT = 5  # seconds a worker may serve its own copy; bounds staleness if a message is lost
+L1_MAX_BYTES = 32 * 1024 * 1024
+L1_CHANNEL = "gardn:l1-invalidate"
+_CLEAR = "*"
+_RESUBSCRIBE_DELAY = 1.0
+_OTHER = "other"
+
+
+def key_family(key: str) -> str:
+    """``svg-gen:v3:alice`` -> ``svg-gen``; keys without a family are counted as ``other``."""
+    family, sep, _ = key.partition(":")
+    return family if sep else _OTHER
+
+
+@dataclass(slots=True)
+class FamilyStats:
+    l1_hits: int = 0
+    redis_hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.l1_hits + self.redis_hits + self.misses
+        return (self.l1_hits + self.redis_hits) / total if total else 0.0
+
+
+class _LRU:
+    """Bounded by total payload bytes; entries also expire after their own timeout."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict[str, tuple[float, int, object]] = OrderedDict()
+
+    def get(self, key: str, now: float) -> tuple[bool, object]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, _, value = entry
+        if expires_at <= now:
+            self.pop(key)
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: str, value: object, size: int, expires_at: float) -> None:
+        if size > self.max_bytes:
+            return
+        self.pop(key)
+        self._entries[key] = (expires_at, size, value)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (_, evicted, _) = self._entries.popitem(last=False)
+            self.size -= evicted
+
+    def pop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class L1RedisCache(RedisCache):
+    """Django's Redis cache with a per-process LRU in front of it for hot key families.
+
+    Only keys whose family (the part before the first ``:``) is listed in
+    ``OPTIONS["L1_FAMILIES"]`` are kept in process; locks, counters and
+    sessions always go to Redis. Values from the LRU are shared between
+    callers, so they must not be mutated.
+
+    Every write to an L1 family publishes the key on ``L1_CHANNEL`` and each
+    worker's listener thread drops its copy. Pub/sub is fire-and-forget, so
+    ``L1_TIMEOUT`` is the upper bound on how long a missed message can leave
+    a worker behind.
+    """
+
+    def __init__(self, server, params):
+        params = dict(params)
+        options = dict(params.get("OPTIONS", {}))
+        self.l1_families = frozenset(options.pop("L1_FAMILIES", ()))
+        self.l1_timeout = options.pop("L1_TIMEOUT", L1_TIMEOUT)
+        self.l1_channel = options.pop("L1_CHANNEL", L1_CHANNEL)
+        max_bytes = options.pop("L1_MAX_BYTES", L1_MAX_BYTES)
+        params["OPTIONS"] = options
+        super().__init__(server, params)
+        self._lru = _LRU(max_bytes)
+        self._lock = threading.Lock()
+        self._stats: dict[str, FamilyStats] = {}
+        # Bumped by every invalidation this worker hears about; a Redis read
+        # that raced with one is returned but not kept.
+        self._epoch = 0
+        self._listener_pid: int | None = None
+
+    # -- local tier --------------------------------------------------------
+
+    def _family(self, key: str) -> str:
+        # Keys here are already made ("<KEY_PREFIX>:<version>:<key>"); assumes the default KEY_FUNCTION.
+        _, _, key = key[len(self.key_prefix) + 1:].partition(":")
+        return key_family(key)
+
+    def _in_l1(self, key: str) -> bool:
+        return self._family(key) in self.l1_families
+
+    def _count(self, key: str, outcome: str) -> None:
+        family = self._family(key)
+        with self._lock:
+            stats = self._stats.get(family)
+            if stats is None:
+                stats = self._stats[family] = FamilyStats()
+            setattr(stats, outcome, getattr(stats, outcome) + 1)
+
+    def _ensure_listener(self) -> None:
+        pid = os.getpid()
+        if self._listener_pid == pid:
+            return
+        with self._lock:
+            if self._listener_pid == pid:
+                return
+            # A forked worker inherits the parent's entries but not its listener thread.
+            self._lru.clear()
+            self._listener_pid = pid
+        threading.Thread(target=self._listen, name="l1-cache-invalidation", daemon=True).start()
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                pubsub = self._cache.get_client().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.l1_channel)
+                for message in pubsub.listen():
+                    self._drop(json.loads(message["data"]))
+            except Exception:
+                logger.warning("L1 cache invalidation listener lost its connection", exc_info=True)
+            # Messages sent while disconnected are gone, so nothing local can be trusted.
+            self._drop([_CLEAR])
+            time.sleep(_RESUBSCRIBE_DELAY)
+
+    def _drop(self, keys: list[str]) -> None:
+        with self._lock:
+            self._epoch += 1
+            if _CLEAR in keys:
+                self._lru.clear()
+                return
+            for key in keys:
+                self._lru.pop(key)
+
+    def _lookup(self, keys: list[str]) -> tuple[dict[str, object], int]:
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                hit, value = self._lru.get(key, now)
+                if hit:
+                    found[key] = value
+            return found, self._epoch
+
+    def _fetch(self, keys: list[str], epoch: int | None) -> dict[str, object]:
+        """Read ``keys`` from Redis, keeping L1-family values locally unless an invalidation came in meanwhile."""
+        client = self._cache.get_client(None)
+        raw_values = client.mget(keys) if len(keys) > 1 else [client.get(keys[0])]
+        found = {}
+        kept = []
+        for key, raw in zip(keys, raw_values):
+            if raw is None:
+                self._count(key, "misses")
+                continue
+            value = self._cache._serializer.loads(raw)
+            found[key] = value
+            self._count(key, "redis_hits")
+            if self._in_l1(key):
+                kept.append((key, value, len(key) + len(raw)))
+        if kept:
+            expires_at = time.monotonic() + self.l1_timeout
+            with self._lock:
+                if self._epoch == epoch:
+                    for key, value, size in kept:
+                        self._lru.set(key, value, size, expires_at)
+        return found
+
+    def _publish(self, keys, pipeline=None) -> None:
+        keys = [key for key in keys if key == _CLEAR or self._in_l1(key)]
+        if not keys:
+            return
+        self._drop(keys)
+        payload = json.dumps(keys)
+        if pipeline is not None:
+            pipeline.publish(self.l1_channel, payload)
+        else:
+            self._cache.get_client(write=True).publish(self.l1_channel, payload)
+
+    def invalidate_local(self, keys, pipeline=None, version=None) -> None:
+        """Drop ``keys`` from every worker's L1; for writes made with the raw client.
+
+        Pass the ``pipeline`` that carries the write to send the message with it.
+        """
+        self._publish([self.make_and_validate_key(key, version=version) for key in keys], pipeline)
+
+    def l1_stats(self) -> dict[str, FamilyStats]:
+        """This worker's hit/miss counts per key family since start (or the last reset)."""
+        with self._lock:
+            return {family: FamilyStats(s.l1_hits, s.redis_hits, s.misses) for family, s in self._stats.items()}
+
+    def reset_l1_stats(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    # -- reads -------------------------------------------------------------
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        made = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not made:
+            return {}
+        local_keys = [key for key in made if self._in_l1(key)]
+        found: dict[str, object] = {}
+        epoch = None
+        if local_keys:
+            self._ensure_listener()
+            found, epoch = self._lookup(local_keys)
+            for key in found:
+                self._count(key, "l1_hits")
+        missing = [key for key in made if key not in found]
+        if missing:
+            found.update(self._fetch(missing, epoch))
+        return {made[key]: value for key, value in found.items()}
+
+    # -- writes ------------------------------------------------------------
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = super().add(key, value, timeout, version)
+        if added:
+            self._publish([self.make_and_validate_key(key, version=version)])
+        return added
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        super().set(key, value, timeout, version)
+        self._publish([self.make_and_validate_key(key, version=version)])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = super().set_many(data, timeout, version)
+        self._publish([self.make_and_validate_key(key, version=version) for key in data])
+        return failed
+
+    def delete(self, key, version=None):
+        deleted = super().delete(key, version)
+        self._publish([self.make_and_validate_key(key, version=version)])
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        super().delete_many(keys, version)
+        self._publish([self.make_and_validate_key(key, version=version) for key in keys])
+
+    def incr(self, key, delta=1, version=None):
+        value = super().incr(key, delta, version)
+        self._publish([self.make_and_validate_key(key, version=version)])
+        return value
+
+    def clear(self):
+        cleared = super().clear()
+        self._publish([_CLEAR])
+        return cleared
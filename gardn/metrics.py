@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from django.core.cache import cache
+
+from gardn.redis_client import redis_key
+
+METRICS_TIMEOUT = None  # counters live until reset_metrics() or a cache flush
+
+
+def _metric_key(name: str) -> str:
+    return f"metrics:{name}"
+
+
+def incr_metric(name: str, amount: int = 1) -> None:
+    key = _metric_key(name)
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        if not cache.add(key, amount, timeout=METRICS_TIMEOUT):
+            cache.incr(key, amount)
+
+
+def queue_incr_metric(pipeline, name: str, amount: int = 1) -> None:
+    """incr_metric as one more command on a raw Redis ``pipeline``, saving its round trips."""
+    pipeline.incr(redis_key(_metric_key(name)), amount)
+
+
+def get_metrics(*names: str) -> dict[str, int]:
+    found = cache.get_many([_metric_key(name) for name in names])
+    return {name: found.get(_metric_key(name), 0) for name in names}
+
+
+def reset_metrics(*names: str) -> None:
+    cache.delete_many([_metric_key(name) for name in names])
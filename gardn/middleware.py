@@ -4,6 +4,30 @@ from urllib.parse import urlencode
 
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import redirect
+from django.utils.functional import SimpleLazyObject
+
+
+class IdentityMiddleware:
+    """Attach ``request.identity``: the signed-in UserIdentity (or its cached SessionIdentity) or None."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        from plants.identity_cache import load_session_identity
+
+        # Lazy, so requests that never look at the viewer (plant.svg, gardn.js) never query for it.
+        request.identity = SimpleLazyObject(lambda: load_session_identity(request.session.get("identity_id")))
+        return self.get_response(request)
+
+    def process_exception(self, request: HttpRequest, exception: Exception) -> HttpResponse | None:
+        from plants.identity_cache import SessionIdentityGone
+
+        if not isinstance(exception, SessionIdentityGone):
+            return None
+        # The account was deleted while this session was signed in to it: sign out and retry anonymously.
+        request.session.flush()
+        return redirect(request.get_full_path() if request.method in ("GET", "HEAD") else "/")
 
 
 class LoginRequiredSessionMiddleware:
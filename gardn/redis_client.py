@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+
+
+def get_redis(write: bool = False):
+    """Raw redis-py client behind the default cache.
+
+    For structures the Django cache API has no verbs for (sorted sets,
+    pipelines). Keys should go through redis_key() so they share the cache's
+    prefix and version.
+
+    Django's RedisCache has no public accessor for its client, so this is the
+    one place that reaches into its private ``_cache`` (the client wrapper
+    Django has kept since 4.0); everything else calls get_redis(). Reusing it
+    shares the cache's connection pools rather than opening a second set.
+    """
+    client = getattr(cache, "_cache", None)
+    if not hasattr(client, "get_client"):
+        raise ImproperlyConfigured("The default cache must be django.core.cache.backends.redis.RedisCache.")
+    return client.get_client(write=write)
+
+
+def redis_key(name: str) -> str:
+    return cache.make_and_validate_key(name)
@@ -59,6 +59,7 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "django_htmx.middleware.HtmxMiddleware",
+    "gardn.middleware.IdentityMiddleware",
     "gardn.middleware.LoginRequiredSessionMiddleware",
 ]
 
@@ -123,6 +124,31 @@ CACHES = {
     }
 }
 
+# Per-worker in-process LRU in front of Redis for hot, read-mostly key families
+# (gardn.l1_cache). Writes are broadcast over pub/sub so every worker drops its copy.
+L1_CACHE_ENABLED = env_bool("L1_CACHE_ENABLED", False)
+if L1_CACHE_ENABLED:
+    CACHES["default"]["BACKEND"] = "gardn.l1_cache.L1RedisCache"
+    CACHES["default"]["OPTIONS"] = {
+        "L1_FAMILIES": env_list(
+            "L1_CACHE_FAMILIES",
+            ["svg", "svg-thumb", "svg-gen", "svg-meta", "svg-thumb-meta", "identity", "home"],
+        ),
+        "L1_TIMEOUT": int(os.getenv("L1_CACHE_TIMEOUT", "5")),
+        "L1_MAX_BYTES": int(os.getenv("L1_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    }
+
+# Render-version rollout (manage.py svg_rollout). While set, plants keep being
+# served from this version's renders until the current SVG_RENDER_VERSION has
+# been pre-rendered for SVG_ROLLOUT_THRESHOLD of identities; then every worker
+# flips over at once. Clear it once the rollout is done.
+SVG_ROLLOUT_PREVIOUS_VERSION = os.getenv("SVG_ROLLOUT_PREVIOUS_VERSION", "")
+SVG_ROLLOUT_THRESHOLD = float(os.getenv("SVG_ROLLOUT_THRESHOLD", "0.95"))
+
+# Seconds to reuse the signed-in identity's id, username and flags across requests
+# (gardn.middleware.IdentityMiddleware); views that need more still read the row.
+REQUEST_IDENTITY_CACHE_TIMEOUT = int(os.getenv("REQUEST_IDENTITY_CACHE_TIMEOUT", "0"))
+
 SESSION_ENGINE = "django.contrib.sessions.backends.cache"
 SESSION_CACHE_ALIAS = "default"
 
@@ -132,13 +158,17 @@ USE_I18N = True
 USE_TZ = True
 
 AWS_STORAGE_BUCKET_NAME = os.getenv("AWS_STORAGE_BUCKET_NAME", "")
-AWS_S3_ENDPOINT_URL = os.getenv("AWS_S3_ENDPOINT_URL", "")
+AWS_S3_ENDPOINT_URL = os.getenv("AWS_S3_ENDPOINT_URL") or None  # unset means AWS; boto rejects ""
 AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID", "")
 AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY", "")
 AWS_S3_CUSTOM_DOMAIN = os.getenv("AWS_S3_CUSTOM_DOMAIN", "")
 AWS_DEFAULT_ACL = "public-read"
 AWS_S3_FILE_OVERWRITE = True
 
+# Serve plant SVGs from the bucket (plants/svg_storage.py): every render is also
+# written under a content-hash name and plant.svg redirects to it.
+SVG_OBJECT_STORAGE = env_bool("SVG_OBJECT_STORAGE", False)
+
 STATIC_URL = "static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
 STATICFILES_DIRS = [BASE_DIR / "static"]
@@ -152,10 +182,30 @@ def _get_staticfiles_backend(bucket: str | None = None) -> str:
     return "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
 
+def _get_plant_svg_storage(bucket: str | None = None, enabled: bool | None = None) -> dict | None:
+    if bucket is None:
+        bucket = AWS_STORAGE_BUCKET_NAME
+    if enabled is None:
+        enabled = SVG_OBJECT_STORAGE
+    if not (bucket and enabled):
+        return None
+    return {
+        "BACKEND": "storages.backends.s3boto3.S3Boto3Storage",
+        "OPTIONS": {
+            "location": "plants",
+            # Names are content hashes, so an object never changes once written.
+            "object_parameters": {"CacheControl": "public, max-age=31536000, immutable"},
+            "querystring_auth": False,
+        },
+    }
+
+
 STORAGES = {
     "staticfiles": {"BACKEND": _get_staticfiles_backend()},
     "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
 }
+if (_plant_svg_storage := _get_plant_svg_storage()) is not None:
+    STORAGES["plant_svgs"] = _plant_svg_storage
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
-from django.core.cache import cache
 from django.db.models import Q
 
+from gardn.cache import get_or_compute
+from gardn.invalidation import delete_on_commit
+
 from .models import Harvest
 
 HARVEST_STATS_CACHE_TIMEOUT = 3600  # 1 hour
@@ -14,11 +16,14 @@ def harvest_stats_cache_key(identity_id: int) -> str:
 
 
 def get_harvest_stats(identity_id: int) -> dict[str, int]:
-    cache_key = harvest_stats_cache_key(identity_id)
-    cached = cache.get(cache_key)
-    if cached is not None:
-        return cached
+    return get_or_compute(
+        harvest_stats_cache_key(identity_id),
+        lambda: _compute_harvest_stats(identity_id),
+        HARVEST_STATS_CACHE_TIMEOUT,
+    )
+
 
+def _compute_harvest_stats(identity_id: int) -> dict[str, int]:
     harvests_qs = Harvest.objects.filter(identity_id=identity_id)
     total_count = harvests_qs.count()
     posted_count = harvests_qs.filter(
@@ -29,16 +34,14 @@ def get_harvest_stats(identity_id: int) -> dict[str, int]:
     for tags in harvests_qs.values_list("tags", flat=True):
         all_tags.extend(tag.strip() for tag in tags.split(",") if tag.strip())
 
-    stats = {
+    return {
         "total_count": total_count,
         "posted_count": posted_count,
         "unposted_count": total_count - posted_count,
         "unique_tag_count": len(set(all_tags)),
         "health_pct": round(posted_count / total_count * 100) if total_count else 0,
     }
-    cache.set(cache_key, stats, timeout=HARVEST_STATS_CACHE_TIMEOUT)
-    return stats
 
 
 def invalidate_harvest_stats(identity_id: int) -> None:
-    cache.delete(harvest_stats_cache_key(identity_id))
+    delete_on_commit(harvest_stats_cache_key(identity_id))
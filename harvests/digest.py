@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from django.db import transaction
+
+from plants.counters import shifted
+from plants.models import UserIdentity
+from plants.svg import digest_harvest_urls, update_harvest_digest
+
+from .models import Harvest
+
+
+def _apply(identity_id: int, url: str, removed: bool) -> None:
+    with transaction.atomic():
+        current = (
+            UserIdentity.objects.select_for_update()
+            .filter(id=identity_id)
+            .values_list("harvest_digest", flat=True)
+            .first()
+        )
+        if current is None:
+            return
+        UserIdentity.objects.filter(id=identity_id).update(
+            harvest_digest=update_harvest_digest(current, url, removed=removed),
+            harvest_count=shifted("harvest_count", -1 if removed else 1),
+        )
+
+
+def record_harvest_added(identity_id: int, url: str) -> None:
+    _apply(identity_id, url, removed=False)
+
+
+def record_harvest_removed(identity_id: int, url: str) -> None:
+    _apply(identity_id, url, removed=True)
+
+
+def rebuild_harvest_digest(identity_id: int) -> str:
+    urls = Harvest.objects.filter(identity_id=identity_id).values_list("url", flat=True)
+    digest = digest_harvest_urls(urls)
+    UserIdentity.objects.filter(id=identity_id).update(harvest_digest=digest)
+    return digest
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from harvests.models import Harvest
+from plants.models import UserIdentity
+from plants.svg import digest_harvest_urls
+from plants.svg_cache import invalidate_svg
+
+
+class Command(BaseCommand):
+    help = "Recompute UserIdentity.harvest_digest from stored harvests."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options) -> None:
+        batch_size = options["batch_size"]
+        ids = list(UserIdentity.objects.order_by("id").values_list("id", flat=True))
+        changed = 0
+
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            urls_by_identity: dict[int, list[str]] = {identity_id: [] for identity_id in batch}
+            for identity_id, url in Harvest.objects.filter(identity_id__in=batch).values_list("identity_id", "url"):
+                urls_by_identity[identity_id].append(url)
+
+            identities = list(UserIdentity.objects.filter(id__in=batch).only("id", "username", "harvest_digest"))
+            stale = []
+            for identity in identities:
+                digest = digest_harvest_urls(urls_by_identity[identity.id])
+                if identity.harvest_digest != digest:
+                    identity.harvest_digest = digest
+                    stale.append(identity)
+            with transaction.atomic():
+                UserIdentity.objects.bulk_update(stale, ["harvest_digest"])
+                # The digest seeds the render, so a changed one means a different plant.
+                for identity in stale:
+                    invalidate_svg(identity.username)
+            changed += len(stale)
+
+        self.stdout.write(f"Updated {changed} of {len(ids)} harvest digests.")
@@ -4,6 +4,7 @@ from urllib.parse import urlparse, urlencode
 
 from django.conf import settings
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
 from django.contrib import messages
@@ -11,21 +12,16 @@ from django.http import HttpRequest, HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.http import require_GET, require_http_methods, require_POST
 
-from plants.models import UserIdentity
+from plants.fragment_cache import HARVESTS, bump_fragment_versions
+from plants.page_cache import invalidate_page
 from plants.svg_cache import invalidate_svg
 
 from .cache import get_harvest_stats, invalidate_harvest_stats
+from .digest import record_harvest_added, record_harvest_removed
 from .models import Harvest
 from .tasks import post_to_micropub, post_to_mastodon
 
 
-def _current_identity(request: HttpRequest) -> UserIdentity | None:
-    identity_id = request.session.get("identity_id")
-    if not identity_id:
-        return None
-    return UserIdentity.objects.filter(id=identity_id).first()
-
-
 def _ripeness_class(harvest: Harvest) -> str:
     age = timezone.now() - harvest.harvested_at
     is_posted = harvest.micropub_posted or harvest.mastodon_posted
@@ -55,7 +51,7 @@ def _harvests_redirect_target(request: HttpRequest) -> str:
 
 @require_GET
 def harvests_list_view(request: HttpRequest) -> HttpResponse:
-    identity = _current_identity(request)
+    identity = request.identity
     if not identity:
         query = urlencode({"next": request.get_full_path()})
         return redirect(f"/login/?{query}")
@@ -105,7 +101,7 @@ def harvests_list_view(request: HttpRequest) -> HttpResponse:
 
 @require_http_methods(["GET", "POST"])
 def harvest_view(request: HttpRequest) -> HttpResponse:
-    identity = _current_identity(request)
+    identity = request.identity
     if not identity:
         query = urlencode({"next": request.get_full_path()})
         return redirect(f"/login/?{query}")
@@ -145,18 +141,23 @@ def harvest_view(request: HttpRequest) -> HttpResponse:
             "error": "Please enter a valid http/https URL.",
         }, status=400)
 
-    harvest, created = Harvest.objects.get_or_create(
-        identity=identity,
-        url=url,
-        defaults={"title": title, "note": note, "tags": tags},
-    )
-    if not created:
-        harvest.title = title
-        harvest.note = note
-        harvest.tags = tags
-        harvest.save(update_fields=["title", "note", "tags"])
-
-    invalidate_harvest_stats(identity.id)
+    with transaction.atomic():
+        harvest, created = Harvest.objects.get_or_create(
+            identity=identity,
+            url=url,
+            defaults={"title": title, "note": note, "tags": tags},
+        )
+        if created:
+            record_harvest_added(identity.id, harvest.url)
+        else:
+            harvest.title = title
+            harvest.note = note
+            harvest.tags = tags
+            harvest.save(update_fields=["title", "note", "tags"])
+        # Both go out in one round trip when the harvest commits, so the plant regenerates with it.
+        invalidate_harvest_stats(identity.id)
+        invalidate_svg(identity.username)
+        bump_fragment_versions(identity.id, HARVESTS)
 
     if post_to_micropub_flag and micropub_endpoint:
         access_token = request.session.get("access_token", "")
@@ -165,9 +166,6 @@ def harvest_view(request: HttpRequest) -> HttpResponse:
     if post_to_mastodon_flag and can_post_to_mastodon:
         post_to_mastodon.delay(harvest.id)
 
-    # Invalidate SVG cache so plant regenerates with new harvest
-    invalidate_svg(identity.username)
-
     is_popup = request.GET.get("popup") == "1"
     if is_popup:
         return render(request, "harvests/harvest_success.html", {"url": url, "title": title})
@@ -183,7 +181,7 @@ def harvest_view(request: HttpRequest) -> HttpResponse:
 
 @require_POST
 def harvest_post_view(request: HttpRequest, harvest_id: int) -> HttpResponse:
-    identity = _current_identity(request)
+    identity = request.identity
     if not identity:
         return HttpResponse("Unauthorized", status=401)
 
@@ -217,7 +215,7 @@ def harvest_post_view(request: HttpRequest, harvest_id: int) -> HttpResponse:
 
 @require_http_methods(["GET", "POST"])
 def harvest_edit_view(request: HttpRequest, harvest_id: int) -> HttpResponse:
-    identity = _current_identity(request)
+    identity = request.identity
     if not identity:
         query = urlencode({"next": request.get_full_path()})
         return redirect(f"/login/?{query}")
@@ -237,8 +235,11 @@ def harvest_edit_view(request: HttpRequest, harvest_id: int) -> HttpResponse:
     harvest.title = title
     harvest.note = note
     harvest.tags = tags
-    harvest.save(update_fields=["title", "note", "tags"])
-    invalidate_harvest_stats(identity.id)
+    with transaction.atomic():
+        harvest.save(update_fields=["title", "note", "tags"])
+        invalidate_harvest_stats(identity.id)
+        invalidate_page(identity.username)
+        bump_fragment_versions(identity.id, HARVESTS)
 
     micropub_endpoint = request.session.get("micropub_endpoint", "")
     can_post_to_mastodon = (
@@ -262,23 +263,27 @@ def harvest_edit_view(request: HttpRequest, harvest_id: int) -> HttpResponse:
 
 @require_GET
 def bookmarklet_view(request: HttpRequest) -> HttpResponse:
-    identity = _current_identity(request)
+    identity = request.identity
     return render(request, "harvests/bookmarklet.html", {"identity": identity, "public_base_url": settings.PUBLIC_BASE_URL})
 
 
 @require_POST
 def harvest_delete_view(request: HttpRequest, harvest_id: int) -> HttpResponse:
-    identity = _current_identity(request)
+    identity = request.identity
     if not identity:
         query = urlencode({"next": request.get_full_path()})
         return redirect(f"/login/?{query}")
 
     harvest = get_object_or_404(Harvest, id=harvest_id, identity=identity)
-    harvest.delete()
-    invalidate_harvest_stats(identity.id)
-
-    # Invalidate SVG cache
-    invalidate_svg(identity.username)
+    with transaction.atomic():
+        # A concurrent or double-submitted delete finds the row gone: only the
+        # request that removed it takes its URL out of the digest.
+        deleted, _ = Harvest.objects.filter(pk=harvest.pk).delete()
+        if deleted:
+            record_harvest_removed(identity.id, harvest.url)
+            invalidate_harvest_stats(identity.id)
+            invalidate_svg(identity.username)
+            bump_fragment_versions(identity.id, HARVESTS)
 
     if request.headers.get("HX-Request"):
         return HttpResponse(status=200)
@@ -3,13 +3,20 @@ from __future__ import annotations
 from urllib.parse import urlparse
 
 from django.contrib import messages
+from django.db import transaction
 from django.db.models import Q
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import redirect, render
 from django.views.decorators.http import require_GET, require_http_methods
 
 from gardn.utils import sanitize_user_bio_html, slug_from_me_url
+from harvests.cache import invalidate_harvest_stats
+from harvests.digest import rebuild_harvest_digest
+from picks.leaderboard import merge_identity
+from plants.counters import reconcile_counters
+from plants.fragment_cache import HARVESTS, PICKS, bump_fragment_versions
 from plants.models import UserIdentity
+from plants.svg_cache import invalidate_svg
 
 from .auth import (
     build_auth_url,
@@ -130,11 +137,7 @@ def mastodon_callback(request: HttpRequest) -> HttpResponse:
 
 @require_http_methods(["GET", "POST"])
 def verify_website_view(request: HttpRequest) -> HttpResponse:
-    identity_id = request.session.get("identity_id")
-    if not identity_id:
-        return redirect("/login/")
-
-    identity = UserIdentity.objects.filter(id=identity_id).first()
+    identity = request.identity
     if not identity or identity.login_method != "mastodon":
         return redirect("/login/")
 
@@ -162,18 +165,28 @@ def verify_website_view(request: HttpRequest) -> HttpResponse:
             # Merge: an account for this website already exists (e.g. IndieAuth).
             # Copy Mastodon credentials onto it and discard the temp identity.
             # Reassign any related data just in case (normally the temp identity is fresh).
-            existing.mastodon_handle = identity.mastodon_handle
-            existing.mastodon_profile_url = identity.mastodon_profile_url
-            existing.mastodon_access_token = identity.mastodon_access_token
-            existing.website_verified = True
-            existing.save(update_fields=[
-                "mastodon_handle", "mastodon_profile_url", "mastodon_access_token",
-                "website_verified", "updated_at",
-            ])
-            identity.harvests.all().update(identity=existing)
-            identity.outgoing_picks.all().update(picker=existing)
-            identity.incoming_picks.all().update(picked=existing)
-            identity.delete()
+            with transaction.atomic():
+                existing.mastodon_handle = identity.mastodon_handle
+                existing.mastodon_profile_url = identity.mastodon_profile_url
+                existing.mastodon_access_token = identity.mastodon_access_token
+                existing.website_verified = True
+                existing.save(update_fields=[
+                    "mastodon_handle", "mastodon_profile_url", "mastodon_access_token",
+                    "website_verified", "updated_at",
+                ])
+                identity_id = identity.id
+                identity.harvests.all().update(identity=existing)
+                identity.outgoing_picks.all().update(picker=existing)
+                identity.incoming_picks.all().update(picked=existing)
+                identity.delete()
+                rebuild_harvest_digest(existing.id)
+                reconcile_counters([existing.id])
+                # The moved harvests and picks change existing's plant like any other harvest write.
+                invalidate_harvest_stats(existing.id)
+                invalidate_svg(existing.username)
+                bump_fragment_versions(existing.id, HARVESTS, PICKS)
+            existing.refresh_from_db(fields=["incoming_pick_count"])
+            merge_identity(identity_id, existing.id, existing.incoming_pick_count)
             identity = existing
         else:
             identity.me_url = website_url
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from gardn.redis_client import get_redis, redis_key
+from plants.models import UserIdentity
+
+LEADERBOARD_KEY = "leaderboard:incoming-picks"
+
+# Kept in the set at a negative score so an empty leaderboard still exists and
+# a missing key reliably means "never built" rather than "nobody has picks".
+_SENTINEL = "built"
+
+
+def _apply(client, key: str, deltas: dict[int, int], removed: list[int], scores: dict[int, int] | None = None) -> None:
+    pipe = client.pipeline()
+    for identity_id, delta in deltas.items():
+        pipe.zincrby(key, delta, identity_id)
+    if scores:
+        pipe.zadd(key, {str(identity_id): score for identity_id, score in scores.items()})
+    if removed:
+        pipe.zrem(key, *removed)
+    # Drop anyone who fell back to zero picks, then restore the sentinel.
+    pipe.zremrangebyscore(key, "-inf", 0)
+    pipe.zadd(key, {_SENTINEL: -1})
+    pipe.execute()
+
+
+def record_pick_change(identity_id: int, delta: int) -> None:
+    client = get_redis(write=True)
+    key = redis_key(LEADERBOARD_KEY)
+    # Incrementing an unbuilt set would leave it holding only recent activity.
+    if client.exists(key):
+        _apply(client, key, {identity_id: delta}, [])
+
+
+def forget_identity(identity_id: int, picked_ids: list[int]) -> None:
+    """Drop a deleted identity and the picks it had given."""
+    client = get_redis(write=True)
+    key = redis_key(LEADERBOARD_KEY)
+    if client.exists(key):
+        _apply(client, key, {picked_id: -1 for picked_id in picked_ids}, [identity_id])
+
+
+def merge_identity(removed_id: int, into_id: int, incoming_pick_count: int) -> None:
+    """Drop an identity merged into ``into_id``, which now holds its picks.
+
+    ``incoming_pick_count`` is the survivor's reconciled counter; picks the
+    removed identity gave moved with it, so nobody else's score changes.
+    """
+    client = get_redis(write=True)
+    key = redis_key(LEADERBOARD_KEY)
+    if client.exists(key):
+        _apply(client, key, {}, [removed_id], {into_id: incoming_pick_count})
+
+
+def top_picked(limit: int) -> list[tuple[int, int]] | None:
+    """Return [(identity_id, pick_count), ...], or None when the set is missing."""
+    client = get_redis()
+    key = redis_key(LEADERBOARD_KEY)
+    pipe = client.pipeline(transaction=False)
+    pipe.exists(key)
+    pipe.zrevrangebyscore(key, "+inf", 1, start=0, num=limit, withscores=True)
+    exists, rows = pipe.execute()
+    if not exists:
+        return None
+    return [(int(member), int(score)) for member, score in rows]
+
+
+def rebuild_leaderboard() -> int:
+    scores = dict(
+        UserIdentity.objects.filter(incoming_pick_count__gt=0).values_list("id", "incoming_pick_count")
+    )
+    key = redis_key(LEADERBOARD_KEY)
+    pipe = get_redis(write=True).pipeline()
+    pipe.delete(key)
+    pipe.zadd(key, {**{str(identity_id): score for identity_id, score in scores.items()}, _SENTINEL: -1})
+    pipe.execute()
+    return len(scores)
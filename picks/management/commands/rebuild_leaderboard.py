@@ -0,0 +1,13 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from picks.leaderboard import rebuild_leaderboard
+
+
+class Command(BaseCommand):
+    help = "Rebuild the Redis leaderboard of most-picked gardens from UserIdentity counters."
+
+    def handle(self, *args, **options) -> None:
+        ranked = rebuild_leaderboard()
+        self.stdout.write(f"Leaderboard rebuilt with {ranked} picked garden{'s' if ranked != 1 else ''}.")
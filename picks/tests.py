@@ -4,7 +4,8 @@ from django.core.cache import cache
 from django.test import TestCase
 
 from plants.models import UserIdentity
-from plants.svg_cache import svg_cache_key
+from gardn.metrics import get_metrics, reset_metrics
+from plants.svg_cache import SVG_INVALIDATION_METRICS, svg_cache_key
 
 from .models import Pick
 
@@ -34,6 +35,9 @@ class PickTests(TestCase):
         self.assertTemplateUsed(response, "picks/_pick_button.html")
 
     def test_pick_and_unpick_invalidate_svg_cache_for_both_users(self) -> None:
+        # Both plants sit one pick below the activity threshold of 3.
+        UserIdentity.objects.filter(id=self.a.id).update(outgoing_pick_count=2)
+        UserIdentity.objects.filter(id=self.b.id).update(incoming_pick_count=2)
         cache.set(svg_cache_key(self.a.username), "<svg>a</svg>", timeout=3600)
         cache.set(svg_cache_key(self.b.username), "<svg>b</svg>", timeout=3600)
 
@@ -41,13 +45,34 @@ class PickTests(TestCase):
         session["identity_id"] = self.a.id
         session.save()
 
-        self.client.post(f"/pick/{self.b.username}/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/pick/{self.b.username}/")
         self.assertIsNone(cache.get(svg_cache_key(self.a.username)))
         self.assertIsNone(cache.get(svg_cache_key(self.b.username)))
 
         cache.set(svg_cache_key(self.a.username), "<svg>a2</svg>", timeout=3600)
         cache.set(svg_cache_key(self.b.username), "<svg>b2</svg>", timeout=3600)
 
-        self.client.post(f"/unpick/{self.b.username}/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/unpick/{self.b.username}/")
         self.assertIsNone(cache.get(svg_cache_key(self.a.username)))
         self.assertIsNone(cache.get(svg_cache_key(self.b.username)))
+
+    def test_pick_within_activity_bucket_keeps_svg_cache(self) -> None:
+        cache.set(svg_cache_key(self.a.username), "<svg>a</svg>", timeout=3600)
+        cache.set(svg_cache_key(self.b.username), "<svg>b</svg>", timeout=3600)
+        reset_metrics(*SVG_INVALIDATION_METRICS)
+
+        session = self.client.session
+        session["identity_id"] = self.a.id
+        session.save()
+
+        self.client.post(f"/pick/{self.b.username}/")
+        self.client.post(f"/unpick/{self.b.username}/")
+
+        self.assertEqual(cache.get(svg_cache_key(self.a.username)), "<svg>a</svg>")
+        self.assertEqual(cache.get(svg_cache_key(self.b.username)), "<svg>b</svg>")
+        self.assertEqual(
+            get_metrics(*SVG_INVALIDATION_METRICS),
+            {"svg-invalidation:hit": 0, "svg-invalidation:skip": 4},
+        )
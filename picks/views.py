@@ -1,35 +1,43 @@
 from __future__ import annotations
 
+from django.db import transaction
 from django.http import HttpRequest, HttpResponse
-from django.shortcuts import get_object_or_404, render
+from django.shortcuts import render
 from django.views.decorators.http import require_POST
 
+from plants.counters import adjust_counters, invalidate_pick_changes
+from plants.identity_cache import get_full_identity_or_404
+from plants.fragment_cache import PICKS, bump_fragment_versions
 from plants.models import UserIdentity
-from plants.svg_cache import invalidate_svg
 
+from .leaderboard import record_pick_change
 from .models import Pick
 from .rate_limit import hit_rate_limit
 
 
-def _current_identity(request: HttpRequest) -> UserIdentity | None:
-    identity_id = request.session.get("identity_id")
-    if not identity_id:
-        return None
-    return UserIdentity.objects.filter(id=identity_id).first()
-
-
 def _throttled(request: HttpRequest, user: UserIdentity) -> bool:
     ip = request.META.get("REMOTE_ADDR", "unknown")
     return hit_rate_limit(f"pick-ip:{ip}", 30, 60) or hit_rate_limit(f"pick-user:{user.id}", 30, 60)
 
 
+def _invalidate_changed_plants(viewer: UserIdentity, picked: UserIdentity, delta: int) -> dict[int, int]:
+    """Retire what a pick moving both sides' pick_count by ``delta`` changed.
+
+    Call after adjust_counters, inside its transaction. Returns each side's
+    new incoming_pick_count.
+    """
+    incoming = invalidate_pick_changes({viewer.id: delta, picked.id: delta})
+    bump_fragment_versions(viewer.id, PICKS)
+    return incoming
+
+
 def _render_pick_state(request: HttpRequest, viewer: UserIdentity | None, picked: UserIdentity) -> HttpResponse:
     has_picked = bool(viewer and Pick.objects.filter(picker=viewer, picked=picked).exists())
     context = {
         "picked_identity": picked,
         "viewer": viewer,
         "has_picked": has_picked,
-        "pick_count": Pick.objects.filter(picked=picked).count(),
+        "pick_count": picked.incoming_pick_count,
     }
     template = "picks/_pick_button.html" if request.htmx else "picks/pick_state_full.html"
     return render(request, template, context)
@@ -37,8 +45,8 @@ def _render_pick_state(request: HttpRequest, viewer: UserIdentity | None, picked
 
 @require_POST
 def pick_view(request: HttpRequest, username: str) -> HttpResponse:
-    viewer = _current_identity(request)
-    picked = get_object_or_404(UserIdentity, username=username)
+    viewer = request.identity
+    picked = get_full_identity_or_404(username, viewer=request.identity)
     if not viewer:
         response = _render_pick_state(request, None, picked)
         response.status_code = 401
@@ -50,17 +58,22 @@ def pick_view(request: HttpRequest, username: str) -> HttpResponse:
         return response
 
     if viewer.id != picked.id:
-        Pick.objects.get_or_create(picker=viewer, picked=picked)
-        invalidate_svg(viewer.username)
-        invalidate_svg(picked.username)
+        with transaction.atomic():
+            _, created = Pick.objects.get_or_create(picker=viewer, picked=picked)
+            if created:
+                adjust_counters(viewer.id, outgoing_pick_count=1)
+                adjust_counters(picked.id, incoming_pick_count=1)
+                picked.incoming_pick_count = _invalidate_changed_plants(viewer, picked, 1)[picked.id]
+        if created:
+            record_pick_change(picked.id, 1)
 
     return _render_pick_state(request, viewer, picked)
 
 
 @require_POST
 def unpick_view(request: HttpRequest, username: str) -> HttpResponse:
-    viewer = _current_identity(request)
-    picked = get_object_or_404(UserIdentity, username=username)
+    viewer = request.identity
+    picked = get_full_identity_or_404(username, viewer=request.identity)
     if not viewer:
         response = _render_pick_state(request, None, picked)
         response.status_code = 401
@@ -71,7 +84,12 @@ def unpick_view(request: HttpRequest, username: str) -> HttpResponse:
         response.status_code = 429
         return response
 
-    Pick.objects.filter(picker=viewer, picked=picked).delete()
-    invalidate_svg(viewer.username)
-    invalidate_svg(picked.username)
+    with transaction.atomic():
+        deleted, _ = Pick.objects.filter(picker=viewer, picked=picked).delete()
+        if deleted:
+            adjust_counters(viewer.id, outgoing_pick_count=-1)
+            adjust_counters(picked.id, incoming_pick_count=-1)
+            picked.incoming_pick_count = _invalidate_changed_plants(viewer, picked, -1)[picked.id]
+    if deleted:
+        record_pick_change(picked.id, -1)
     return _render_pick_state(request, viewer, picked)
@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class PlantsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "plants"
+
+    def ready(self) -> None:
+        from django.db.models.signals import post_delete, post_save
+
+        from . import fragment_cache
+        from .identity_cache import identity_deleted, identity_saved
+        from .models import UserIdentity
+
+        post_save.connect(identity_saved, sender=UserIdentity, dispatch_uid="identity-cache-saved")
+        post_save.connect(fragment_cache.identity_saved, sender=UserIdentity, dispatch_uid="fragment-cache-saved")
+        post_delete.connect(identity_deleted, sender=UserIdentity, dispatch_uid="identity-cache-deleted")
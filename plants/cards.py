@@ -0,0 +1,36 @@
+# plants/cards.py
+from __future__ import annotations
+
+from typing import Callable, Iterable, NamedTuple
+
+from django.db.models import QuerySet
+
+from gardn.cache import get_or_compute
+
+
+class GardenCard(NamedTuple):
+    """One garden tile (home page lists, search results): only what the card template renders."""
+
+    username: str
+    display_name: str
+    me_url: str
+    pick_count: int = 0
+
+
+CARD_FIELDS = ("username", "display_name", "me_url")
+
+
+def garden_cards(queryset: QuerySet, *extra: str) -> list[GardenCard]:
+    """Cards straight from ``queryset``'s columns; ``extra`` names the pick-count column, if any."""
+    return [GardenCard(*row) for row in queryset.values_list(*CARD_FIELDS, *extra)]
+
+
+def cached_garden_cards(key: str, compute: Callable[[], Iterable[GardenCard]], timeout: int) -> list[GardenCard]:
+    """``compute()``'s cards through get_or_compute, stored as plain tuples.
+
+    A tuple of four short values pickles to a fraction of a model instance
+    (which drags ``bio``, tokens and ``_state`` along) and loads without
+    touching the model class.
+    """
+    rows = get_or_compute(key, lambda: [tuple(card) for card in compute()], timeout)
+    return [GardenCard._make(row) for row in rows]
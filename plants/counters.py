@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import UserIdentity
+from .page_cache import invalidate_page
+from .svg_cache import invalidate_svg_for_counts
+
+COUNTER_FIELDS = ("incoming_pick_count", "outgoing_pick_count", "harvest_count")
+
+
+def shifted(field: str, delta: int):
+    """F() expression for ``field + delta``, floored at zero so drift never goes negative."""
+    if delta < 0:
+        return Greatest(F(field) + delta, Value(0))
+    return F(field) + delta
+
+
+def adjust_counters(identity_id: int, **deltas: int) -> None:
+    """Apply relative changes to an identity's counters with F() expressions.
+
+    Call inside the transaction that performs the write being counted.
+    """
+    UserIdentity.objects.filter(id=identity_id).update(
+        **{field: shifted(field, delta) for field, delta in deltas.items()}
+    )
+
+
+def _count_rows(identity_ids: Iterable[int]) -> dict[int, tuple[str, int, int, int]]:
+    rows = UserIdentity.objects.filter(id__in=list(identity_ids)).values_list(
+        "id", "username", "harvest_count", "incoming_pick_count", "outgoing_pick_count",
+    )
+    return {identity_id: tuple(counts) for identity_id, *counts in rows}
+
+
+def _invalidate_count_change(username: str, before: tuple[int, int], after: tuple[int, int]) -> None:
+    invalidate_svg_for_counts(username, before, after)
+    # The pick count and picks list change even when the plant does not.
+    invalidate_page(username)
+
+
+def invalidate_pick_changes(pick_deltas: dict[int, int]) -> dict[int, int]:
+    """Retire the plants and pages of identities whose pick_count moved by ``pick_deltas``.
+
+    Call after the counter UPDATE, inside its transaction. The counts are
+    re-read rather than taken from model instances: those may be stale (a
+    concurrent pick, or an identity restored from the session cache), while
+    the UPDATE still holds the row locks, so the re-read sees exactly the
+    values it wrote. Returns each identity's new incoming_pick_count.
+    """
+    incoming = {}
+    for identity_id, (username, harvest_count, incoming_count, outgoing_count) in _count_rows(pick_deltas).items():
+        picks = incoming_count + outgoing_count
+        _invalidate_count_change(username, (harvest_count, picks - pick_deltas[identity_id]), (harvest_count, picks))
+        incoming[identity_id] = incoming_count
+    return incoming
+
+
+def _count_subquery(queryset, field: str) -> Coalesce:
+    counts = queryset.filter(**{field: OuterRef("pk")}).order_by().values(field).annotate(n=Count("pk")).values("n")
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def _true_counts() -> dict[str, Coalesce]:
+    from harvests.models import Harvest
+    from picks.models import Pick
+
+    return {
+        "incoming_pick_count": _count_subquery(Pick.objects.all(), "picked"),
+        "outgoing_pick_count": _count_subquery(Pick.objects.all(), "picker"),
+        "harvest_count": _count_subquery(Harvest.objects.all(), "identity"),
+    }
+
+
+def reconcile_counters(identity_ids: Iterable[int] | None = None) -> int:
+    """Recount every counter from source rows in bulk. Returns identities repaired.
+
+    Repaired identities get their plants and pages retired like any other
+    counter change, since the counts feed the render.
+    """
+    queryset = UserIdentity.objects.all()
+    if identity_ids is not None:
+        queryset = queryset.filter(id__in=list(identity_ids))
+
+    counts = _true_counts()
+    drifted = queryset.alias(**{f"true_{field}": expr for field, expr in counts.items()}).exclude(
+        **{field: F(f"true_{field}") for field in COUNTER_FIELDS}
+    )
+    drifted_ids = list(drifted.values_list("id", flat=True))
+    if not drifted_ids:
+        return 0
+    with transaction.atomic():
+        before = _count_rows(UserIdentity.objects.select_for_update().filter(id__in=drifted_ids).values_list("id", flat=True))
+        repaired = UserIdentity.objects.filter(id__in=drifted_ids).update(**counts)
+        for identity_id, (username, harvest_count, incoming_count, outgoing_count) in _count_rows(drifted_ids).items():
+            _, old_harvests, old_incoming, old_outgoing = before[identity_id]
+            _invalidate_count_change(
+                username,
+                (old_harvests, old_incoming + old_outgoing),
+                (harvest_count, incoming_count + outgoing_count),
+            )
+    return repaired
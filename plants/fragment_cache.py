@@ -0,0 +1,105 @@
+# plants/fragment_cache.py
+from __future__ import annotations
+
+import hashlib
+
+from django.core.cache import cache
+from django.core.cache.backends.redis import RedisSerializer
+
+from gardn.invalidation import bump_on_commit
+from gardn.metrics import get_metrics, incr_metric, queue_incr_metric, reset_metrics
+from gardn.redis_client import get_redis, redis_key
+
+from .cards import CARD_FIELDS
+
+FRAGMENT_CACHE_TIMEOUT = 86400  # versions retire changed fragments; this only bounds unused ones
+FRAGMENT_CACHE_VERSION = "v1"
+
+# What a fragment can depend on, each a counter per identity.
+PROFILE = "profile"  # names, bio, photo, profile settings
+PICKS = "picks"  # the identity's outgoing picks
+HARVESTS = "harvests"
+FRAGMENT_KINDS = (PROFILE, PICKS, HARVESTS)
+
+_serializer = RedisSerializer()
+
+
+def fragment_version_key(kind: str, identity_id: int) -> str:
+    return f"fragment-ver:{kind}:{identity_id}"
+
+
+def bump_fragment_versions(identity_id: int, *kinds: str) -> None:
+    """Retire ``identity_id``'s fragments that depend on ``kinds``, once the transaction commits."""
+    bump_on_commit(*(fragment_version_key(kind, identity_id) for kind in kinds))
+
+
+def fragment_cache_key(name: str, identity_id: int, vary_on: list) -> str:
+    vary = hashlib.sha256(":".join(str(value) for value in vary_on).encode("utf-8")).hexdigest()[:16]
+    return f"fragment:{FRAGMENT_CACHE_VERSION}:{name}:{identity_id}:{vary}"
+
+
+def _names_key() -> str:
+    return f"fragment-names:{FRAGMENT_CACHE_VERSION}"
+
+
+def _metric_names(name: str) -> tuple[str, str]:
+    return f"fragment:{name}:lookups", f"fragment:{name}:misses"
+
+
+def lookup_fragment(name: str, identity_id: int, kinds: tuple[str, ...], vary_on: list) -> tuple[tuple, str | None]:
+    """The current versions of ``kinds`` and the stored fragment, if it was rendered at them.
+
+    One pipeline reads the fragment and its versions and counts the lookup.
+    """
+    key = fragment_cache_key(name, identity_id, vary_on)
+    version_keys = [fragment_version_key(kind, identity_id) for kind in kinds]
+    pipe = get_redis(write=True).pipeline(transaction=False)
+    pipe.mget([redis_key(key), *(redis_key(version_key) for version_key in version_keys)])
+    queue_incr_metric(pipe, _metric_names(name)[0])
+    pipe.sadd(redis_key(_names_key()), name)
+    raw, *raw_versions = pipe.execute()[0]
+    versions = tuple(0 if value is None else _serializer.loads(value) for value in raw_versions)
+    if raw is not None:
+        stored_versions, html = _serializer.loads(raw)
+        if stored_versions == versions:
+            return versions, html
+    return versions, None
+
+
+def store_fragment(name: str, identity_id: int, vary_on: list, versions: tuple, html: str) -> None:
+    # Stored under the versions read before rendering: a bump that lands
+    # meanwhile retires this copy on the next lookup.
+    cache.set(fragment_cache_key(name, identity_id, vary_on), (versions, html), timeout=FRAGMENT_CACHE_TIMEOUT)
+    incr_metric(_metric_names(name)[1])
+
+
+def fragment_names() -> list[str]:
+    members = get_redis().smembers(redis_key(_names_key()))
+    return sorted(member.decode("utf-8") for member in members)
+
+
+def fragment_hit_ratios() -> dict[str, tuple[int, int]]:
+    """(lookups, hits) for every fragment rendered since the last reset."""
+    ratios = {}
+    for name in fragment_names():
+        lookups_name, misses_name = _metric_names(name)
+        counts = get_metrics(lookups_name, misses_name)
+        ratios[name] = (counts[lookups_name], counts[lookups_name] - counts[misses_name])
+    return ratios
+
+
+def reset_fragment_stats() -> None:
+    names = fragment_names()
+    reset_metrics(*(metric for name in names for metric in _metric_names(name)))
+    cache.delete(_names_key())
+
+
+def identity_saved(sender, instance, created: bool = False, update_fields=None, **kwargs) -> None:
+    if created:
+        return
+    bump_fragment_versions(instance.pk, PROFILE)
+    if update_fields is not None and not set(update_fields) & set(CARD_FIELDS):
+        return
+    # Everyone who picked this identity shows its name in their picks grid.
+    picker_ids = instance.incoming_picks.values_list("picker_id", flat=True)
+    bump_on_commit(*(fragment_version_key(PICKS, picker_id) for picker_id in picker_ids))
@@ -0,0 +1,173 @@
+# plants/identity_cache.py
+from __future__ import annotations
+
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils.functional import LazyObject, empty
+
+from gardn.cache import jittered
+from gardn.invalidation import delete_on_commit
+
+from .models import UserIdentity
+from .page_cache import invalidate_page
+
+IDENTITY_CACHE_TIMEOUT = 3600  # 1 hour
+# Short, so a username that gets claimed later is not hidden for long if an eviction is missed.
+UNKNOWN_IDENTITY_CACHE_TIMEOUT = 300
+IDENTITY_CACHE_VERSION = "v2"  # v2: the session entry is a CachedIdentity tuple, not a pickled row
+
+_UNKNOWN = "unknown"
+
+
+class CachedIdentity(NamedTuple):
+    """What public views need to resolve a username, without the counters that change on every pick."""
+
+    id: int
+    username: str
+    me_url: str
+    display_name: str
+    show_harvests_on_profile: bool
+    animate_plant_motion: bool
+    website_verified: bool
+
+
+_FIELDS = CachedIdentity._fields
+
+
+def identity_cache_key(username: str) -> str:
+    return f"identity:{IDENTITY_CACHE_VERSION}:{username}"
+
+
+def _record(identity: UserIdentity) -> tuple:
+    # Stored as a plain tuple: smaller pickles, and no class path baked into the cache.
+    return tuple(getattr(identity, field) for field in _FIELDS)
+
+
+def resolve_identity(username: str) -> CachedIdentity | UserIdentity | None:
+    """The identity for ``username``, from the cache when possible; unknown names are cached too.
+
+    On a cache miss the row has to be read anyway, so the full model instance
+    is returned and callers that need it do not query again.
+    """
+    key = identity_cache_key(username)
+    cached = cache.get(key)
+    if cached == _UNKNOWN:
+        return None
+    if cached is not None:
+        return CachedIdentity(*cached)
+    identity = UserIdentity.objects.filter(username=username).first()
+    if identity is None:
+        cache.set(key, _UNKNOWN, timeout=UNKNOWN_IDENTITY_CACHE_TIMEOUT)
+        return None
+    cache.set(key, _record(identity), timeout=jittered(IDENTITY_CACHE_TIMEOUT))
+    return identity
+
+
+def get_identity_or_404(username: str) -> CachedIdentity | UserIdentity:
+    identity = resolve_identity(username)
+    if identity is None:
+        raise Http404("No identity with that username")
+    return identity
+
+
+def full_identity(identity: CachedIdentity | UserIdentity) -> UserIdentity:
+    if isinstance(identity, CachedIdentity):
+        # The record can outlive its row by the time the delete's eviction commits.
+        return get_object_or_404(UserIdentity, pk=identity.id)
+    return identity
+
+
+def get_full_identity_or_404(username: str, viewer: UserIdentity | None = None) -> UserIdentity:
+    """The model row, for views that need counters or profile text; unknown names still never reach the DB.
+
+    Pass the signed-in ``viewer`` (request.identity) when the view loads it
+    anyway: people looking at their own page then cost one query, not two.
+    """
+    identity = get_identity_or_404(username)
+    if not isinstance(identity, CachedIdentity):
+        return identity
+    if viewer and viewer.id == identity.id:
+        return viewer
+    return get_object_or_404(UserIdentity, pk=identity.id)
+
+
+def session_identity_cache_key(identity_id: int) -> str:
+    return f"session-identity:{IDENTITY_CACHE_VERSION}:{identity_id}"
+
+
+class SessionIdentityGone(Http404):
+    """The session's identity was deleted after its record was cached."""
+
+
+class SessionIdentity(LazyObject):
+    """The signed-in identity behind a cached CachedIdentity record.
+
+    The record's fields are answered without a query; anything else (the
+    counters, saving, handing it to the ORM) loads the row on first use.
+    """
+
+    def __init__(self, record: CachedIdentity) -> None:
+        self.__dict__["_record"] = record
+        super().__init__()
+
+    def _setup(self) -> None:
+        identity = UserIdentity.objects.filter(pk=self._record.id).first()
+        if identity is None:
+            raise SessionIdentityGone("The signed-in identity no longer exists")
+        self._wrapped = identity
+
+    def __getattr__(self, name: str):
+        if self._wrapped is empty:
+            if name in _FIELDS:
+                return getattr(self._record, name)
+            self._setup()
+        return getattr(self._wrapped, name)
+
+    def __bool__(self) -> bool:
+        return True
+
+
+def load_session_identity(identity_id: int | None) -> SessionIdentity | UserIdentity | None:
+    """The signed-in identity for a session's ``identity_id``.
+
+    With REQUEST_IDENTITY_CACHE_TIMEOUT set, the identity's CachedIdentity
+    record is reused across that many seconds of requests and the row is
+    only read if a view needs more. Saves and deletes evict the record.
+    """
+    if not identity_id:
+        return None
+    timeout = settings.REQUEST_IDENTITY_CACHE_TIMEOUT
+    if timeout <= 0:
+        return UserIdentity.objects.filter(id=identity_id).first()
+    key = session_identity_cache_key(identity_id)
+    cached = cache.get(key)
+    if cached is not None:
+        return SessionIdentity(CachedIdentity(*cached))
+    identity = UserIdentity.objects.filter(id=identity_id).first()
+    if identity is not None:
+        cache.set(key, _record(identity), timeout=timeout)
+    return identity
+
+
+def forget_identity(instance: UserIdentity, *usernames: str | None) -> None:
+    usernames = [username for username in (instance.username, *usernames) if username]
+    keys = [identity_cache_key(username) for username in usernames]
+    if instance.pk is not None:
+        keys.append(session_identity_cache_key(instance.pk))
+    delete_on_commit(*keys)
+    # Profile text and names are on the cached profile pages too.
+    for username in usernames:
+        invalidate_page(username)
+
+
+def identity_saved(sender, instance: UserIdentity, **kwargs) -> None:
+    # A rename leaves the old name cached too; verify_website_view renames Mastodon identities.
+    forget_identity(instance, getattr(instance, "_loaded_username", None))
+
+
+def identity_deleted(sender, instance: UserIdentity, **kwargs) -> None:
+    forget_identity(instance)
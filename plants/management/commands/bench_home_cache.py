@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import time
+
+from django.core.cache.backends.redis import RedisSerializer
+from django.core.management.base import BaseCommand
+
+from plants.cards import GardenCard
+from plants.models import UserIdentity
+
+
+def _identities(count: int) -> list[UserIdentity]:
+    # Unsaved rows shaped like real ones, bio and tokens included, so no database is needed.
+    return [
+        UserIdentity(
+            id=i,
+            me_url=f"https://bench-{i}.example/",
+            username=f"bench-{i}-example",
+            display_name=f"Bench Person {i}",
+            photo_url=f"https://bench-{i}.example/photo.jpg",
+            bio="Tending a small garden of links. " * 8,
+            login_method="mastodon",
+            mastodon_handle=f"@bench{i}@social.example",
+            mastodon_profile_url=f"https://social.example/@bench{i}",
+            mastodon_access_token="t" * 43,
+            harvest_digest="0" * 64,
+            incoming_pick_count=i,
+        )
+        for i in range(count)
+    ]
+
+
+def _seconds_per_call(fn, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds
+
+
+class Command(BaseCommand):
+    help = "Compare the cached size and load time of home-page lists as models and as GardenCard tuples."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--sizes", type=int, nargs="+", default=[12, 24, 100])
+        parser.add_argument("--rounds", type=int, default=2000)
+
+    def handle(self, *args, **options) -> None:
+        serializer = RedisSerializer()  # what the cache backend stores in Redis
+        self.stdout.write(f"{'items':>6}{'models B':>11}{'cards B':>10}{'models us':>11}{'cards us':>10}{'speedup':>9}")
+        for size in options["sizes"]:
+            identities = _identities(size)
+            cards = [
+                tuple(GardenCard(i.username, i.display_name, i.me_url, i.incoming_pick_count))
+                for i in identities
+            ]
+            models_payload = serializer.dumps(identities)
+            cards_payload = serializer.dumps(cards)
+            models_s = _seconds_per_call(lambda: serializer.loads(models_payload), options["rounds"])
+            # Cards are rebuilt into GardenCard on read, so time that too.
+            cards_s = _seconds_per_call(
+                lambda: [GardenCard._make(row) for row in serializer.loads(cards_payload)], options["rounds"]
+            )
+            self.stdout.write(
+                f"{size:>6}{len(models_payload):>11,}{len(cards_payload):>10,}"
+                f"{models_s * 1e6:>11.1f}{cards_s * 1e6:>10.1f}{models_s / cards_s:>8.1f}x"
+            )
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import hashlib
+import time
+from collections.abc import Callable
+
+from django.core.management.base import BaseCommand
+
+from plants import svg
+from plants.svg import _render, _render_reference, _RenderContext, traits_from_seed
+
+
+def _inputs(count: int) -> list[_RenderContext]:
+    return [
+        _RenderContext.from_seed(hashlib.sha256(f"bench-{i}".encode("utf-8")).hexdigest(), i % 23, i % 19)
+        for i in range(count)
+    ]
+
+
+def _best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _renders_per_second(render, inputs: list[_RenderContext], motion_enabled: bool, repeat: int) -> float:
+    def run() -> None:
+        for ctx in inputs:
+            render(ctx, motion_enabled)
+
+    return len(inputs) / _best_of(repeat, run)
+
+
+def _components(motion_enabled: bool) -> dict[str, Callable[[_RenderContext], object]]:
+    return {
+        "traits_from_seed": lambda ctx: traits_from_seed.__wrapped__(ctx.seed, ctx.traits.harvest_count, ctx.traits.pick_count),
+        "context": lambda ctx: _RenderContext(ctx.seed, ctx.traits),
+        "defs": lambda ctx: svg._defs(ctx.traits),
+        "background": lambda ctx: svg._background(ctx.traits),
+        "aura": lambda ctx: svg._aura(ctx.traits, motion_enabled),
+        "tech_flares": lambda ctx: svg._tech_flares(ctx, motion_enabled),
+        "growth_feature": lambda ctx: svg._growth_feature(ctx, motion_enabled),
+        "trunk": lambda ctx: svg._trunk(ctx.traits),
+        "canopy": svg._canopy,
+        "flowers": lambda ctx: svg._flowers(ctx, motion_enabled),
+        "pot": lambda ctx: svg._pot(ctx.traits),
+    }
+
+
+class Command(BaseCommand):
+    help = "Compare plant SVG renders/sec between the reference and fragment-table renderers."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--seeds", type=int, default=5000)
+        parser.add_argument("--repeat", type=int, default=3, help="Best of N timed passes.")
+        parser.add_argument("--motion", action="store_true", help="Render with motion enabled.")
+        parser.add_argument("--components", action="store_true", help="Also time each render component.")
+
+    def handle(self, *args, **options) -> None:
+        inputs = _inputs(options["seeds"])
+        motion_enabled = options["motion"]
+        repeat = max(1, options["repeat"])
+
+        # Warm the fragment tables so their one-off build isn't counted.
+        for ctx in inputs:
+            _render(ctx, motion_enabled)
+
+        reference = _renders_per_second(_render_reference, inputs, motion_enabled, repeat)
+        tables = _renders_per_second(_render, inputs, motion_enabled, repeat)
+
+        self.stdout.write(f"seeds:     {len(inputs)} (motion={int(motion_enabled)})")
+        self.stdout.write(f"reference: {reference:,.0f} renders/sec")
+        self.stdout.write(f"tables:    {tables:,.0f} renders/sec ({tables / reference:.2f}x)")
+
+        if not options["components"]:
+            return
+
+        self.stdout.write("")
+        for name, component in _components(motion_enabled).items():
+            elapsed = _best_of(repeat, lambda: [component(ctx) for ctx in inputs])
+            self.stdout.write(f"{name:<17} {elapsed / len(inputs) * 1e6:8.2f} us/call")
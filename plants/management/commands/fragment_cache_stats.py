@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from plants.fragment_cache import fragment_hit_ratios, reset_fragment_stats
+
+
+class Command(BaseCommand):
+    help = "Report the hit ratio of every {% gardn_cache %} fragment."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--reset", action="store_true", help="Zero the counters after reporting.")
+
+    def handle(self, *args, **options) -> None:
+        ratios = fragment_hit_ratios()
+        if not ratios:
+            self.stdout.write("no fragments rendered yet")
+        for name, (lookups, hits) in ratios.items():
+            hit_pct = round(hits / lookups * 100) if lookups else 0
+            self.stdout.write(f"{name:<20} lookups: {lookups:>8}  hits: {hits:>8}  ({hit_pct}% hit)")
+        if options["reset"]:
+            reset_fragment_stats()
@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from plants.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = "Recount pick and harvest counters on UserIdentity and repair any drift."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--identity", type=int, action="append", dest="identity_ids", help="Limit to identity id (repeatable).")
+
+    def handle(self, *args, **options) -> None:
+        repaired = reconcile_counters(options["identity_ids"])
+        self.stdout.write(f"Repaired counters for {repaired} identit{'y' if repaired == 1 else 'ies'}.")
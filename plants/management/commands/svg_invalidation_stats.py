@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from gardn.metrics import get_metrics, reset_metrics
+from plants.svg_cache import SVG_INVALIDATION_METRICS
+
+
+class Command(BaseCommand):
+    help = "Report how many pick-driven SVG invalidations were applied or skipped."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--reset", action="store_true", help="Zero the counters after reporting.")
+
+    def handle(self, *args, **options) -> None:
+        hit_name, skip_name = SVG_INVALIDATION_METRICS
+        counts = get_metrics(*SVG_INVALIDATION_METRICS)
+        hits, skips = counts[hit_name], counts[skip_name]
+        total = hits + skips
+        skipped_pct = round(skips / total * 100) if total else 0
+        self.stdout.write(f"invalidated: {hits}  skipped: {skips}  ({skipped_pct}% skipped)")
+        if options["reset"]:
+            reset_metrics(*SVG_INVALIDATION_METRICS)
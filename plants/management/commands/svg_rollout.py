@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from plants.svg import SVG_RENDER_VERSION
+from plants.svg_cache import flip_rollout, rollout_is_live, rollout_previous_version
+from plants.svg_rollout import (
+    PRERENDER_BATCH_SIZE,
+    prerender_batch,
+    reset_rollout,
+    rollout_progress,
+)
+from plants.tasks import prerender_svg_version
+
+
+class Command(BaseCommand):
+    help = "Pre-render plants at the current render version, most-picked first, and flip over to it."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--run", action="store_true", help="Pre-render every remaining batch here.")
+        parser.add_argument("--queue", action="store_true", help="Hand the pre-render to Celery.")
+        parser.add_argument("--flip", action="store_true", help="Serve the current version now, whatever the coverage.")
+        parser.add_argument("--reset", action="store_true", help="Drop the snapshot and start again from the top.")
+        parser.add_argument("--batch-size", type=int, default=PRERENDER_BATCH_SIZE)
+
+    def handle(self, *args, **options) -> None:
+        if options["reset"]:
+            reset_rollout()
+        if options["queue"]:
+            prerender_svg_version.delay(options["batch_size"])
+            self.stdout.write("Pre-render queued.")
+        if options["run"]:
+            progress = rollout_progress()
+            while not progress.done:
+                progress = prerender_batch(options["batch_size"])
+                self.stdout.write(f"{progress.claimed}/{progress.queued} pre-rendered")
+        if options["flip"]:
+            flip_rollout()
+        self._status()
+
+    def _status(self) -> None:
+        progress = rollout_progress()
+        previous = rollout_previous_version()
+        self.stdout.write(f"render version:  {SVG_RENDER_VERSION}")
+        self.stdout.write(f"rolling from:    {previous or '-'}")
+        self.stdout.write(f"pre-rendered:    {progress.claimed}/{progress.queued}")
+        self.stdout.write(f"rendered:        {progress.rendered}/{progress.queued} ({progress.coverage:.1%})")
+        self.stdout.write(f"flip threshold:  {settings.SVG_ROLLOUT_THRESHOLD:.0%}")
+        if previous is None:
+            self.stdout.write(f"serving:         {SVG_RENDER_VERSION} (no rollout configured)")
+        else:
+            self.stdout.write(f"serving:         {SVG_RENDER_VERSION if rollout_is_live() else previous}")
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import hashlib
+import statistics
+
+from django.core.management.base import BaseCommand
+
+from plants.svg import SVG_RENDER_VERSION, _render, _RenderContext
+from plants.svg_cache import IDENTITY, encode_svg
+
+
+def _corpus(count: int) -> list[_RenderContext]:
+    # Same spread of seeds and activity as bench_svg, so runs are comparable.
+    return [
+        _RenderContext.from_seed(hashlib.sha256(f"bench-{i}".encode("utf-8")).hexdigest(), i % 23, i % 19)
+        for i in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = "Report average bytes per plant SVG for the current render version, verbose vs compact."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--seeds", type=int, default=1000)
+        parser.add_argument("--motion", action="store_true", help="Render with motion enabled.")
+
+    def handle(self, *args, **options) -> None:
+        corpus = _corpus(options["seeds"])
+        motion = options["motion"]
+        self.stdout.write(f"render {SVG_RENDER_VERSION}, {len(corpus)} seeds, motion={'on' if motion else 'off'}")
+        # "cached" is what one render costs in Redis: encode_svg stores all three bodies.
+        self.stdout.write(f"{'mode':<10}{'raw':>10}{'gzip':>10}{'br':>10}{'cached':>10}")
+        baseline = None
+        for mode, compact in (("verbose", False), ("compact", True)):
+            # Encoded exactly as the cache stores them.
+            encoded = [encode_svg(_render(ctx, motion, compact)) for ctx in corpus]
+            raw = statistics.mean(len(bodies[IDENTITY].encode("utf-8")) for bodies in encoded)
+            gz = statistics.mean(len(bodies["gzip"]) for bodies in encoded)
+            br = statistics.mean(len(bodies["br"]) for bodies in encoded)
+            sizes = (raw, gz, br, raw + gz + br)
+            baseline = baseline or sizes
+            self.stdout.write(
+                f"{mode:<10}" + "".join(f"{size:>10.0f}" for size in sizes)
+                + "  (" + " / ".join(f"{size / base:.0%}" for size, base in zip(sizes, baseline)) + " of verbose)"
+            )
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def digest_harvest_urls(urls):
+    # Frozen copy of plants.svg.digest_harvest_urls as of this migration:
+    # per-URL SHA-256 values summed modulo 2**256, "" when empty.
+    value = sum(int.from_bytes(hashlib.sha256(url.encode("utf-8")).digest(), "big") for url in urls) % (1 << 256)
+    return f"{value:064x}" if value else ""
+
+
+def backfill_harvest_digests(apps, schema_editor):
+    UserIdentity = apps.get_model("plants", "UserIdentity")
+    Harvest = apps.get_model("harvests", "Harvest")
+    for identity in UserIdentity.objects.only("id").iterator():
+        urls = Harvest.objects.filter(identity_id=identity.id).values_list("url", flat=True)
+        digest = digest_harvest_urls(urls)
+        if digest:
+            UserIdentity.objects.filter(id=identity.id).update(harvest_digest=digest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plants", "0006_remove_useridentity_svg_cache"),
+        ("harvests", "0003_harvest_mastodon_posted"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="useridentity",
+            name="harvest_digest",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.RunPython(backfill_harvest_digests, migrations.RunPython.noop),
+    ]
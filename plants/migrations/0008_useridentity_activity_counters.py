@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _count(queryset, field):
+    counts = queryset.filter(**{field: OuterRef("pk")}).order_by().values(field).annotate(n=Count("pk")).values("n")
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def backfill_counters(apps, schema_editor):
+    UserIdentity = apps.get_model("plants", "UserIdentity")
+    Pick = apps.get_model("picks", "Pick")
+    Harvest = apps.get_model("harvests", "Harvest")
+    UserIdentity.objects.update(
+        incoming_pick_count=_count(Pick.objects.all(), "picked"),
+        outgoing_pick_count=_count(Pick.objects.all(), "picker"),
+        harvest_count=_count(Harvest.objects.all(), "identity"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plants", "0007_useridentity_harvest_digest"),
+        ("picks", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="useridentity",
+            name="harvest_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="useridentity",
+            name="incoming_pick_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="useridentity",
+            name="outgoing_pick_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
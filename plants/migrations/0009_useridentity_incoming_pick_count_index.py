@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plants', '0008_useridentity_activity_counters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='useridentity',
+            name='incoming_pick_count',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+    ]
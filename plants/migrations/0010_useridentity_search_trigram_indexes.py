@@ -0,0 +1,36 @@
+from django.db import migrations
+
+# Trigram GIN indexes over the exact expression Django's icontains compiles to
+# on Postgres (UPPER("col"::text) LIKE UPPER(%s)), so identity search can use them.
+TRIGRAM_INDEXES = {
+    "plants_identity_username_trgm": "username",
+    "plants_identity_display_name_trgm": "display_name",
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return  # other databases keep searching with a scan
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, column in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON plants_useridentity USING gin ((UPPER("{column}"::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plants', '0009_useridentity_incoming_pick_count_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
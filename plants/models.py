@@ -20,8 +20,21 @@ class UserIdentity(models.Model):
     mastodon_profile_url = models.URLField(blank=True)
     mastodon_access_token = models.TextField(blank=True)
     website_verified = models.BooleanField(default=True)
+    # Order-independent digest of this identity's harvest URLs; seeds plant growth.
+    harvest_digest = models.CharField(max_length=64, blank=True)
+    # Denormalized activity counters, kept in step by plants.counters.
+    incoming_pick_count = models.PositiveIntegerField(default=0, db_index=True)
+    outgoing_pick_count = models.PositiveIntegerField(default=0)
+    harvest_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so that saving a renamed identity also evicts the old username's cache entry.
+        instance._loaded_username = instance.__dict__.get("username")
+        return instance
+
     def __str__(self) -> str:
         return self.display_name or self.me_url
@@ -0,0 +1,88 @@
+# plants/page_cache.py
+from __future__ import annotations
+
+import hashlib
+from functools import wraps
+from typing import Callable
+from urllib.parse import urlencode
+
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpRequest, HttpResponse
+
+from gardn.invalidation import bump_on_commit
+
+PAGE_CACHE_TIMEOUT = 300  # seconds; generations retire changed pages sooner
+PAGE_CACHE_VERSION = "v1"
+
+
+def page_generation_key(username: str) -> str:
+    return f"page-gen:{username}"
+
+
+def page_generation(username: str) -> int:
+    return cache.get(page_generation_key(username), 0)
+
+
+def invalidate_page(username: str) -> None:
+    """Retire every cached page and fragment showing ``username``'s profile, once the transaction commits."""
+    bump_on_commit(page_generation_key(username))
+
+
+def _page_cache_key(request: HttpRequest, params: dict[str, str]) -> str:
+    # Host is part of the page (og:url), and hashing keeps odd paths out of the key.
+    raw = f"{request.get_host()}{request.path}?{urlencode(sorted(params.items()))}"
+    return f"page:{PAGE_CACHE_VERSION}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]}"
+
+
+def _cacheable_request(request: HttpRequest, params: tuple[str, ...]) -> bool:
+    if request.method not in ("GET", "HEAD"):
+        return False
+    if request.session.get("identity_id"):
+        return False
+    # A flash message ("Logged out.") makes this copy of the page personal.
+    if len(get_messages(request)):
+        return False
+    return all(name in params for name in request.GET)
+
+
+def anonymous_page_cache(
+    timeout: int,
+    *,
+    generation: Callable[..., str] | None = None,
+    params: tuple[str, ...] = (),
+):
+    """Serve the whole rendered page to visitors without a session from the cache.
+
+    ``generation`` maps the view's arguments to a generation counter key; a
+    stored page is only served while that counter is unchanged, so bumping
+    it retires the page everywhere. Requests with query parameters other
+    than ``params`` skip the cache, as do non-200 responses and responses
+    that set cookies.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+            if not _cacheable_request(request, params):
+                return view(request, *args, **kwargs)
+
+            key = _page_cache_key(request, {name: request.GET[name] for name in params if name in request.GET})
+            generation_key = generation(*args, **kwargs) if generation else None
+            found = cache.get_many([key, generation_key] if generation_key else [key])
+            current = found.get(generation_key, 0) if generation_key else 0
+            stored = found.get(key)
+            if stored is not None and stored[0] == current:
+                _, content_type, content = stored
+                return HttpResponse(content, content_type=content_type)
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming and not response.cookies:
+                # Stored under the generation read before rendering: a bump
+                # that lands meanwhile retires this copy on the next request.
+                cache.set(key, (current, response["Content-Type"], response.content), timeout=timeout)
+            return response
+
+        return wrapped
+
+    return decorator
@@ -0,0 +1,90 @@
+# plants/search.py
+from __future__ import annotations
+
+import hashlib
+
+from django.core.cache import cache
+from django.core.cache.backends.redis import RedisSerializer
+from django.db import connection
+from django.db.models import Case, FloatField, Q, Value, When
+
+from gardn.redis_client import get_redis, redis_key
+
+from .cards import GardenCard, garden_cards
+from .models import UserIdentity
+
+SEARCH_RESULT_LIMIT = 24
+SEARCH_CACHE_TIMEOUT = 60  # seconds, like the home page lists
+# A query is cached once it has been searched this often within the window.
+SEARCH_POPULAR_AFTER = 3
+SEARCH_POPULARITY_WINDOW = 3600
+SEARCH_CACHE_VERSION = "v1"
+MAX_QUERY_LENGTH = 100
+
+EXACT_BOOST = 2.0
+PREFIX_BOOST = 1.0
+
+_serializer = RedisSerializer()
+
+
+def normalize_query(q: str) -> str:
+    # Matching is case-insensitive, so "Alice" and "alice " share a cache entry.
+    return " ".join(q.split()).lower()[:MAX_QUERY_LENGTH]
+
+
+def _query_digest(query: str) -> str:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()[:32]
+
+
+def search_cache_key(query: str) -> str:
+    return f"search:{SEARCH_CACHE_VERSION}:{_query_digest(query)}"
+
+
+def search_count_key(query: str) -> str:
+    return f"search-count:{SEARCH_CACHE_VERSION}:{_query_digest(query)}"
+
+
+def _ranked(query: str):
+    matches = UserIdentity.objects.filter(Q(username__icontains=query) | Q(display_name__icontains=query))
+    boost = Case(
+        When(Q(username__iexact=query) | Q(display_name__iexact=query), then=Value(EXACT_BOOST)),
+        When(Q(username__istartswith=query) | Q(display_name__istartswith=query), then=Value(PREFIX_BOOST)),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    if connection.vendor == "postgresql":
+        # Imported here: django.contrib.postgres needs psycopg, which SQLite setups may lack.
+        from django.contrib.postgres.search import TrigramSimilarity
+        from django.db.models.functions import Greatest
+
+        score = boost + Greatest(TrigramSimilarity("username", query), TrigramSimilarity("display_name", query))
+    else:
+        score = boost
+    return matches.annotate(score=score).order_by("-score", "username")
+
+
+def search_identities(q: str, limit: int = SEARCH_RESULT_LIMIT) -> list[GardenCard]:
+    """Identities whose username or display name contains ``q``, best match first.
+
+    Exact and prefix matches rank first; on Postgres the rest are ordered by
+    trigram similarity and the match itself is served by trigram GIN
+    indexes (migration 0010). Queries searched SEARCH_POPULAR_AFTER times
+    within the popularity window are cached for SEARCH_CACHE_TIMEOUT.
+    """
+    query = normalize_query(q)
+    if not query:
+        return []
+    key, count_key = redis_key(search_cache_key(query)), redis_key(search_count_key(query))
+    pipe = get_redis(write=True).pipeline(transaction=False)
+    pipe.get(key)
+    # Starts the window on the first search; the INCR keeps its expiry.
+    pipe.set(count_key, 0, ex=SEARCH_POPULARITY_WINDOW, nx=True)
+    pipe.incr(count_key)
+    raw, _, searches = pipe.execute()
+    if raw is not None:
+        return [GardenCard._make(row) for row in _serializer.loads(raw)]
+
+    cards = garden_cards(_ranked(query)[:limit])
+    if searches >= SEARCH_POPULAR_AFTER:
+        cache.set(search_cache_key(query), [tuple(card) for card in cards], timeout=SEARCH_CACHE_TIMEOUT)
+    return cards
@@ -1,11 +1,16 @@
 from __future__ import annotations
 
+import bisect
+import functools
 import hashlib
 import math
-from dataclasses import dataclass
+import re
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, replace
+from typing import NamedTuple
 
 
-SVG_RENDER_VERSION = "v7"
+SVG_RENDER_VERSION = "v9"
 
 
 @dataclass(frozen=True)
@@ -41,21 +46,41 @@ PALETTES = [
 ]
 
 
+# Activity (harvests + picks) only reaches the plant through these thresholds.
+_ACTIVITY_THRESHOLDS = (3, 8, 15)
+_POT_POOLS = (
+    (0, 1, 2, 3),
+    (1, 2, 3, 4, 5),
+    (2, 3, 4, 5, 6),
+    (3, 4, 5, 6, 7),
+)
+
+
 def _biased_pot_style(seed_value: int, harvest_count: int, pick_count: int) -> int:
-    activity = harvest_count + pick_count
-    if activity < 3:
-        pool = (0, 1, 2, 3)
-    elif activity < 8:
-        pool = (1, 2, 3, 4, 5)
-    elif activity < 15:
-        pool = (2, 3, 4, 5, 6)
-    else:
-        pool = (3, 4, 5, 6, 7)
+    pool = _POT_POOLS[bisect.bisect_right(_ACTIVITY_THRESHOLDS, harvest_count + pick_count)]
     return pool[seed_value % len(pool)]
 
 
+def count_buckets(harvest_count: int, pick_count: int) -> tuple[int, int, int]:
+    """The coarse values traits_from_seed actually reads from the two counts.
+
+    Two (harvest_count, pick_count) pairs with the same buckets render the
+    same plant for the same seed.
+    """
+    growth = bisect.bisect_right((1, 5, 10), harvest_count)
+    bloom = bisect.bisect_right((4, 11), harvest_count)
+    activity = bisect.bisect_right(_ACTIVITY_THRESHOLDS, harvest_count + pick_count)
+    return growth, bloom, activity
+
+
+def _decode_seed(seed: str) -> bytes:
+    # The first 16 bytes of the hex seed drive every trait and component.
+    return bytes.fromhex(seed[:32])
+
+
+@functools.lru_cache(maxsize=4096)
 def traits_from_seed(seed: str, harvest_count: int = 0, pick_count: int = 0) -> PlantTraits:
-    nums = [int(seed[i: i + 2], 16) for i in range(0, 32, 2)]
+    nums = _decode_seed(seed)
 
     if harvest_count == 0:
         growth_feature = 0
@@ -95,6 +120,39 @@ def traits_from_seed(seed: str, harvest_count: int = 0, pick_count: int = 0) ->
     )
 
 
+# (cos, sin) for every leaf angle the canopy can produce, indexed as
+# _LEAF_TRIG[leaf_count][leaf_index][jitter]. The angle expression matches the
+# original per-leaf math exactly so the rendered coordinates do not move.
+_LEAF_TRIG = {
+    leaf_count: tuple(
+        tuple(
+            (math.cos(math.radians((360 / leaf_count) * i + jitter)),
+             math.sin(math.radians((360 / leaf_count) * i + jitter)))
+            for jitter in range(18)
+        )
+        for i in range(leaf_count)
+    )
+    for leaf_count in range(8, 16)
+}
+
+
+class _RenderContext:
+    """Everything a render derives from the seed, decoded once per plant."""
+
+    __slots__ = ("seed", "nums", "traits", "leaf_trig")
+
+    def __init__(self, seed: str, traits: PlantTraits) -> None:
+        self.seed = seed
+        self.nums = _decode_seed(seed)
+        self.traits = traits
+        per_leaf = _LEAF_TRIG[traits.leaf_count]
+        self.leaf_trig = tuple(per_leaf[i][self.nums[i % 8] % 18] for i in range(traits.leaf_count))
+
+    @classmethod
+    def from_seed(cls, seed: str, harvest_count: int = 0, pick_count: int = 0) -> _RenderContext:
+        return cls(seed, traits_from_seed(seed, harvest_count, pick_count))
+
+
 def _defs(traits: PlantTraits) -> str:
     _, leaf, accent, light = traits.palette
     return (
@@ -213,29 +271,75 @@ def _leaf_blob(cx: int, cy: int, rx: int, ry: int, traits: PlantTraits, idx: int
     )
 
 
-def _canopy(traits: PlantTraits, seed: str) -> str:
-    nums = [int(seed[i: i + 2], 16) for i in range(0, 32, 2)]
+def _leaf_geometry(ctx: _RenderContext) -> Iterator[tuple[int, int, int, int]]:
+    """(cx, cy, rx, ry) of every leaf, in drawing order."""
+    traits = ctx.traits
+    nums = ctx.nums
     size_mult = [0.85, 1.0, 1.18][traits.leaf_size]
     center_x = 148
     center_y = 103
     radius = [26, 31, 28, 33][traits.canopy_style]
-    leaves: list[str] = []
 
-    for i in range(traits.leaf_count):
-        angle = (360 / traits.leaf_count) * i + (nums[i % 8] % 18)
-        radians = math.radians(angle)
+    for i, (cos, sin) in enumerate(ctx.leaf_trig):
         distance = radius + ((i * 3 + nums[(i + 3) % 8]) % 10) - 4
-        cx = center_x + int(math.cos(radians) * distance)
-        cy = center_y + int(math.sin(radians) * (distance * 0.74))
+        cx = center_x + int(cos * distance)
+        cy = center_y + int(sin * (distance * 0.74))
         rx = int((10 + (nums[(i + 5) % 8] % 6)) * size_mult)
         ry = int((7 + (nums[(i + 7) % 8] % 5)) * size_mult)
-        leaves.append(_leaf_blob(cx, cy, rx, ry, traits, i))
+        yield cx, cy, rx, ry
+
+
+def _leaves(ctx: _RenderContext) -> str:
+    return "".join(
+        _leaf_blob(cx, cy, rx, ry, ctx.traits, i) for i, (cx, cy, rx, ry) in enumerate(_leaf_geometry(ctx))
+    )
+
+
+def _leaves_compact(ctx: _RenderContext) -> tuple[str, str]:
+    """Leaves as one <symbol> per distinct size plus a <use> per leaf.
+
+    Returns (symbols, uses). Each symbol is the _leaf_blob pair drawn around
+    the origin, so translate-then-rotate puts it exactly where _leaf_blob's
+    rotate(r cx cy) put the original ellipses.
+    """
+    symbol_ids: dict[tuple[int, int], str] = {}
+    uses: list[str] = []
+    for i, (cx, cy, rx, ry) in enumerate(_leaf_geometry(ctx)):
+        symbol_id = symbol_ids.setdefault((rx, ry), f"l{len(symbol_ids)}")
+        rotation = -18 + (i % 5) * 9
+        # Drawn already minified: compact renders do not run _minify over the leaves.
+        turn = f" rotate({rotation})" if rotation else ""
+        uses.append(f'<use href="#{symbol_id}" transform="translate({cx} {cy}){turn}"/>')
+    # The shared fill/filter/opacity live in the .l and .h rules (_leaf_style)
+    # so each symbol carries only its geometry.
+    symbols = "".join(
+        f'<symbol id="{symbol_id}" overflow="visible">'
+        f'<ellipse class="l" rx="{rx}" ry="{ry}"/>'
+        f'<ellipse class="h" cx="-2" cy="-2" rx="{max(1, rx - 4)}" ry="{max(1, ry - 4)}"/>'
+        "</symbol>"
+        for (rx, ry), symbol_id in symbol_ids.items()
+    )
+    return symbols, "".join(uses)
 
-    trunk_tip = (
+
+def _leaf_style(traits: PlantTraits) -> str:
+    return (
+        "<style>"
+        ".l{fill:url(#leaf-fill);filter:url(#leaf-glow);opacity:0.86}"
+        f".h{{fill:{traits.palette[3]};opacity:0.07}}"
+        "</style>"
+    )
+
+
+def _trunk_tip(traits: PlantTraits) -> str:
+    return (
         f'<path d="M148 92 Q 140 86 134 80" stroke="{traits.palette[0]}" stroke-width="2.8" fill="none" stroke-linecap="round" opacity="0.85"/>'
         f'<path d="M149 90 Q 159 82 168 82" stroke="{traits.palette[0]}" stroke-width="2.4" fill="none" stroke-linecap="round" opacity="0.82"/>'
     )
-    return trunk_tip + "".join(leaves)
+
+
+def _canopy(ctx: _RenderContext) -> str:
+    return _trunk_tip(ctx.traits) + _leaves(ctx)
 
 
 def _flower(cx: int, cy: int, traits: PlantTraits, idx: int, motion_enabled: bool) -> str:
@@ -270,18 +374,21 @@ def _flower(cx: int, cy: int, traits: PlantTraits, idx: int, motion_enabled: boo
     )
 
 
-def _flowers(traits: PlantTraits, seed: str, motion_enabled: bool) -> str:
-    nums = [int(seed[i: i + 2], 16) for i in range(0, 32, 2)]
-    positions = [
-        (132, 86),
-        (168, 88),
-        (148, 76),
-        (158, 98),
-        (138, 98),
-    ]
+_FLOWER_POSITIONS = (
+    (132, 86),
+    (168, 88),
+    (148, 76),
+    (158, 98),
+    (138, 98),
+)
+
+
+def _flowers(ctx: _RenderContext, motion_enabled: bool) -> str:
+    traits = ctx.traits
+    nums = ctx.nums
     blooms = []
     for i in range(traits.bloom_count):
-        base_x, base_y = positions[(nums[i] + i) % len(positions)]
+        base_x, base_y = _FLOWER_POSITIONS[(nums[i] + i) % len(_FLOWER_POSITIONS)]
         blooms.append(_flower(base_x, base_y, traits, i, motion_enabled))
     return "".join(blooms)
 
@@ -363,12 +470,13 @@ def _pot(traits: PlantTraits) -> str:
     )
 
 
-def _growth_feature(traits: PlantTraits, seed: str, motion_enabled: bool) -> str:
+def _growth_feature(ctx: _RenderContext, motion_enabled: bool) -> str:
+    traits = ctx.traits
     if traits.growth_feature == 0:
         return ""
 
     bark, leaf, accent, _ = traits.palette
-    nums = [int(seed[i: i + 2], 16) for i in range(0, 32, 2)]
+    nums = ctx.nums
 
     if traits.growth_feature == 1:
         vines = []
@@ -439,9 +547,9 @@ def _motion_close() -> str:
     return "</g>"
 
 
-def _tech_flares(traits: PlantTraits, seed: str, motion_enabled: bool) -> str:
-    _, leaf, accent, _ = traits.palette
-    nums = [int(seed[i: i + 2], 16) for i in range(0, 32, 2)]
+def _tech_flares(ctx: _RenderContext, motion_enabled: bool) -> str:
+    _, leaf, accent, _ = ctx.traits.palette
+    nums = ctx.nums
     particles = []
     for i in range(4):
         x = 95 + (nums[i] % 110)
@@ -461,37 +569,389 @@ def _tech_flares(traits: PlantTraits, seed: str, motion_enabled: bool) -> str:
     return "".join(particles)
 
 
+def _assemble(
+    motion_enabled: bool,
+    defs: str,
+    background: str,
+    aura: str,
+    flares: str,
+    motion_open: str,
+    growth: str,
+    trunk: str,
+    canopy: str,
+    flowers: str,
+    pot: str,
+    compact: bool = False,
+) -> str:
+    if compact:
+        return (
+            '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 300 240" role="img" aria-label="Garden plant">'
+            f'<!--render:{SVG_RENDER_VERSION};motion:{int(motion_enabled)}-->'
+            f'{defs}{background}{aura}{flares}{motion_open}{growth}{trunk}{canopy}{flowers}{pot}{_motion_close()}'
+            '</svg>'
+        )
+    return (
+        '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 300 240" role="img" aria-label="Garden plant">\n'
+        f'  <!-- render:{SVG_RENDER_VERSION};motion:{int(motion_enabled)} -->\n'
+        f'  {defs}\n'
+        f'  {background}\n'
+        f'  {aura}\n'
+        f'  {flares}\n'
+        f'  {motion_open}\n'
+        f'    {growth}\n'
+        f'    {trunk}\n'
+        f'    {canopy}\n'
+        f'    {flowers}\n'
+        f'    {pot}\n'
+        f'  {_motion_close()}\n'
+        '</svg>'
+    )
+
+
+def _render_reference(ctx: _RenderContext, motion_enabled: bool) -> str:
+    """Build every fragment from scratch. Kept as the oracle for the table engine."""
+    traits = ctx.traits
+    return _assemble(
+        motion_enabled,
+        _defs(traits),
+        _background(traits),
+        _aura(traits, motion_enabled),
+        _tech_flares(ctx, motion_enabled),
+        _motion_open(traits, motion_enabled),
+        _growth_feature(ctx, motion_enabled),
+        _trunk(traits),
+        _canopy(ctx),
+        _flowers(ctx, motion_enabled),
+        _pot(traits),
+    )
+
+
+# Trait values each table is enumerated over. These mirror the modulo
+# arithmetic in traits_from_seed; a new trait value needs a new entry here.
+_BG_STYLES = range(4)
+_AURA_STYLES = range(3)
+_MOTION_STYLES = range(3)
+_MOTION_DURATIONS = range(6, 11)
+_FLOWER_STYLES = range(5)
+_POT_STYLES = range(8)
+_POT_COLORWAYS = range(4)
+_MOTION_FLAGS = (False, True)
+
+
+@dataclass(frozen=True)
+class _FragmentTables:
+    defs: dict[tuple[str, ...], str]
+    background: dict[tuple, str]
+    aura: dict[tuple, str]
+    motion_open: dict[tuple, str]
+    trunk: dict[tuple, str]
+    trunk_tip: dict[tuple[str, ...], str]
+    flower: dict[tuple, str]
+    pot: dict[tuple, str]
+    leaf_style: dict[tuple[str, ...], str]
+    minified: bool = False
+
+
+@functools.cache
+def _fragment_tables() -> _FragmentTables:
+    """Pre-render every fragment that depends only on traits, once per process."""
+    base = traits_from_seed("0" * 64)
+    return _FragmentTables(
+        defs={p: _defs(replace(base, palette=p)) for p in PALETTES},
+        background={
+            (p, bg): _background(replace(base, palette=p, bg_style=bg))
+            for p in PALETTES
+            for bg in _BG_STYLES
+        },
+        aura={
+            (p, style, dur, motion): _aura(replace(base, palette=p, aura_style=style, motion_duration_s=dur), motion)
+            for p in PALETTES
+            for style in _AURA_STYLES
+            for dur in _MOTION_DURATIONS
+            for motion in _MOTION_FLAGS
+        },
+        motion_open={
+            (style, dur, motion): _motion_open(replace(base, motion_style=style, motion_duration_s=dur), motion)
+            for style in _MOTION_STYLES
+            for dur in _MOTION_DURATIONS
+            for motion in _MOTION_FLAGS
+        },
+        # ~5.7k trunk shapes: filled on first use instead of up front.
+        trunk={},
+        trunk_tip={p: _trunk_tip(replace(base, palette=p)) for p in PALETTES},
+        flower={
+            (p, pos, style, dur, motion): _flower(
+                pos[0], pos[1], replace(base, palette=p, flower_style=style, motion_duration_s=dur), 0, motion
+            )
+            for p in PALETTES
+            for pos in _FLOWER_POSITIONS
+            for style in _FLOWER_STYLES
+            for dur in _MOTION_DURATIONS
+            for motion in _MOTION_FLAGS
+        },
+        pot={
+            (p, style, colorway): _pot(replace(base, palette=p, pot_style=style, pot_colorway=colorway))
+            for p in PALETTES
+            for style in _POT_STYLES
+            for colorway in _POT_COLORWAYS
+        },
+        leaf_style={p: _leaf_style(replace(base, palette=p)) for p in PALETTES},
+    )
+
+
+@functools.cache
+def _compact_fragment_tables() -> _FragmentTables:
+    """_fragment_tables with every fragment already run through _minify.
+
+    _minify never rewrites across fragment boundaries, so a compact render
+    only has to minify the pieces drawn per plant.
+    """
+    tables = _fragment_tables()
+    minified = {
+        field: {key: _minify(fragment) for key, fragment in getattr(tables, field).items()}
+        for field in ("defs", "background", "aura", "motion_open", "trunk_tip", "flower", "pot", "leaf_style")
+    }
+    return _FragmentTables(**minified, trunk={}, minified=True)
+
+
+# Compact mode: short ids, no unused defs, no leading zeros on fractions.
+_COMPACT_IDS = {
+    "leaf-fill": "f",
+    "aura-fill": "a",
+    "leaf-glow": "g",
+    "soft-blur": "b",
+}
+_COMPACT_ID_RE = re.compile(r'(id="|url\(#)(' + "|".join(_COMPACT_IDS) + r")(?=[\")])")
+_UNUSED_DEFS_RE = re.compile(r'<linearGradient id="pot-fill".*?</linearGradient>')
+# The literal 0 comes first so the engine can skip ahead to candidates.
+_LEADING_ZERO_RE = re.compile(r"0(?<![\d.]0)\.(?=\d)")
+_PATH_DATA_RE = re.compile(r' (d|points)="([^"]*)"')
+_PATH_SPACING_RE = re.compile(r"\s*([A-Za-z,])\s*")
+# A bare <g> around self-closing shapes groups nothing; animations target their
+# parent, so groups holding one are left alone.
+_PLAIN_GROUP_RE = re.compile(r"<g>((?:<(?!g[ >/]|animate)[a-zA-Z][^>]*/>)*)</g>")
+
+
+def _tighten_path_data(match: re.Match[str]) -> str:
+    data = _PATH_SPACING_RE.sub(r"\1", match.group(2))
+    return f' {match.group(1)}="{data}"'
+
+
+def _minify(svg: str) -> str:
+    svg = _UNUSED_DEFS_RE.sub("", svg, count=1)
+    svg = svg.replace('<g id="plant-motion">', "<g>", 1)
+    svg = _COMPACT_ID_RE.sub(lambda m: m.group(1) + _COMPACT_IDS[m.group(2)], svg)
+    svg = _PATH_DATA_RE.sub(_tighten_path_data, svg)
+    svg = svg.replace(" rotate(0)", "")
+    svg = _PLAIN_GROUP_RE.sub(r"\1", svg)
+    return _LEADING_ZERO_RE.sub(".", svg)
+
+
+def _table_trunk(tables: _FragmentTables, traits: PlantTraits) -> str:
+    trunk_key = (traits.palette, traits.trunk_style, traits.trunk_curve, traits.trunk_width)
+    trunk = tables.trunk.get(trunk_key)
+    if trunk is None:
+        trunk = _trunk(traits)
+        trunk = tables.trunk[trunk_key] = _minify(trunk) if tables.minified else trunk
+    return trunk
+
+
+def _render(ctx: _RenderContext, motion_enabled: bool, compact: bool = False) -> str:
+    tables = _compact_fragment_tables() if compact else _fragment_tables()
+    traits = ctx.traits
+    palette = traits.palette
+    dur = traits.motion_duration_s
+
+    trunk = _table_trunk(tables, traits)
+
+    nums = ctx.nums
+    flowers = "".join(
+        tables.flower[(
+            palette,
+            _FLOWER_POSITIONS[(nums[i] + i) % len(_FLOWER_POSITIONS)],
+            (traits.flower_style + i) % 5,
+            dur,
+            motion_enabled,
+        )]
+        for i in range(traits.bloom_count)
+    )
+
+    defs = tables.defs[palette]
+    flares = _tech_flares(ctx, motion_enabled)
+    growth = _growth_feature(ctx, motion_enabled)
+    if compact:
+        symbols, leaves = _leaves_compact(ctx)
+        defs = defs[: -len("</defs>")] + tables.leaf_style[palette] + symbols + "</defs>"
+        flares, growth = _minify(flares), _minify(growth)
+    else:
+        leaves = _leaves(ctx)
+
+    return _assemble(
+        motion_enabled,
+        defs,
+        tables.background[(palette, traits.bg_style)],
+        tables.aura[(palette, traits.aura_style, dur, motion_enabled)],
+        flares,
+        tables.motion_open[(traits.motion_style, dur, motion_enabled)],
+        growth,
+        trunk,
+        tables.trunk_tip[palette] + leaves,
+        flowers,
+        tables.pot[(palette, traits.pot_style, traits.pot_colorway)],
+        compact=compact,
+    )
+
+
+_FILTER_ATTR_RE = re.compile(r' filter="[^"]*"')
+
+
+def _render_thumb(ctx: _RenderContext) -> str:
+    """Level of detail for 120x96 tiles.
+
+    Same silhouette and colours as _render, but without filters, gradients,
+    aura, particles or motion, and one plain ellipse per leaf.
+    """
+    tables = _fragment_tables()
+    traits = ctx.traits
+    palette = traits.palette
+    _, leaf, accent, light = palette
+    nums = ctx.nums
+    leaves = "".join(
+        f'<ellipse cx="{cx}" cy="{cy}" rx="{rx}" ry="{ry}" transform="rotate({-18 + (i % 5) * 9} {cx} {cy})"/>'
+        for i, (cx, cy, rx, ry) in enumerate(_leaf_geometry(ctx))
+    )
+    flowers = "".join(
+        '<circle cx="{}" cy="{}" r="5"/>'.format(*_FLOWER_POSITIONS[(nums[i] + i) % len(_FLOWER_POSITIONS)])
+        for i in range(traits.bloom_count)
+    )
+    return _minify(
+        '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 300 240" role="img" aria-label="Garden plant">'
+        f'<!--render:{SVG_RENDER_VERSION};thumb-->'
+        f'<rect width="300" height="240" fill="{light}"/>'
+        f'{_FILTER_ATTR_RE.sub("", _growth_feature(ctx, False))}'
+        f'{_table_trunk(tables, traits)}{tables.trunk_tip[palette]}'
+        f'<g fill="{leaf}" fill-opacity="0.86">{leaves}</g>'
+        f'<g fill="{accent}">{flowers}</g>'
+        f'{tables.pot[(palette, traits.pot_style, traits.pot_colorway)]}'
+        '</svg>'
+    )
+
+
+_DOCUMENT_OPEN_RE = re.compile(r"^<svg[^>]*>(?:<!--.*?-->)?")
+
+
+def roll_sprite(plants: Iterable[tuple[str, str]]) -> str:
+    """Bundle (symbol_id, svg) pairs into one sheet of <symbol>s for <use href="...#symbol_id">."""
+    symbols = "".join(
+        f'<symbol id="{symbol_id}" viewBox="0 0 300 240">'
+        f'{_DOCUMENT_OPEN_RE.sub("", svg, count=1).removesuffix("</svg>")}'
+        "</symbol>"
+        for symbol_id, svg in plants
+    )
+    return (
+        '<svg xmlns="http://www.w3.org/2000/svg">'
+        f'<!--render:{SVG_RENDER_VERSION};roll-->{symbols}'
+        '</svg>'
+    )
+
+
+_DIGEST_MODULUS = 1 << 256
+
+
+def _url_digest(url: str) -> int:
+    return int.from_bytes(hashlib.sha256(url.encode("utf-8")).digest(), "big")
+
+
+def _format_digest(value: int) -> str:
+    return f"{value:064x}" if value else ""
+
+
+def digest_harvest_urls(urls: Iterable[str]) -> str:
+    """Order-independent digest of a set of harvest URLs ("" when empty).
+
+    Per-URL SHA-256 values are summed modulo 2**256, so a single harvest can be
+    added or removed with update_harvest_digest without rescanning the rest.
+    """
+    return _format_digest(sum(_url_digest(url) for url in urls) % _DIGEST_MODULUS)
+
+
+def update_harvest_digest(digest: str, url: str, removed: bool = False) -> str:
+    current = int(digest, 16) if digest else 0
+    delta = -_url_digest(url) if removed else _url_digest(url)
+    return _format_digest((current + delta) % _DIGEST_MODULUS)
+
+
+def _context_for(
+    canonical_me_url: str,
+    harvest_urls: list[str] | None,
+    pick_count: int,
+    harvest_digest: str | None,
+    harvest_count: int | None,
+) -> _RenderContext:
+    if harvest_digest is None:
+        harvest_digest = digest_harvest_urls(harvest_urls or ())
+    if harvest_count is None:
+        harvest_count = len(harvest_urls) if harvest_urls else 0
+
+    base_seed = hashlib.sha256(canonical_me_url.encode("utf-8")).hexdigest()
+    if harvest_digest:
+        combined = hashlib.sha256((base_seed + harvest_digest).encode("utf-8")).hexdigest()
+    else:
+        combined = base_seed
+    return _RenderContext.from_seed(combined, harvest_count, pick_count)
+
+
 def generate_svg(
     canonical_me_url: str,
     harvest_urls: list[str] | None = None,
     motion_enabled: bool = False,
     pick_count: int = 0,
+    *,
+    harvest_digest: str | None = None,
+    harvest_count: int | None = None,
+    compact: bool = False,
 ) -> str:
-    base_seed = hashlib.sha256(canonical_me_url.encode("utf-8")).hexdigest()
-    if harvest_urls:
-        harvest_input = ",".join(sorted(harvest_urls))
-        growth_seed = hashlib.sha256(harvest_input.encode("utf-8")).hexdigest()
-        combined = hashlib.sha256((base_seed + growth_seed).encode("utf-8")).hexdigest()
-    else:
-        combined = base_seed
+    """Render a plant.
 
-    harvest_count = len(harvest_urls) if harvest_urls else 0
-    traits = traits_from_seed(combined, harvest_count, pick_count)
+    Callers that keep a stored digest (see UserIdentity.harvest_digest) pass
+    harvest_digest and harvest_count; harvest_urls is a convenience that
+    derives both. compact=True draws the same picture in fewer bytes: shared
+    leaf symbols, short ids and no layout whitespace.
+    """
+    ctx = _context_for(canonical_me_url, harvest_urls, pick_count, harvest_digest, harvest_count)
+    return _render(ctx, motion_enabled, compact)
 
-    svg = (
-        '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 300 240" role="img" aria-label="Garden plant">\n'
-        f'  <!-- render:{SVG_RENDER_VERSION};motion:{int(motion_enabled)} -->\n'
-        f'  {_defs(traits)}\n'
-        f'  {_background(traits)}\n'
-        f'  {_aura(traits, motion_enabled)}\n'
-        f'  {_tech_flares(traits, combined, motion_enabled)}\n'
-        f'  {_motion_open(traits, motion_enabled)}\n'
-        f'    {_growth_feature(traits, combined, motion_enabled)}\n'
-        f'    {_trunk(traits)}\n'
-        f'    {_canopy(traits, combined)}\n'
-        f'    {_flowers(traits, combined, motion_enabled)}\n'
-        f'    {_pot(traits)}\n'
-        f'  {_motion_close()}\n'
-        '</svg>'
-    )
-    return svg
+
+def generate_thumb_svg(
+    canonical_me_url: str,
+    harvest_urls: list[str] | None = None,
+    pick_count: int = 0,
+    *,
+    harvest_digest: str | None = None,
+    harvest_count: int | None = None,
+) -> str:
+    """Render the thumbnail level of detail of the plant generate_svg draws."""
+    ctx = _context_for(canonical_me_url, harvest_urls, pick_count, harvest_digest, harvest_count)
+    return _render_thumb(ctx)
+
+
+class PlantSpec(NamedTuple):
+    """One plant for generate_svgs, with the stored inputs render_identity_svg uses."""
+
+    me_url: str
+    harvest_digest: str = ""
+    harvest_count: int = 0
+    pick_count: int = 0
+    motion_enabled: bool = False
+
+
+def generate_svgs(batch: Iterable[PlantSpec | tuple], *, compact: bool = False) -> list[str]:
+    """Render many plants; each entry matches generate_svg for the same inputs."""
+    return [
+        _render(
+            _context_for(spec.me_url, None, spec.pick_count, spec.harvest_digest, spec.harvest_count),
+            spec.motion_enabled,
+            compact,
+        )
+        for spec in (PlantSpec(*spec) for spec in batch)
+    ]
@@ -1,16 +1,419 @@
 # plants/svg_cache.py
 from __future__ import annotations
 
+import gzip
+import hashlib
+import time
+from typing import NamedTuple
+
+from django.conf import settings
 from django.core.cache import cache
+from django.db import transaction
+
+import brotli
 
-from plants.svg import SVG_RENDER_VERSION
+from gardn.cache import acquire_lock, jittered, release_lock, wait_for
+from gardn.invalidation import bump_on_commit
+from gardn.metrics import incr_metric
+from plants.identity_cache import full_identity
+from plants.page_cache import page_generation_key
+from plants.svg import SVG_RENDER_VERSION, PlantSpec, count_buckets, generate_svg, generate_thumb_svg, roll_sprite
 
 SVG_CACHE_TIMEOUT = 3600  # 1 hour
+SVG_STALE_TIMEOUT = 86400  # how long the last render stays servable while a new one is built
+SVG_RENDER_LOCK_TIMEOUT = 60
+# Roll sprite keys name the exact plants they hold, so they never go stale.
+ROLL_SVG_CACHE_TIMEOUT = 86400
+# Plants per roll sprite: one page of picks, which bounds a sprite render on a miss.
+ROLL_SVG_MAX_PLANTS = 24
+
+# Brotli quality for stored SVGs. 11 saves another ~8% but costs ~45x the CPU,
+# about a hundred renders' worth, and encode_svg runs inside requests on a miss.
+SVG_BROTLI_QUALITY = 5
+
+SVG_INVALIDATION_METRICS = ("svg-invalidation:hit", "svg-invalidation:skip")
+
+IDENTITY = "identity"
+# Render sizes: the full plant, and the filter-free level of detail for 120x96 tiles.
+FULL = "full"
+THUMB = "thumb"
+SVG_SIZES = (FULL, THUMB)
+# Content-codings stored next to every render, in order of preference.
+SVG_ENCODINGS = ("br", "gzip")
+# STORAGES alias that plant SVGs are offloaded to, when configured (see plants.svg_storage).
+PLANT_SVG_STORAGE = "plant_svgs"
+
+
+class SvgMeta(NamedTuple):
+    """Validators for the last stored render, small enough to answer a 304 on their own."""
+
+    generation: int
+    etag: str
+    last_modified: int
+
+
+def svg_family(size: str) -> str:
+    return "svg" if size == FULL else f"svg-{size}"
+
+
+def svg_generation_key(username: str, version: str = SVG_RENDER_VERSION) -> str:
+    # Shared by every size, so one invalidation retires them all.
+    return f"svg-gen:{version}:{username}"
+
+
+def svg_latest_key(username: str, size: str = FULL, version: str = SVG_RENDER_VERSION) -> str:
+    return f"{svg_family(size)}:{version}:{username}:latest"
+
+
+def svg_meta_key(username: str, size: str = FULL, version: str = SVG_RENDER_VERSION) -> str:
+    return f"{svg_family(size)}-meta:{version}:{username}"
+
+
+def svg_rollout_live_key() -> str:
+    return f"svg-rollout:{SVG_RENDER_VERSION}:live"
+
+
+def rollout_previous_version() -> str | None:
+    """The render version still being rolled away from, if a rollout is configured."""
+    previous = settings.SVG_ROLLOUT_PREVIOUS_VERSION
+    return previous if previous and previous != SVG_RENDER_VERSION else None
+
 
+def flip_rollout() -> None:
+    """Serve SVG_RENDER_VERSION everywhere from now on; one key, so every worker flips together."""
+    cache.set(svg_rollout_live_key(), True, timeout=None)
 
-def svg_cache_key(username: str) -> str:
-    return f"svg:{SVG_RENDER_VERSION}:{username}"
+
+def rollout_is_live() -> bool:
+    return rollout_previous_version() is None or bool(cache.get(svg_rollout_live_key()))
+
+
+def svg_offload_enabled() -> bool:
+    return PLANT_SVG_STORAGE in settings.STORAGES
+
+
+def svg_variant_key(key: str, encoding: str) -> str:
+    return key if encoding == IDENTITY else f"{key}:{encoding}"
+
+
+def svg_render_lock_name(username: str, size: str = FULL) -> str:
+    return f"{svg_family(size)}-render:{SVG_RENDER_VERSION}:{username}"
+
+
+def svg_generation(username: str) -> int:
+    return cache.get(svg_generation_key(username), 0)
+
+
+def svg_cache_key(username: str, generation: int | None = None, size: str = FULL) -> str:
+    if generation is None:
+        generation = svg_generation(username)
+    return f"{svg_family(size)}:{SVG_RENDER_VERSION}:{username}:{generation}"
 
 
 def invalidate_svg(username: str) -> None:
-    cache.delete(svg_cache_key(username))
+    """Move the user onto a new SVG generation once the current transaction commits.
+
+    The old render stays as the stale copy. Cached profile pages are retired with it.
+    """
+    keys = [svg_generation_key(username), page_generation_key(username)]
+    previous = rollout_previous_version()
+    if previous is not None:
+        # Retire the previous version's render too, so a changed plant stops being served from it.
+        keys.append(svg_generation_key(username, previous))
+    bump_on_commit(*keys)
+    if svg_offload_enabled():
+        from plants.tasks import regenerate_plant_svg
+
+        # Offloaded plants are not rendered on request, so re-render as soon as the change lands
+        # (after the generation bump, which was queued first).
+        transaction.on_commit(lambda: regenerate_plant_svg.delay(username))
+
+
+def invalidate_svg_for_counts(username: str, before: tuple[int, int], after: tuple[int, int]) -> bool:
+    """Invalidate only if moving from ``before`` to ``after`` changes the plant.
+
+    Both are (harvest_count, pick_count) pairs for an unchanged seed, as after
+    a pick or unpick. Returns whether the SVG was invalidated.
+    """
+    if count_buckets(*before) == count_buckets(*after):
+        incr_metric(SVG_INVALIDATION_METRICS[1])
+        return False
+    incr_metric(SVG_INVALIDATION_METRICS[0])
+    invalidate_svg(username)
+    return True
+
+
+def identity_plant_spec(identity) -> PlantSpec:
+    """The render inputs for ``identity``, as generate_svgs takes them."""
+    return PlantSpec(
+        identity.me_url,
+        identity.harvest_digest,
+        identity.harvest_count,
+        identity.incoming_pick_count + identity.outgoing_pick_count,
+        identity.animate_plant_motion,
+    )
+
+
+def render_identity_svg(identity, size: str = FULL) -> str:
+    spec = identity_plant_spec(identity)
+    if size == THUMB:
+        return generate_thumb_svg(
+            spec.me_url,
+            pick_count=spec.pick_count,
+            harvest_digest=spec.harvest_digest,
+            harvest_count=spec.harvest_count,
+        )
+    return generate_svg(
+        spec.me_url,
+        motion_enabled=spec.motion_enabled,
+        pick_count=spec.pick_count,
+        harvest_digest=spec.harvest_digest,
+        harvest_count=spec.harvest_count,
+        compact=True,
+    )
+
+
+def negotiate_svg_encoding(accept_encoding: str) -> str:
+    """Pick the stored content-coding the client prefers, honouring q=0."""
+    weights: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip() == "q":
+            try:
+                weight = float(value)
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+    for encoding in SVG_ENCODINGS:
+        if weights.get(encoding, weights.get("*", 0.0)) > 0:
+            return encoding
+    return IDENTITY
+
+
+def encode_svg(svg: str) -> dict[str, str | bytes]:
+    """The raw SVG plus every compressed variant, keyed by content-coding."""
+    raw = svg.encode("utf-8")
+    return {
+        IDENTITY: svg,
+        "gzip": gzip.compress(raw, compresslevel=9, mtime=0),
+        "br": brotli.compress(raw, mode=brotli.MODE_TEXT, quality=SVG_BROTLI_QUALITY),
+    }
+
+
+def decode_svg(body: str | bytes, encoding: str) -> str:
+    """The raw SVG behind one of encode_svg's bodies."""
+    if encoding == IDENTITY:
+        return body
+    raw = gzip.decompress(body) if encoding == "gzip" else brotli.decompress(body)
+    return raw.decode("utf-8")
+
+
+def _meta_for(svg: str, generation: int) -> SvgMeta:
+    # Always hashes the raw SVG: representation_etag derives each coding's ETag from this one.
+    return SvgMeta(generation, f'"{hashlib.sha256(svg.encode("utf-8")).hexdigest()}"', int(time.time()))
+
+
+def _meta_for_body(body: str | bytes, encoding: str, generation: int) -> SvgMeta:
+    """Meta for a render only found as ``body`` (its meta key expired or was overwritten)."""
+    return _meta_for(decode_svg(body, encoding), generation)
+
+
+def representation_etag(etag: str, encoding: str) -> str:
+    # Each content-coding is its own representation and needs its own strong ETag.
+    return etag if encoding == IDENTITY else f'{etag[:-1]}-{encoding}"'
+
+
+def store_svg(
+    username: str, generation: int, svg: str, size: str = FULL,
+) -> tuple[SvgMeta, dict[str, str | bytes]]:
+    """Store the render and its compressed variants; compression happens only here."""
+    bodies = encode_svg(svg)
+    meta = _meta_for(svg, generation)
+    current = svg_cache_key(username, generation, size)
+    latest = svg_latest_key(username, size)
+    cache.set_many(
+        {svg_variant_key(current, encoding): body for encoding, body in bodies.items()},
+        timeout=jittered(SVG_CACHE_TIMEOUT),
+    )
+    stale = {svg_variant_key(latest, encoding): body for encoding, body in bodies.items()}
+    stale[svg_meta_key(username, size)] = meta
+    cache.set_many(stale, timeout=SVG_STALE_TIMEOUT)
+    if svg_offload_enabled():
+        from plants.tasks import offload_plant_svg
+
+        offload_plant_svg.delay(username, generation, size)
+    return meta, bodies
+
+
+def _previous_version_keys(username: str, size: str, encoding: str | None = None) -> dict[str, str]:
+    """Keys to read alongside the current ones while a rollout is configured ({} otherwise)."""
+    previous = rollout_previous_version()
+    if previous is None:
+        return {}
+    keys = {
+        "live": svg_rollout_live_key(),
+        "generation": svg_generation_key(username, previous),
+        "meta": svg_meta_key(username, size, previous),
+    }
+    if encoding is not None:
+        keys["body"] = svg_variant_key(svg_latest_key(username, size, previous), encoding)
+    return keys
+
+
+def _previous_version_current(found: dict, keys: dict[str, str]) -> SvgMeta | None:
+    """Meta of the previous version's render if that version is still served and the render is current."""
+    if not keys or found.get(keys["live"]):
+        return None
+    meta = found.get(keys["meta"])
+    if meta is None or meta.generation != found.get(keys["generation"], 0):
+        return None
+    if "body" in keys and keys["body"] not in found:
+        return None
+    return meta
+
+
+def current_svg_meta(username: str, size: str = FULL) -> SvgMeta | None:
+    """Validators for the current generation, in one round trip and without the body.
+
+    None when the stored render belongs to an older generation (or there is
+    none), in which case the caller has to go through get_plant_svg.
+    """
+    meta_key = svg_meta_key(username, size)
+    previous = _previous_version_keys(username, size)
+    found = cache.get_many([svg_generation_key(username), meta_key, *previous.values()])
+    previous_meta = _previous_version_current(found, previous)
+    if previous_meta is not None:
+        return previous_meta
+    meta = found.get(meta_key)
+    if meta is None or meta.generation != found.get(svg_generation_key(username), 0):
+        return None
+    return meta
+
+
+def get_plant_svg(identity, encoding: str = IDENTITY, size: str = FULL) -> tuple[str | bytes, SvgMeta]:
+    """Current SVG for ``identity``, or the previous one while a re-render is queued.
+
+    ``identity`` may be a CachedIdentity; the model row is only loaded to render.
+
+    The body comes back already encoded with ``encoding`` (see
+    negotiate_svg_encoding). Only a user with no render at all pays for one
+    inside the request, and then only one request per user does; the rest
+    wait for its result.
+
+    During a render-version rollout the previous version's render is served
+    while it is current and the rollout has not flipped, and afterwards stands
+    in as the stale copy until the plant has a render at this version.
+    """
+    from plants.tasks import render_plant_svg
+
+    username = identity.username
+    generation = svg_generation(username)
+    key = svg_variant_key(svg_cache_key(username, generation, size), encoding)
+    latest = svg_variant_key(svg_latest_key(username, size), encoding)
+    meta_key = svg_meta_key(username, size)
+    previous = _previous_version_keys(username, size, encoding)
+    found = cache.get_many([key, latest, meta_key, *previous.values()])
+    previous_meta = _previous_version_current(found, previous)
+    if previous_meta is not None:
+        return found[previous["body"]], previous_meta
+    meta = found.get(meta_key)
+    if key in found:
+        body = found[key]
+        if meta is None or meta.generation != generation:
+            meta = _meta_for_body(body, encoding, generation)
+        return body, meta
+
+    lock_name = svg_render_lock_name(username, size)
+    token = acquire_lock(lock_name, SVG_RENDER_LOCK_TIMEOUT)
+    stale = found.get(latest)
+    if stale is None and previous.get("body") in found:
+        stale, meta = found[previous["body"]], found.get(previous["meta"])
+    if stale is not None:
+        if token is not None:
+            render_plant_svg.delay(username, generation, token, size)
+        return stale, meta or _meta_for_body(stale, encoding, generation - 1)
+
+    if token is None:
+        body = wait_for(key, SVG_RENDER_LOCK_TIMEOUT)
+        if body is None:
+            body = encode_svg(render_identity_svg(full_identity(identity), size))[encoding]
+        return body, _meta_for_body(body, encoding, generation)
+    try:
+        meta, bodies = store_svg(username, generation, render_identity_svg(full_identity(identity), size), size)
+        return bodies[encoding], meta
+    finally:
+        release_lock(lock_name, token)
+
+
+def roll_plant_id(username: str) -> str:
+    return f"plant-{username}"
+
+
+def _svg_generations(usernames: list[str]) -> dict[str, int]:
+    found = cache.get_many([svg_generation_key(username) for username in usernames])
+    return {username: found.get(svg_generation_key(username), 0) for username in usernames}
+
+
+def roll_svg_key(username: str, generations: dict[str, int]) -> str:
+    """Key for one roll sprite: the picked plants, in order, at their SVG generations.
+
+    Picking, unpicking or invalidating any picked plant moves the roll onto a
+    new key, so the sprite is invalidated as a unit without a write per roll.
+    """
+    state = ",".join(f"{picked}:{generation}" for picked, generation in generations.items())
+    digest = hashlib.sha256(state.encode("utf-8")).hexdigest()[:16]
+    return f"roll-svg:{SVG_RENDER_VERSION}:{username}:{digest}"
+
+
+def render_roll_svg(picked: list, generations: dict[str, int]) -> str:
+    """Sprite of every picked plant's thumb, reusing thumbs already in the cache."""
+    keys = {
+        identity.username: svg_cache_key(identity.username, generations[identity.username], THUMB)
+        for identity in picked
+    }
+    cached = cache.get_many(list(keys.values()))
+    return roll_sprite(
+        (
+            roll_plant_id(identity.username),
+            cached.get(keys[identity.username]) or render_identity_svg(identity, THUMB),
+        )
+        for identity in picked
+    )
+
+
+def get_roll_svg(username: str, picked: list, encoding: str = IDENTITY) -> tuple[str | bytes, SvgMeta]:
+    """Roll sprite for ``username``'s picked identities (in display order), encoded with ``encoding``.
+
+    Holds at most ROLL_SVG_MAX_PLANTS of them; callers pass one page.
+    """
+    picked = picked[:ROLL_SVG_MAX_PLANTS]
+    generations = _svg_generations([identity.username for identity in picked])
+    key = roll_svg_key(username, generations)
+    variant, meta_key = svg_variant_key(key, encoding), f"{key}:meta"
+    found = cache.get_many([variant, meta_key])
+    if variant in found and meta_key in found:
+        return found[variant], found[meta_key]
+
+    token = acquire_lock(key, SVG_RENDER_LOCK_TIMEOUT)
+    if token is None:
+        body = wait_for(variant, SVG_RENDER_LOCK_TIMEOUT)
+        meta = cache.get(meta_key)
+        if body is not None and meta is not None:
+            return body, meta
+    try:
+        svg = render_roll_svg(picked, generations)
+        bodies = encode_svg(svg)
+        meta = _meta_for(svg, 0)
+        if token is not None:
+            stored = {svg_variant_key(key, coding): body for coding, body in bodies.items()}
+            stored[meta_key] = meta
+            cache.set_many(stored, timeout=jittered(ROLL_SVG_CACHE_TIMEOUT))
+        return bodies[encoding], meta
+    finally:
+        if token is not None:
+            release_lock(key, token)
@@ -0,0 +1,113 @@
+# plants/svg_raster.py
+from __future__ import annotations
+
+import io
+
+from django.core.cache import cache
+
+try:
+    import cairosvg
+    from PIL import Image
+except (ImportError, OSError):  # optional: cairosvg also needs the cairo library; without it there is no plant.png
+    cairosvg = None
+
+from gardn.cache import acquire_lock, release_lock, wait_for
+from plants.svg_cache import (
+    FULL,
+    IDENTITY,
+    SVG_STALE_TIMEOUT,
+    THUMB,
+    SvgMeta,
+    current_svg_meta,
+    get_plant_svg,
+    svg_family,
+)
+
+RASTER_FORMATS = {"png": "image/png", "webp": "image/webp"}
+# Pixels per render size: twice the CSS size the plant is shown at, for dense screens.
+RASTER_DIMENSIONS = {FULL: (600, 480), THUMB: (240, 192)}
+# Raster keys name the exact SVG they were drawn from, so they never go stale.
+RASTER_CACHE_TIMEOUT = 7 * 86400
+RASTER_RENDER_LOCK_TIMEOUT = 60
+
+
+def raster_available() -> bool:
+    return cairosvg is not None
+
+
+def raster_cache_key(etag: str, size: str, fmt: str) -> str:
+    # Keyed by the SVG's ETag, so a raster is retired exactly when its SVG is.
+    digest = etag.strip('"')
+    return f"{svg_family(size)}-{fmt}:{digest}"
+
+
+def raster_latest_key(username: str, size: str, fmt: str) -> str:
+    return f"{svg_family(size)}-{fmt}:{username}:latest"
+
+
+def raster_render_lock_name(username: str, size: str, fmt: str) -> str:
+    return f"{svg_family(size)}-{fmt}-render:{username}"
+
+
+def rasterize_svg(svg: str, size: str, fmt: str) -> bytes:
+    width, height = RASTER_DIMENSIONS[size]
+    png = cairosvg.svg2png(bytestring=svg.encode("utf-8"), output_width=width, output_height=height)
+    if fmt == "png":
+        return png
+    out = io.BytesIO()
+    with Image.open(io.BytesIO(png)) as image:
+        image.save(out, format="WEBP", quality=90, method=6)
+    return out.getvalue()
+
+
+def store_raster(username: str, meta: SvgMeta, size: str, fmt: str, body: bytes) -> None:
+    cache.set(raster_cache_key(meta.etag, size, fmt), body, timeout=RASTER_CACHE_TIMEOUT)
+    cache.set(raster_latest_key(username, size, fmt), (meta, body), timeout=SVG_STALE_TIMEOUT)
+
+
+def _draw_raster(identity, size: str, fmt: str) -> tuple[bytes, SvgMeta]:
+    svg, meta = get_plant_svg(identity, IDENTITY, size)
+    return rasterize_svg(svg, size, fmt), meta
+
+
+def get_plant_raster(identity, size: str = FULL, fmt: str = "png") -> tuple[bytes, SvgMeta]:
+    """Raster of the SVG plant.svg currently serves.
+
+    Mirrors get_plant_svg: while render_plant_raster redraws a changed plant
+    the previous raster is served, and only a plant with no raster at all is
+    drawn inside the request, by one request per plant while the rest wait.
+    That first request is often a link-preview crawler fetching og:image,
+    which would not come back after a 202.
+    """
+    from plants.tasks import render_plant_raster
+
+    username = identity.username
+    meta = current_svg_meta(username, size)
+    if meta is None:
+        _, meta = get_plant_svg(identity, IDENTITY, size)
+    key = raster_cache_key(meta.etag, size, fmt)
+    latest = raster_latest_key(username, size, fmt)
+    found = cache.get_many([key, latest])
+    if key in found:
+        return found[key], meta
+
+    lock_name = raster_render_lock_name(username, size, fmt)
+    token = acquire_lock(lock_name, RASTER_RENDER_LOCK_TIMEOUT)
+    stale = found.get(latest)
+    if stale is not None:
+        if token is not None:
+            render_plant_raster.delay(username, token, size, fmt)
+        stale_meta, body = stale
+        return body, stale_meta
+
+    if token is None:
+        body = wait_for(key, RASTER_RENDER_LOCK_TIMEOUT)
+        if body is None:
+            return _draw_raster(identity, size, fmt)
+        return body, meta
+    try:
+        body, meta = _draw_raster(identity, size, fmt)
+        store_raster(username, meta, size, fmt, body)
+        return body, meta
+    finally:
+        release_lock(lock_name, token)
@@ -0,0 +1,162 @@
+# plants/svg_rollout.py
+from __future__ import annotations
+
+import uuid
+from itertools import islice
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from redis.exceptions import WatchError
+
+from gardn.redis_client import get_redis, redis_key
+from plants.models import UserIdentity
+from plants.svg import SVG_RENDER_VERSION, generate_svgs
+
+from .svg_cache import (
+    THUMB,
+    flip_rollout,
+    identity_plant_spec,
+    render_identity_svg,
+    rollout_is_live,
+    rollout_previous_version,
+    store_svg,
+    svg_generation_key,
+)
+
+PRERENDER_BATCH_SIZE = 500
+# Expiry of a snapshot that is still being written, in case its writer dies.
+SNAPSHOT_BUILD_TIMEOUT = 3600
+
+
+class RolloutProgress(NamedTuple):
+    """How far the pre-render of SVG_RENDER_VERSION has got through its snapshot."""
+
+    queued: int  # identities in the snapshot, in prerender_order
+    remaining: int  # of those, not yet claimed by a batch
+    rendered: int  # of those, claimed by a batch that went on to store their renders
+
+    @property
+    def claimed(self) -> int:
+        return self.queued - self.remaining
+
+    @property
+    def done(self) -> bool:
+        return self.remaining == 0
+
+    @property
+    def coverage(self) -> float:
+        return min(1.0, self.rendered / self.queued) if self.queued else 1.0
+
+
+def rollout_queue_key() -> str:
+    return f"svg-rollout:{SVG_RENDER_VERSION}:queue"
+
+
+def rollout_queued_key() -> str:
+    # Set with the queue, so an empty queue can tell "drained" from "not started".
+    return f"svg-rollout:{SVG_RENDER_VERSION}:queued"
+
+
+def rollout_rendered_key() -> str:
+    return f"svg-rollout:{SVG_RENDER_VERSION}:rendered"
+
+
+def rollout_progress() -> RolloutProgress:
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.get(redis_key(rollout_queued_key()))
+    pipe.llen(redis_key(rollout_queue_key()))
+    pipe.get(redis_key(rollout_rendered_key()))
+    queued, remaining, rendered = pipe.execute()
+    if queued is None:
+        # No snapshot yet: everything is still to do.
+        total = UserIdentity.objects.count()
+        return RolloutProgress(total, total, 0)
+    return RolloutProgress(int(queued), remaining, int(rendered or 0))
+
+
+def reset_rollout() -> None:
+    get_redis(write=True).delete(
+        redis_key(rollout_queue_key()), redis_key(rollout_queued_key()), redis_key(rollout_rendered_key()),
+    )
+
+
+def prerender_order():
+    # Most-picked gardens sit in the most rolls and home lists, so they are
+    # requested most; the id keeps the order stable.
+    return UserIdentity.objects.order_by("-incoming_pick_count", "id")
+
+
+def _snapshot_queue(client) -> None:
+    """Queue every identity id in prerender_order, once per render version.
+
+    Batches pop from this snapshot, so pick counts changing mid-rollout
+    cannot skip or repeat anyone. The list is built under a private key and
+    published together with the queued count only if no other worker
+    published first.
+    """
+    queued_key, queue_key = redis_key(rollout_queued_key()), redis_key(rollout_queue_key())
+    if client.exists(queued_key):
+        return
+    building = f"{queue_key}:{uuid.uuid4().hex}"
+    queued = 0
+    ids = prerender_order().values_list("id", flat=True).iterator(PRERENDER_BATCH_SIZE)
+    while chunk := list(islice(ids, PRERENDER_BATCH_SIZE)):
+        client.rpush(building, *chunk)
+        client.expire(building, SNAPSHOT_BUILD_TIMEOUT)
+        queued += len(chunk)
+    with client.pipeline() as pipe:
+        try:
+            pipe.watch(queued_key)
+            if not pipe.exists(queued_key):
+                pipe.multi()
+                pipe.set(queued_key, queued)
+                pipe.set(redis_key(rollout_rendered_key()), 0)
+                if queued:
+                    pipe.rename(building, queue_key)
+                    pipe.persist(queue_key)
+                pipe.execute()
+                return
+        except WatchError:
+            pass  # another worker published between the watch and the exec
+    client.delete(building)
+
+
+def prerender_batch(batch_size: int = PRERENDER_BATCH_SIZE) -> RolloutProgress:
+    """Render the next batch at SVG_RENDER_VERSION, full and thumb, and flip once enough are rendered.
+
+    Each batch is popped off the snapshot atomically, so concurrent runs never
+    render the same identities. Renders go into the cache exactly as a request
+    would store them, for the plant's current generation, so they are served
+    as soon as the rollout flips.
+
+    The flip is gated on the snapshot's own rendered count rather than on
+    probing the cache: renders expire after SVG_CACHE_TIMEOUT, so a long
+    rollout would otherwise lose coverage as fast as it gains it. A batch
+    adds to the count only once its renders are stored, so one that dies
+    after claiming its identities never counts them.
+    """
+    client = get_redis(write=True)
+    _snapshot_queue(client)
+    claimed = [int(identity_id) for identity_id in client.lpop(redis_key(rollout_queue_key()), batch_size) or ()]
+    found = UserIdentity.objects.in_bulk(claimed)
+    identities = [found[identity_id] for identity_id in claimed if identity_id in found]  # deleted since the snapshot
+    if identities:
+        generations = cache.get_many([svg_generation_key(identity.username) for identity in identities])
+        rendered = generate_svgs([identity_plant_spec(identity) for identity in identities], compact=True)
+        for identity, svg in zip(identities, rendered):
+            generation = generations.get(svg_generation_key(identity.username), 0)
+            store_svg(identity.username, generation, svg)
+            store_svg(identity.username, generation, render_identity_svg(identity, THUMB), THUMB)
+    if claimed:
+        # Identities deleted since the snapshot have nothing left to render.
+        client.incrby(redis_key(rollout_rendered_key()), len(claimed))
+
+    progress = rollout_progress()
+    if (
+        rollout_previous_version() is not None
+        and not rollout_is_live()
+        and progress.coverage >= settings.SVG_ROLLOUT_THRESHOLD
+    ):
+        flip_rollout()
+    return progress
@@ -0,0 +1,69 @@
+# plants/svg_storage.py
+from __future__ import annotations
+
+import hashlib
+from collections.abc import Iterable
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+
+from plants.svg import SVG_RENDER_VERSION
+from plants.svg_cache import (
+    FULL,
+    PLANT_SVG_STORAGE,
+    rollout_is_live,
+    svg_family,
+    svg_generation_key,
+    svg_offload_enabled,
+)
+
+
+def svg_object_name(svg: str, size: str = FULL) -> str:
+    """Bucket name for a render: its content hash, so a stored object never changes."""
+    digest = hashlib.sha256(svg.encode("utf-8")).hexdigest()
+    return f"{size}/{digest}.svg"
+
+
+def svg_url_key(username: str, size: str = FULL) -> str:
+    return f"{svg_family(size)}-url:{SVG_RENDER_VERSION}:{username}"
+
+
+def upload_svg(username: str, generation: int, svg: str, size: str = FULL) -> str:
+    """Write the render to the bucket (once per content) and point the user's generation at it."""
+    storage = storages[PLANT_SVG_STORAGE]
+    name = svg_object_name(svg, size)
+    if not storage.exists(name):
+        storage.save(name, ContentFile(svg.encode("utf-8")))
+    url = storage.url(name)
+    key = svg_url_key(username, size)
+    stored = cache.get(key)
+    # Uploads can finish out of order; never move the user back to an older generation.
+    if stored is None or stored[0] <= generation:
+        cache.set(key, (generation, url), timeout=None)
+    return url
+
+
+def offloaded_svg_urls(usernames: Iterable[str], size: str = FULL) -> dict[str, str]:
+    """Bucket URLs of the current render for each user that has one, in one round trip.
+
+    Users missing from the result (offload off, not uploaded yet, or changed
+    since the last upload) are served by plant_svg_view instead.
+    """
+    usernames = list(usernames)
+    if not usernames or not svg_offload_enabled() or not rollout_is_live():
+        return {}
+    keys = {
+        username: (svg_generation_key(username), svg_url_key(username, size)) for username in usernames
+    }
+    found = cache.get_many([key for pair in keys.values() for key in pair])
+    urls = {}
+    for username, (generation_key, url_key) in keys.items():
+        stored = found.get(url_key)
+        if stored is not None and stored[0] == found.get(generation_key, 0):
+            urls[username] = stored[1]
+    return urls
+
+
+def offloaded_svg_url(username: str, size: str = FULL) -> str | None:
+    return offloaded_svg_urls([username], size).get(username)
@@ -0,0 +1,91 @@
+# plants/tasks.py
+from __future__ import annotations
+
+from celery import shared_task
+from django.core.cache import cache
+
+from gardn.cache import acquire_lock, release_lock
+
+from .svg_cache import (
+    FULL,
+    IDENTITY,
+    SVG_RENDER_LOCK_TIMEOUT,
+    SVG_SIZES,
+    get_plant_svg,
+    render_identity_svg,
+    store_svg,
+    svg_cache_key,
+    svg_generation,
+    svg_render_lock_name,
+)
+
+
+@shared_task
+def render_plant_svg(username: str, generation: int, lock_token: str, size: str = FULL) -> None:
+    """Re-render a plant in the background; the caller took the render lock for us."""
+    from plants.models import UserIdentity
+
+    try:
+        identity = UserIdentity.objects.get(username=username)
+        store_svg(username, generation, render_identity_svg(identity, size), size)
+    except UserIdentity.DoesNotExist:
+        return
+    finally:
+        release_lock(svg_render_lock_name(username, size), lock_token)
+
+
+@shared_task
+def render_plant_raster(username: str, lock_token: str, size: str = FULL, fmt: str = "png") -> None:
+    """Rasterize the SVG plant.svg currently serves; the caller took the raster lock for us."""
+    from plants.models import UserIdentity
+
+    from .svg_raster import raster_render_lock_name, rasterize_svg, store_raster
+
+    try:
+        identity = UserIdentity.objects.get(username=username)
+        svg, meta = get_plant_svg(identity, IDENTITY, size)
+        store_raster(username, meta, size, fmt, rasterize_svg(svg, size, fmt))
+    except UserIdentity.DoesNotExist:
+        return
+    finally:
+        release_lock(raster_render_lock_name(username, size, fmt), lock_token)
+
+
+@shared_task
+def regenerate_plant_svg(username: str) -> None:
+    """Render every size at the current generation after a change, for plants served from the bucket."""
+    from plants.models import UserIdentity
+
+    identity = UserIdentity.objects.filter(username=username).first()
+    if identity is None:
+        return
+    generation = svg_generation(username)
+    for size in SVG_SIZES:
+        lock_name = svg_render_lock_name(username, size)
+        token = acquire_lock(lock_name, SVG_RENDER_LOCK_TIMEOUT)
+        if token is None:
+            continue  # someone else is already rendering this size
+        try:
+            store_svg(username, generation, render_identity_svg(identity, size), size)
+        finally:
+            release_lock(lock_name, token)
+
+
+@shared_task
+def offload_plant_svg(username: str, generation: int, size: str = FULL) -> None:
+    """Copy a stored render to the bucket; store_svg queues this when offload is configured."""
+    from .svg_storage import upload_svg
+
+    svg = cache.get(svg_cache_key(username, generation, size))
+    if svg is None:
+        return  # evicted or superseded; the next render queues its own upload
+    upload_svg(username, generation, svg, size)
+
+
+@shared_task
+def prerender_svg_version(batch_size: int = 500) -> None:
+    """Pre-render the current render version one batch at a time, re-queueing until done."""
+    from .svg_rollout import prerender_batch
+
+    if not prerender_batch(batch_size).done:
+        prerender_svg_version.delay(batch_size)
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from django import template
+from django.utils.safestring import mark_safe
+
+from plants.fragment_cache import FRAGMENT_KINDS, lookup_fragment, store_fragment
+
+register = template.Library()
+
+
+class GardnCacheNode(template.Node):
+    def __init__(self, nodelist, name: str, identity, kinds: tuple[str, ...], vary_on: list):
+        self.nodelist = nodelist
+        self.name = name
+        self.identity = identity
+        self.kinds = kinds
+        self.vary_on = vary_on
+
+    def render(self, context) -> str:
+        identity = self.identity.resolve(context)
+        if identity is None:
+            return self.nodelist.render(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        versions, html = lookup_fragment(self.name, identity.id, self.kinds, vary_on)
+        if html is None:
+            html = self.nodelist.render(context)
+            store_fragment(self.name, identity.id, vary_on, versions, html)
+        return mark_safe(html)
+
+
+@register.tag("gardn_cache")
+def do_gardn_cache(parser, token):
+    """Cache a fragment until ``identity``'s named data changes.
+
+    Usage::
+
+        {% gardn_cache "profile_lists" identity "picks,harvests" request.GET.picks_page %}
+            ...
+        {% endgardn_cache %}
+
+    The first argument names the fragment (and its hit-ratio counters), the
+    second is the identity it shows, the third lists the version counters it
+    depends on (see plants.fragment_cache). Anything after that is added to
+    the key, as with ``{% cache %}``.
+    """
+    nodelist = parser.parse(("endgardn_cache",))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 4:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes a name, an identity and the versions it depends on.")
+    name, kinds = bits[1], bits[3]
+    for literal in (name, kinds):
+        if literal[0] not in "\"'" or literal[-1] != literal[0]:
+            raise template.TemplateSyntaxError(f"'{bits[0]}' needs the name and versions as quoted strings.")
+    kinds = tuple(kinds[1:-1].split(","))
+    unknown = set(kinds) - set(FRAGMENT_KINDS)
+    if unknown:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' got unknown versions: {', '.join(sorted(unknown))}")
+    return GardnCacheNode(
+        nodelist,
+        name[1:-1],
+        parser.compile_filter(bits[2]),
+        kinds,
+        [parser.compile_filter(bit) for bit in bits[4:]],
+    )
@@ -1,12 +1,90 @@
 from __future__ import annotations
 
+import hashlib
+import io
+import os
+import re
+import xml.etree.ElementTree as ET
+from unittest import skipUnless
+
 from django.core.cache import cache
 from django.test import TestCase
 
+try:
+    import cairosvg
+    from PIL import Image, ImageChops
+except (ImportError, OSError):  # OSError: cairosvg is installed but libcairo is not
+    cairosvg = None
+
 from .models import UserIdentity
-from .svg import SVG_RENDER_VERSION, _biased_pot_style, generate_svg
+from .svg import (
+    SVG_RENDER_VERSION,
+    PlantSpec,
+    _biased_pot_style,
+    _render,
+    _render_reference,
+    _RenderContext,
+    count_buckets,
+    digest_harvest_urls,
+    generate_svg,
+    generate_svgs,
+    generate_thumb_svg,
+    traits_from_seed,
+)
 from .svg_cache import svg_cache_key
 
+_SVG_NS = "{http://www.w3.org/2000/svg}"
+_NUMBER_OR_WORD = re.compile(r"#[0-9a-f]+|-?(?:\d+\.?\d*|\.\d+)|[A-Za-z%][A-Za-z-]*")
+_USE_TRANSFORM = re.compile(r"translate\((-?\d+) (-?\d+)\)(?: rotate\((-?\d+)\))?")
+
+
+def _canonical_svg(svg: str) -> list:
+    """Drawing tree with ids, classes, <use> and bare groups resolved away.
+
+    Two SVGs with the same canonical tree paint the same picture, whatever
+    their ids, whitespace or number spelling.
+    """
+    root = ET.fromstring(svg)
+    by_id = {el.get("id"): el for el in root.iter() if el.get("id")}
+    classes = {
+        name: dict(decl.split(":", 1) for decl in body.split(";"))
+        for style in root.iter(f"{_SVG_NS}style")
+        for name, body in re.findall(r"\.(\w+)\{([^}]*)\}", style.text)
+    }
+
+    def value(raw: str):
+        ref = re.fullmatch(r"url\(#([\w-]+)\)", raw)
+        if ref:
+            return tuple(node(by_id[ref.group(1)], keep_defs=True))
+        return tuple(t if t[0] in "#%" or t[0].isalpha() else float(t) for t in _NUMBER_OR_WORD.findall(raw))
+
+    def attrs(el, dx: int = 0, dy: int = 0) -> tuple:
+        items = {k: v for k, v in el.attrib.items() if k not in ("id", "class")}
+        for name in el.get("class", "").split():
+            items.update(classes[name])
+        if dx or dy:
+            items["cx"] = str(float(items.get("cx", 0)) + dx)
+            items["cy"] = str(float(items.get("cy", 0)) + dy)
+        return tuple(sorted((k, value(v)) for k, v in items.items()))
+
+    def node(el, keep_defs: bool = False) -> list:
+        tag = el.tag.removeprefix(_SVG_NS)
+        if tag in ("defs", "style", "symbol") and not keep_defs:
+            return []
+        if tag == "use":
+            x, y, rotation = _USE_TRANSFORM.fullmatch(el.get("transform")).groups()
+            x, y = int(x), int(y)
+            symbol = by_id[el.get("href")[1:]]
+            shapes = [(child.tag.removeprefix(_SVG_NS), attrs(child, x, y), []) for child in symbol]
+            return [("g", (("transform", value(f"rotate({rotation or 0} {x} {y})")),), shapes)]
+        children = [n for child in el for n in node(child)]
+        animated = any("animate" in child.tag for child in el)
+        if tag == "g" and not set(el.attrib) - {"id"} and not animated:
+            return children
+        return [(tag, attrs(el), children)]
+
+    return node(root)
+
 
 class PlantTests(TestCase):
     def test_svg_endpoint_has_cache_headers(self) -> None:
@@ -31,12 +109,109 @@ class PlantTests(TestCase):
         self.assertIn("<animate", svg)
         self.assertIn("<animateTransform", svg)
 
+    def test_fragment_tables_match_reference_renderer(self) -> None:
+        for i in range(2500):
+            seed = hashlib.sha256(f"golden-{i}".encode("utf-8")).hexdigest()
+            ctx = _RenderContext.from_seed(seed, harvest_count=i % 23, pick_count=i % 19)
+            for motion_enabled in (False, True):
+                self.assertEqual(
+                    _render(ctx, motion_enabled),
+                    _render_reference(ctx, motion_enabled),
+                    f"seed {seed} motion={motion_enabled}",
+                )
+
+    def test_traits_from_seed_is_memoized(self) -> None:
+        seed = hashlib.sha256(b"memo").hexdigest()
+        first = traits_from_seed(seed, 4, 2)
+        self.assertIs(traits_from_seed(seed, 4, 2), first)
+        self.assertIsNot(traits_from_seed(seed, 5, 2), first)
+
+    def test_render_context_decodes_seed_bytes(self) -> None:
+        seed = hashlib.sha256(b"ctx").hexdigest()
+        ctx = _RenderContext.from_seed(seed)
+        self.assertEqual(list(ctx.nums), [int(seed[i: i + 2], 16) for i in range(0, 32, 2)])
+        self.assertEqual(len(ctx.leaf_trig), ctx.traits.leaf_count)
+
     def test_pot_style_biases_with_activity(self) -> None:
         low_activity_style = _biased_pot_style(seed_value=7, harvest_count=1, pick_count=0)
         high_activity_style = _biased_pot_style(seed_value=7, harvest_count=10, pick_count=8)
         self.assertLessEqual(low_activity_style, 3)
         self.assertGreaterEqual(high_activity_style, 3)
 
+    def test_count_buckets_capture_every_count_dependent_trait(self) -> None:
+        for i in range(20):
+            seed = hashlib.sha256(f"buckets-{i}".encode()).hexdigest()
+            rendered: dict[tuple[int, int, int], str] = {}
+            for harvests in range(0, 14):
+                for picks in range(0, 20):
+                    svg = _render(_RenderContext.from_seed(seed, harvests, picks), False)
+                    self.assertEqual(rendered.setdefault(count_buckets(harvests, picks), svg), svg)
+
+    def test_compact_render_draws_the_same_tree(self) -> None:
+        for i in range(300):
+            ctx = _RenderContext.from_seed(hashlib.sha256(f"compact-{i}".encode()).hexdigest(), i % 23, i % 19)
+            for motion in (False, True):
+                verbose, compact = _render(ctx, motion), _render(ctx, motion, compact=True)
+                self.assertEqual(_canonical_svg(compact), _canonical_svg(verbose))
+
+    def test_compact_render_is_smaller(self) -> None:
+        verbose = generate_svg("https://a.example/", harvest_urls=["https://x/1", "https://x/2"])
+        compact = generate_svg("https://a.example/", harvest_urls=["https://x/1", "https://x/2"], compact=True)
+        self.assertIn(f"render:{SVG_RENDER_VERSION};motion:0", compact)
+        self.assertLess(len(compact), len(verbose) * 0.85)
+
+    def test_generate_svgs_matches_generate_svg(self) -> None:
+        specs = [
+            PlantSpec(
+                f"https://batch-{i}.example/",
+                digest_harvest_urls(f"https://x/{i}/{n}" for n in range(i % 3)),
+                i % 23,
+                i % 19,
+                bool(i % 2),
+            )
+            for i in range(100)
+        ]
+        for compact in (False, True):
+            expected = [
+                generate_svg(
+                    spec.me_url,
+                    motion_enabled=spec.motion_enabled,
+                    pick_count=spec.pick_count,
+                    harvest_digest=spec.harvest_digest,
+                    harvest_count=spec.harvest_count,
+                    compact=compact,
+                )
+                for spec in specs
+            ]
+            self.assertEqual(generate_svgs(specs, compact=compact), expected)
+        self.assertEqual(generate_svgs([]), [])
+
+    def test_thumb_render_drops_filters_and_motion(self) -> None:
+        for i in range(200):
+            url = f"https://thumb-{i}.example/"
+            harvests = [f"https://x/{n}" for n in range(i % 14)]
+            thumb = generate_thumb_svg(url, harvest_urls=harvests, pick_count=i % 19)
+            full = generate_svg(url, harvest_urls=harvests, pick_count=i % 19, motion_enabled=True, compact=True)
+            root = ET.fromstring(thumb)
+            self.assertIn(f"render:{SVG_RENDER_VERSION};thumb", thumb)
+            for tag in ("filter", "animate", "animateTransform", "linearGradient", "radialGradient", "use"):
+                self.assertEqual(list(root.iter(f"{_SVG_NS}{tag}")), [], f"{url} has <{tag}>")
+            self.assertNotIn("url(#", thumb)
+            self.assertLess(len(thumb), len(full) / 2)
+
+    @skipUnless(cairosvg or os.environ.get("CI"), "the raster extra or libcairo is not installed")
+    def test_compact_render_rasterizes_identically(self) -> None:
+        # The canonical-tree test above trusts its own resolution of <use> and classes; this checks pixels.
+        for i in range(20):
+            ctx = _RenderContext.from_seed(hashlib.sha256(f"pixels-{i}".encode()).hexdigest(), i, i)
+            verbose, compact = (
+                Image.open(io.BytesIO(cairosvg.svg2png(bytestring=svg.encode("utf-8")))).convert("RGBA")
+                for svg in (_render(ctx, False), _render(ctx, False, compact=True))
+            )
+            diff = ImageChops.difference(verbose, compact)
+            # Allow for anti-aliasing noise from the different transform order, nothing more.
+            self.assertLessEqual(max(high for _, high in diff.getextrema()), 2)
+
     def test_svg_view_populates_redis_cache(self) -> None:
         user = UserIdentity.objects.create(me_url="https://legacy.example/", username="legacy")
         cache.delete(svg_cache_key(user.username))
@@ -55,10 +230,11 @@ class PlantTests(TestCase):
         session["identity_id"] = user.id
         session.save()
 
-        response = self.client.post(
-            "/settings/profile/",
-            {"animate_plant_motion": "on"},
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/settings/profile/",
+                {"animate_plant_motion": "on"},
+            )
         self.assertEqual(response.status_code, 302)
 
         user.refresh_from_db()
@@ -1,7 +1,10 @@
 from django.urls import path
 
-from .views import plant_svg_view
+from .views import plant_raster_view, plant_svg_view, roll_svg_view
 
 urlpatterns = [
     path("u/<slug:username>/plant.svg", plant_svg_view, name="plant_svg"),
+    path("u/<slug:username>/plant.png", plant_raster_view, {"fmt": "png"}, name="plant_png"),
+    path("u/<slug:username>/plant.webp", plant_raster_view, {"fmt": "webp"}, name="plant_webp"),
+    path("u/<slug:username>/roll.svg", roll_svg_view, name="roll_svg"),
 ]
@@ -1,67 +1,92 @@
 from __future__ import annotations
 
-import hashlib
+from collections import Counter
 
-from django.core.cache import cache
 from django.core.paginator import Paginator
-from django.db.models import Count, Q
-from django.http import HttpRequest, HttpResponse, HttpResponseNotModified, JsonResponse
-from django.shortcuts import get_object_or_404, redirect, render
+from django.db import transaction
+from django.conf import settings
+from django.http import Http404, HttpRequest, HttpResponse, HttpResponseRedirect, JsonResponse
+from django.shortcuts import redirect, render
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import http_date
 from django.views.decorators.http import require_GET, require_POST
 
+from embeds.access import embed_allowed, host_allowed, host_from_url, request_embed_host
+from picks.leaderboard import forget_identity, top_picked
 from picks.models import Pick
 
+from .cards import CARD_FIELDS, GardenCard, cached_garden_cards, garden_cards
+from .counters import invalidate_pick_changes, shifted
+from .fragment_cache import PICKS, bump_fragment_versions
+from .identity_cache import get_full_identity_or_404, get_identity_or_404
 from .models import UserIdentity
-from .svg import generate_svg
-from .svg_cache import SVG_CACHE_TIMEOUT, invalidate_svg, svg_cache_key
+from .page_cache import PAGE_CACHE_TIMEOUT, anonymous_page_cache, page_generation_key
+from .search import search_identities
+from .svg_cache import (
+    FULL,
+    IDENTITY,
+    ROLL_SVG_MAX_PLANTS,
+    SVG_SIZES,
+    SvgMeta,
+    current_svg_meta,
+    get_plant_svg,
+    get_roll_svg,
+    invalidate_svg,
+    negotiate_svg_encoding,
+    representation_etag,
+)
+from .svg_raster import RASTER_DIMENSIONS, RASTER_FORMATS, get_plant_raster, raster_available
+from .svg_storage import offloaded_svg_url
 
 HOME_CACHE_TIMEOUT = 60  # seconds
+HOME_CACHE_VERSION = "v2"  # v2: GardenCard tuples instead of pickled UserIdentity lists
+# A redirect to the bucket points at one render, so browsers may only reuse it briefly.
+OFFLOAD_REDIRECT_MAX_AGE = 60
+# Picks per profile/dashboard page; each page's grid <use>s one roll.svg sprite.
+PICKS_PAGE_SIZE = ROLL_SVG_MAX_PLANTS
 
 
-def _current_identity(request: HttpRequest) -> UserIdentity | None:
-    identity_id = request.session.get("identity_id")
-    if not identity_id:
-        return None
-    return UserIdentity.objects.filter(id=identity_id).first()
+def home_cache_key(name: str) -> str:
+    return f"home:{HOME_CACHE_VERSION}:{name}"
+
+
+def _popular_identities(limit: int = 12) -> list[GardenCard]:
+    ranked = top_picked(limit)
+    if ranked is None:
+        # Leaderboard not built (fresh Redis): fall back to the indexed counter.
+        return garden_cards(
+            UserIdentity.objects.filter(incoming_pick_count__gt=0).order_by("-incoming_pick_count")[:limit],
+            "incoming_pick_count",
+        )
+
+    rows = UserIdentity.objects.filter(id__in=[identity_id for identity_id, _ in ranked]).values_list(
+        "id", *CARD_FIELDS
+    )
+    by_id = {identity_id: fields for identity_id, *fields in rows}
+    return [
+        GardenCard(*by_id[identity_id], pick_count)
+        for identity_id, pick_count in ranked
+        if identity_id in by_id
+    ]
 
 
 @require_GET
+@anonymous_page_cache(HOME_CACHE_TIMEOUT)
 def home_view(request: HttpRequest) -> HttpResponse:
     q = request.GET.get("q", "").strip()
-    if q:
-        results = UserIdentity.objects.filter(
-            Q(username__icontains=q) | Q(display_name__icontains=q)
-        ).order_by("username")[:24]
-        recent = cache.get("home:recent")
-        if recent is None:
-            recent = list(UserIdentity.objects.order_by("-created_at")[:12])
-            cache.set("home:recent", recent, timeout=HOME_CACHE_TIMEOUT)
-        popular = cache.get("home:popular")
-        if popular is None:
-            popular = list(
-                UserIdentity.objects.annotate(pick_count=Count("incoming_picks"))
-                .order_by("-pick_count")
-                .filter(pick_count__gt=0)[:12]
-            )
-            cache.set("home:popular", popular, timeout=HOME_CACHE_TIMEOUT)
-    else:
-        results = None
-        recent = cache.get("home:recent")
-        if recent is None:
-            recent = list(UserIdentity.objects.order_by("-created_at")[:12])
-            cache.set("home:recent", recent, timeout=HOME_CACHE_TIMEOUT)
-        popular = cache.get("home:popular")
-        if popular is None:
-            popular = list(
-                UserIdentity.objects.annotate(pick_count=Count("incoming_picks"))
-                .order_by("-pick_count")
-                .filter(pick_count__gt=0)[:12]
-            )
-            cache.set("home:popular", popular, timeout=HOME_CACHE_TIMEOUT)
+    results = search_identities(q) if q else None
+
+    recent = cached_garden_cards(
+        home_cache_key("recent"),
+        lambda: garden_cards(UserIdentity.objects.order_by("-created_at")[:12]),
+        HOME_CACHE_TIMEOUT,
+    )
+    popular = cached_garden_cards(home_cache_key("popular"), _popular_identities, HOME_CACHE_TIMEOUT)
 
     return render(request, "plants/home.html", {
         "recent_identities": recent,
-        "identity": _current_identity(request),
+        "identity": request.identity,
         "search_results": results,
         "q": q,
         "popular_identities": popular,
@@ -70,48 +95,50 @@ def home_view(request: HttpRequest) -> HttpResponse:
 
 @require_GET
 def dashboard_view(request: HttpRequest) -> HttpResponse:
-    identity = _current_identity(request)
+    identity = request.identity
     if not identity:
         return render(request, "plants/dashboard_anonymous.html", status=401)
 
-    from harvests.models import Harvest
-
     micropub_endpoint = request.session.get("micropub_endpoint", "")
     can_post_to_mastodon = (
         identity.login_method == "mastodon"
         and bool(identity.mastodon_access_token)
     )
 
-    harvest_count = Harvest.objects.filter(identity=identity).count()
-
     picks_qs = Pick.objects.filter(picker=identity).select_related("picked").order_by("-created_at")
-    picks_page = Paginator(picks_qs, 24).get_page(request.GET.get("picks_page"))
+    # Lazy: only read when the cached picks fragment misses.
+    picks_page = SimpleLazyObject(lambda: Paginator(picks_qs, PICKS_PAGE_SIZE).get_page(request.GET.get("picks_page")))
 
     return render(request, "plants/dashboard.html", {
         "identity": identity,
         "picks_page": picks_page,
-        "harvest_count": harvest_count,
+        "harvest_count": identity.harvest_count,
         "micropub_endpoint": micropub_endpoint,
         "can_post_to_mastodon": can_post_to_mastodon,
     })
 
 
+def _harvest_page(identity: UserIdentity, number: str | None):
+    from harvests.models import Harvest
+
+    if not identity.show_harvests_on_profile:
+        return None
+    return Paginator(Harvest.objects.filter(identity=identity), 50).get_page(number)
+
+
 @require_GET
+@anonymous_page_cache(PAGE_CACHE_TIMEOUT, generation=page_generation_key, params=("picks_page", "harvest_page"))
 def user_profile_view(request: HttpRequest, username: str) -> HttpResponse:
-    identity = get_object_or_404(UserIdentity, username=username)
-    viewer = _current_identity(request)
+    identity = get_full_identity_or_404(username, viewer=request.identity)
+    viewer = request.identity
     has_picked = False
     if viewer:
         has_picked = Pick.objects.filter(picker=viewer, picked=identity).exists()
 
     picks_qs = Pick.objects.filter(picker=identity).select_related("picked").order_by("-created_at")
-    picks_page = Paginator(picks_qs, 24).get_page(request.GET.get("picks_page"))
-
-    from harvests.models import Harvest
-
-    harvest_page = None
-    if identity.show_harvests_on_profile:
-        harvest_page = Paginator(Harvest.objects.filter(identity=identity), 50).get_page(request.GET.get("harvest_page"))
+    # Lazy, like the dashboard's.
+    picks_page = SimpleLazyObject(lambda: Paginator(picks_qs, PICKS_PAGE_SIZE).get_page(request.GET.get("picks_page")))
+    harvest_page = SimpleLazyObject(lambda: _harvest_page(identity, request.GET.get("harvest_page")))
 
     return render(
         request,
@@ -120,16 +147,29 @@ def user_profile_view(request: HttpRequest, username: str) -> HttpResponse:
             "identity": identity,
             "viewer": viewer,
             "has_picked": has_picked,
-            "pick_count": Pick.objects.filter(picked=identity).count(),
+            "pick_count": identity.incoming_pick_count,
             "picks_page": picks_page,
             "harvest_page": harvest_page,
+            "og_url": f"{settings.PUBLIC_BASE_URL}{request.path}",
+            "og_image": _og_image(identity),
         },
     )
 
 
+def _og_image(identity: UserIdentity) -> dict | None:
+    if not raster_available():
+        return None
+    width, height = RASTER_DIMENSIONS[FULL]
+    return {
+        "url": f"{settings.PUBLIC_BASE_URL}/u/{identity.username}/plant.png",
+        "width": width,
+        "height": height,
+    }
+
+
 @require_POST
 def profile_settings_view(request: HttpRequest) -> HttpResponse:
-    identity = _current_identity(request)
+    identity = request.identity
     if not identity:
         return HttpResponse("Unauthorized", status=401)
     new_show_harvests = "show_harvests_on_profile" in request.POST
@@ -140,17 +180,16 @@ def profile_settings_view(request: HttpRequest) -> HttpResponse:
     )
     identity.show_harvests_on_profile = new_show_harvests
     identity.animate_plant_motion = new_animate_motion
-    if should_invalidate:
-        invalidate_svg(identity.username)
-        identity.save(update_fields=["show_harvests_on_profile", "animate_plant_motion", "updated_at"])
-    else:
+    with transaction.atomic():
         identity.save(update_fields=["show_harvests_on_profile", "animate_plant_motion", "updated_at"])
+        if should_invalidate:
+            invalidate_svg(identity.username)
     return redirect("account_settings")
 
 
 @require_GET
 def account_settings_view(request: HttpRequest) -> HttpResponse:
-    identity = _current_identity(request)
+    identity = request.identity
     if not identity:
         return redirect("home")
     return render(request, "settings/settings.html", {"identity": identity})
@@ -158,17 +197,34 @@ def account_settings_view(request: HttpRequest) -> HttpResponse:
 
 @require_POST
 def delete_account_view(request: HttpRequest) -> HttpResponse:
-    identity = _current_identity(request)
+    identity = request.identity
     if not identity:
         return HttpResponse("Unauthorized", status=401)
-    identity.delete()  # cascades Harvests, Picks
+    identity_id, username = identity.id, identity.username
+    with transaction.atomic():
+        # The cascade removes this identity's picks; keep the other side's counters in step.
+        picked_ids = list(Pick.objects.filter(picker=identity).values_list("picked_id", flat=True))
+        UserIdentity.objects.filter(id__in=picked_ids).update(
+            incoming_pick_count=shifted("incoming_pick_count", -1),
+        )
+        picker_ids = list(UserIdentity.objects.filter(outgoing_picks__picked=identity).values_list("id", flat=True))
+        UserIdentity.objects.filter(id__in=picker_ids).update(
+            outgoing_pick_count=shifted("outgoing_pick_count", -1),
+        )
+        identity.delete()  # cascades Harvests, Picks
+        invalidate_svg(username)  # retire the stored ETag so revalidations stop getting 304s
+        # Someone who both picked and was picked by this identity loses two picks.
+        invalidate_pick_changes({i: -n for i, n in Counter((*picked_ids, *picker_ids)).items()})
+        for picker_id in picker_ids:
+            bump_fragment_versions(picker_id, PICKS)
+    forget_identity(identity_id, picked_ids)
     request.session.flush()
     return redirect("home")
 
 
 @require_GET
 def export_data_view(request: HttpRequest) -> HttpResponse:
-    identity = _current_identity(request)
+    identity = request.identity
     if not identity:
         return HttpResponse("Unauthorized", status=401)
     from harvests.models import Harvest
@@ -190,32 +246,101 @@ def export_data_view(request: HttpRequest) -> HttpResponse:
     return response
 
 
+def _svg_response(meta: SvgMeta, encoding: str, body: str | bytes = "") -> HttpResponse:
+    response = HttpResponse(body, content_type="image/svg+xml")
+    response["Cache-Control"] = "public, max-age=3600"
+    response["ETag"] = representation_etag(meta.etag, encoding)
+    response["Last-Modified"] = http_date(meta.last_modified)
+    if encoding != IDENTITY:
+        response["Content-Encoding"] = encoding
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
+
+
+def _requested_size(request: HttpRequest) -> str:
+    size = request.GET.get("size", FULL)
+    return size if size in SVG_SIZES else FULL
+
+
 @require_GET
 def plant_svg_view(request: HttpRequest, username: str) -> HttpResponse:
-    from harvests.models import Harvest
+    size = _requested_size(request)
+    url = offloaded_svg_url(username, size)
+    if url is not None:
+        response = HttpResponseRedirect(url)
+        response["Cache-Control"] = f"public, max-age={OFFLOAD_REDIRECT_MAX_AGE}"
+        return response
+    encoding = negotiate_svg_encoding(request.headers.get("Accept-Encoding", ""))
+    # Revalidations are answered from the small meta key: no identity query
+    # and no SVG body read from Redis.
+    if "If-None-Match" in request.headers or "If-Modified-Since" in request.headers:
+        meta = current_svg_meta(username, size)
+        if meta is not None:
+            response = _svg_response(meta, encoding)
+            response = get_conditional_response(
+                request, etag=response["ETag"], last_modified=meta.last_modified, response=response,
+            )
+            if response.status_code == 304:
+                return response
+
+    identity = get_identity_or_404(username)
+    body, meta = get_plant_svg(identity, encoding, size)
+    response = _svg_response(meta, encoding, body)
+    return get_conditional_response(
+        request, etag=response["ETag"], last_modified=meta.last_modified, response=response,
+    )
 
-    identity = get_object_or_404(UserIdentity, username=username)
-    cache_key = svg_cache_key(identity.username)
-    svg = cache.get(cache_key)
-
-    if svg is None:
-        harvest_urls = list(Harvest.objects.filter(identity=identity).values_list("url", flat=True))
-        pick_count = Pick.objects.filter(Q(picker=identity) | Q(picked=identity)).count()
-        svg = generate_svg(
-            identity.me_url,
-            harvest_urls=harvest_urls,
-            motion_enabled=identity.animate_plant_motion,
-            pick_count=pick_count,
-        )
-        cache.set(cache_key, svg, timeout=SVG_CACHE_TIMEOUT)
 
-    etag = hashlib.sha256(svg.encode("utf-8")).hexdigest()
-    if request.headers.get("If-None-Match") == etag:
-        response = HttpResponseNotModified()
-        response["ETag"] = etag
-        return response
+@require_GET
+def roll_svg_view(request: HttpRequest, username: str) -> HttpResponse:
+    """Sprite of one page of ``username``'s picks, in the order the profile pages them (``?page=``)."""
+    identity = get_identity_or_404(username)
+    # Our own profile and embed pages <use> it, gardn.js fetches it from the owner's site.
+    embed_host = request_embed_host(request)
+    if not (embed_allowed(request, identity) or embed_host == host_from_url(settings.PUBLIC_BASE_URL)):
+        return HttpResponse("Forbidden: embed domain not allowed", status=403)
+    picks_qs = Pick.objects.filter(picker_id=identity.id).select_related("picked").order_by("-created_at")
+    picked = [pick.picked for pick in Paginator(picks_qs, PICKS_PAGE_SIZE).get_page(request.GET.get("page"))]
+    encoding = negotiate_svg_encoding(request.headers.get("Accept-Encoding", ""))
+    body, meta = get_roll_svg(identity.username, picked, encoding)
+    response = _svg_response(meta, encoding, body)
+    origin = request.headers.get("Origin", "")
+    if origin and host_allowed(host_from_url(origin), host_from_url(identity.me_url)):
+        response["Access-Control-Allow-Origin"] = origin
+    # Access hangs on both headers, so a shared cache must not hand one page's copy to another.
+    patch_vary_headers(response, ("Origin", "Referer"))
+    return get_conditional_response(
+        request, etag=response["ETag"], last_modified=meta.last_modified, response=response,
+    )
 
-    response = HttpResponse(svg, content_type="image/svg+xml")
+
+def _raster_response(meta: SvgMeta, fmt: str, body: bytes = b"") -> HttpResponse:
+    response = HttpResponse(body, content_type=RASTER_FORMATS[fmt])
     response["Cache-Control"] = "public, max-age=3600"
-    response["ETag"] = etag
+    response["ETag"] = representation_etag(meta.etag, fmt)
+    response["Last-Modified"] = http_date(meta.last_modified)
     return response
+
+
+@require_GET
+def plant_raster_view(request: HttpRequest, username: str, fmt: str) -> HttpResponse:
+    if not raster_available():
+        raise Http404("Plant images are not available on this server")
+    size = _requested_size(request)
+    # A raster is named by the SVG it was drawn from, so the SVG's meta key answers revalidations.
+    if "If-None-Match" in request.headers or "If-Modified-Since" in request.headers:
+        meta = current_svg_meta(username, size)
+        if meta is not None:
+            response = _raster_response(meta, fmt)
+            response = get_conditional_response(
+                request, etag=response["ETag"], last_modified=meta.last_modified, response=response,
+            )
+            if response.status_code == 304:
+                return response
+
+    identity = get_identity_or_404(username)
+    body, meta = get_plant_raster(identity, size, fmt)
+    response = _raster_response(meta, fmt, body)
+    return get_conditional_response(
+        request, etag=response["ETag"], last_modified=meta.last_modified, response=response,
+    )
@@ -93,18 +93,31 @@
     el.appendChild(a);
   }
 
-  function renderRoll(el, data) {
+  function rollPlant(row, domain, sprite) {
+    // The sprite holds the first page of picks; later rows fall back to their own thumb.
+    if (sprite && sprite.indexOf('id="plant-' + row.username + '"') !== -1) {
+      return '<svg class="gardn-roll-plant" viewBox="0 0 300 240" width="120" height="96" role="img" aria-label="Plant for ' + domain + '">' +
+        '<use href="#plant-' + escapeHtml(row.username) + '"/></svg>';
+    }
+    return '<img class="gardn-roll-plant" src="' + row.plant_svg_url + '" alt="Plant for ' + domain + '" loading="lazy" width="120" height="96" />';
+  }
+
+  function renderRoll(el, data, sprite) {
     if (!data.roll || !data.roll.length) {
       el.textContent = "No picks yet.";
       return;
     }
-    var html = '<div class="gardn-roll">';
+    // One roll.svg request holds every plant; the cards <use> its symbols.
+    var html = sprite
+      ? '<div aria-hidden="true" style="position:absolute;width:0;height:0;overflow:hidden">' + sprite + "</div>"
+      : "";
+    html += '<div class="gardn-roll">';
     data.roll.forEach(function (row) {
       var name = escapeHtml(row.display_name || row.username);
       var domain = escapeHtml(stripScheme(row.me_url));
       html +=
         '<a class="gardn-roll-card" href="' + row.me_url + '" target="_top" rel="noopener noreferrer">' +
-        '<img class="gardn-roll-plant" src="' + row.plant_svg_url + '" alt="Plant for ' + domain + '" loading="lazy" width="120" height="96" />' +
+        rollPlant(row, domain, sprite) +
         '<strong class="gardn-roll-name">' + name + "</strong>" +
         '<small class="gardn-roll-domain">' + domain + "</small>" +
         "</a>";
@@ -175,7 +188,13 @@
         if (!r.ok) throw new Error("fetch failed");
         return r.json();
       })
-      .then(function (data) { renderRoll(node, data); })
+      .then(function (data) {
+        if (!data.roll || !data.roll.length || !data.roll_svg_url) return renderRoll(node, data, null);
+        return fetch(data.roll_svg_url)
+          .then(function (r) { return r.ok ? r.text() : null; })
+          .catch(function () { return null; })
+          .then(function (sprite) { renderRoll(node, data, sprite); });
+      })
       .catch(function () { renderRollFallback(node, username); });
   });
 
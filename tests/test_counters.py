@@ -0,0 +1,110 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from harvests.models import Harvest
+from picks.models import Pick
+from plants.counters import reconcile_counters
+from plants.models import UserIdentity
+from plants.page_cache import page_generation
+from plants.svg import digest_harvest_urls
+from plants.svg_cache import svg_generation
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.a = UserIdentity.objects.create(me_url="https://a.example/", username="a")
+        self.b = UserIdentity.objects.create(me_url="https://b.example/", username="b")
+
+    def _login(self, identity):
+        session = self.client.session
+        session["identity_id"] = identity.id
+        session.save()
+
+    def _counters(self, identity):
+        identity.refresh_from_db()
+        return identity.incoming_pick_count, identity.outgoing_pick_count, identity.harvest_count
+
+    def test_pick_and_unpick_update_counters(self):
+        self._login(self.a)
+        self.client.post("/pick/b/")
+        self.client.post("/pick/b/")
+        self.assertEqual(self._counters(self.a), (0, 1, 0))
+        self.assertEqual(self._counters(self.b), (1, 0, 0))
+
+        self.client.post("/unpick/b/")
+        self.client.post("/unpick/b/")
+        self.assertEqual(self._counters(self.a), (0, 0, 0))
+        self.assertEqual(self._counters(self.b), (0, 0, 0))
+
+    def test_harvest_create_and_delete_update_counter(self):
+        self._login(self.a)
+        self.client.post("/harvest/", {"url": "https://example.com/one"})
+        self.client.post("/harvest/", {"url": "https://example.com/one"})
+        self.client.post("/harvest/", {"url": "https://example.com/two"})
+        self.assertEqual(self._counters(self.a)[2], 2)
+
+        harvest = Harvest.objects.get(identity=self.a, url="https://example.com/one")
+        self.client.post(f"/harvest/{harvest.id}/delete/")
+        self.assertEqual(self._counters(self.a)[2], 1)
+
+    def test_deleting_a_harvest_twice_counts_once(self):
+        self._login(self.a)
+        self.client.post("/harvest/", {"url": "https://example.com/one"})
+        self.client.post("/harvest/", {"url": "https://example.com/two"})
+        harvest = Harvest.objects.get(identity=self.a, url="https://example.com/one")
+
+        self.client.post(f"/harvest/{harvest.id}/delete/")
+        # A double submit: the second request loaded the row before the first deleted it.
+        with patch("harvests.views.get_object_or_404", return_value=harvest):
+            self.client.post(f"/harvest/{harvest.id}/delete/")
+
+        self.assertEqual(self._counters(self.a)[2], 1)
+        self.assertEqual(self.a.harvest_digest, digest_harvest_urls(["https://example.com/two"]))
+
+    def test_account_deletion_updates_counterparts(self):
+        self._login(self.a)
+        self.client.post("/pick/b/")
+        self._login(self.b)
+        self.client.post("/pick/a/")
+        page_before = page_generation("a")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/settings/account/delete/")
+
+        self.assertEqual(self._counters(self.a), (0, 0, 0))
+        # Two picks to none keeps the plant's bucket, but the page shows the count.
+        self.assertGreater(page_generation("a"), page_before)
+
+    def test_views_read_counter_instead_of_counting(self):
+        UserIdentity.objects.filter(id=self.b.id).update(incoming_pick_count=5)
+
+        response = self.client.get("/u/b/")
+        self.assertEqual(response.context["pick_count"], 5)
+
+        response = self.client.get("/api/b/plant.json", HTTP_ORIGIN="https://b.example")
+        self.assertEqual(response.json()["pick_count"], 5)
+
+    def test_reconcile_repairs_drift(self):
+        Pick.objects.create(picker=self.a, picked=self.b)
+        Harvest.objects.create(identity=self.a, url="https://example.com/one")
+        UserIdentity.objects.filter(id=self.b.id).update(outgoing_pick_count=7)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(reconcile_counters(), 2)
+        self.assertEqual(self._counters(self.a), (0, 1, 1))
+        self.assertEqual(self._counters(self.b), (1, 0, 0))
+        self.assertGreater(svg_generation("a"), 0)
+        self.assertGreater(page_generation("b"), 0)
+        self.assertEqual(reconcile_counters(), 0)
+
+    def test_reconcile_command(self):
+        Pick.objects.create(picker=self.a, picked=self.b)
+        out = StringIO()
+        call_command("reconcile_counters", stdout=out)
+        self.assertIn("Repaired counters for 2 identities.", out.getvalue())
+        self.assertEqual(self._counters(self.b), (1, 0, 0))
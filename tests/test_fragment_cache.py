@@ -0,0 +1,79 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.template import Context, Template, TemplateSyntaxError
+from django.test import TestCase
+
+from harvests.models import Harvest
+from plants.fragment_cache import PICKS, bump_fragment_versions, fragment_hit_ratios
+from plants.models import UserIdentity
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = UserIdentity.objects.create(
+            me_url="https://alice.example/", username="alice", display_name="Alice", show_harvests_on_profile=True,
+        )
+        self.bob = UserIdentity.objects.create(me_url="https://bob.example/", username="bob", display_name="Bob")
+
+    def _login(self, identity):
+        session = self.client.session
+        session["identity_id"] = identity.id
+        session.save()
+
+    def _render(self, source, **context):
+        return Template("{% load gardn_cache %}" + source).render(Context(context))
+
+    def test_fragment_reused_until_its_version_moves(self):
+        source = '{% gardn_cache "t" identity "picks" %}{{ value }}{% endgardn_cache %}'
+        self.assertEqual(self._render(source, identity=self.alice, value="first"), "first")
+        self.assertEqual(self._render(source, identity=self.alice, value="second"), "first")
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_fragment_versions(self.alice.id, PICKS)
+        self.assertEqual(self._render(source, identity=self.alice, value="third"), "third")
+        self.assertEqual(fragment_hit_ratios()["t"], (3, 1))
+
+    def test_vary_on_arguments_split_the_key(self):
+        source = '{% gardn_cache "t" identity "profile" page %}{{ page }}{% endgardn_cache %}'
+        self.assertEqual(self._render(source, identity=self.alice, page=1), "1")
+        self.assertEqual(self._render(source, identity=self.alice, page=2), "2")
+
+    def test_bad_arguments_rejected(self):
+        with self.assertRaises(TemplateSyntaxError):
+            Template('{% load gardn_cache %}{% gardn_cache "t" identity %}{% endgardn_cache %}')
+        with self.assertRaises(TemplateSyntaxError):
+            Template('{% load gardn_cache %}{% gardn_cache "t" identity "comments" %}{% endgardn_cache %}')
+
+    def test_dashboard_picks_follow_pick_and_rename(self):
+        self._login(self.alice)
+        self.assertContains(self.client.get("/dashboard/"), "Your picks (0)")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/pick/bob/")
+        self.assertContains(self.client.get("/dashboard/"), "Your picks (1)")
+
+        self.bob.display_name = "Robert"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bob.save(update_fields=["display_name"])
+        self.assertContains(self.client.get("/dashboard/"), "Robert")
+
+    def test_profile_harvests_follow_harvest_edit(self):
+        harvest = Harvest.objects.create(identity=self.alice, url="https://example.com/a", title="Old title")
+        self._login(self.bob)
+        self.assertContains(self.client.get("/u/alice/"), "Old title")
+        self._login(self.alice)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/harvest/{harvest.id}/edit/", {"title": "New title"})
+        self._login(self.bob)
+        self.assertContains(self.client.get("/u/alice/"), "New title")
+
+    def test_stats_command_reports_per_fragment(self):
+        self._login(self.alice)
+        self.client.get("/dashboard/")
+        self.client.get("/dashboard/")
+        out = StringIO()
+        call_command("fragment_cache_stats", "--reset", stdout=out)
+        self.assertIn("dashboard_picks", out.getvalue())
+        self.assertIn("(50% hit)", out.getvalue())
+        self.assertEqual(fragment_hit_ratios(), {})
@@ -0,0 +1,145 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from harvests.models import Harvest
+from plants.models import UserIdentity
+from plants.svg import digest_harvest_urls, generate_svg, update_harvest_digest
+from plants.svg_cache import svg_generation
+
+URLS = [
+    "https://example.com/one",
+    "https://example.com/two",
+    "https://example.com/three",
+    "https://example.com/four",
+]
+
+
+class HarvestDigestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _login(self, identity):
+        session = self.client.session
+        session["identity_id"] = identity.id
+        session.save()
+
+    def test_digest_ignores_order(self):
+        self.assertEqual(digest_harvest_urls(URLS), digest_harvest_urls(reversed(URLS)))
+        self.assertEqual(digest_harvest_urls(URLS), digest_harvest_urls(sorted(URLS)))
+
+    def test_incremental_updates_match_full_digest(self):
+        digest = ""
+        for url in URLS:
+            digest = update_harvest_digest(digest, url)
+        self.assertEqual(digest, digest_harvest_urls(URLS))
+
+        digest = update_harvest_digest(digest, URLS[1], removed=True)
+        self.assertEqual(digest, digest_harvest_urls([URLS[0], URLS[2], URLS[3]]))
+
+    def test_empty_digest_is_blank(self):
+        self.assertEqual(digest_harvest_urls([]), "")
+        self.assertEqual(update_harvest_digest(update_harvest_digest("", URLS[0]), URLS[0], removed=True), "")
+
+    def test_digest_is_insertion_order_independent_through_views(self):
+        first = UserIdentity.objects.create(me_url="https://first.example/", username="first")
+        second = UserIdentity.objects.create(me_url="https://second.example/", username="second")
+
+        self._login(first)
+        for url in URLS:
+            self.client.post("/harvest/", {"url": url})
+        self._login(second)
+        for url in reversed(URLS):
+            self.client.post("/harvest/", {"url": url})
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.harvest_digest, digest_harvest_urls(URLS))
+        self.assertEqual(first.harvest_digest, second.harvest_digest)
+
+    def test_resubmitting_a_harvest_does_not_change_digest(self):
+        identity = UserIdentity.objects.create(me_url="https://a.example/", username="a")
+        self._login(identity)
+        self.client.post("/harvest/", {"url": URLS[0], "title": "First"})
+        self.client.post("/harvest/", {"url": URLS[0], "title": "Edited"})
+        identity.refresh_from_db()
+        self.assertEqual(identity.harvest_digest, digest_harvest_urls([URLS[0]]))
+
+    def test_delete_removes_url_from_digest(self):
+        identity = UserIdentity.objects.create(me_url="https://a.example/", username="a")
+        self._login(identity)
+        for url in URLS[:2]:
+            self.client.post("/harvest/", {"url": url})
+        harvest = Harvest.objects.get(identity=identity, url=URLS[0])
+
+        self.client.post(f"/harvest/{harvest.id}/delete/")
+
+        identity.refresh_from_db()
+        self.assertEqual(identity.harvest_digest, digest_harvest_urls([URLS[1]]))
+
+    def test_concurrent_delete_removes_url_once(self):
+        identity = UserIdentity.objects.create(me_url="https://a.example/", username="a")
+        self._login(identity)
+        for url in URLS[:2]:
+            self.client.post("/harvest/", {"url": url})
+        harvest = Harvest.objects.get(identity=identity, url=URLS[0])
+
+        self.client.post(f"/harvest/{harvest.id}/delete/")
+        # The second request loaded the row before the first one deleted it.
+        with patch("harvests.views.get_object_or_404", return_value=harvest):
+            self.client.post(f"/harvest/{harvest.id}/delete/")
+
+        identity.refresh_from_db()
+        self.assertEqual(identity.harvest_digest, digest_harvest_urls([URLS[1]]))
+
+    def test_stored_digest_renders_same_plant_as_urls(self):
+        self.assertEqual(
+            generate_svg("https://a.example/", harvest_urls=URLS),
+            generate_svg("https://a.example/", harvest_digest=digest_harvest_urls(URLS), harvest_count=len(URLS)),
+        )
+
+    def test_svg_view_does_not_scan_harvest_urls(self):
+        identity = UserIdentity.objects.create(me_url="https://a.example/", username="a")
+        self._login(identity)
+        self.client.post("/harvest/", {"url": URLS[0]})
+        cache.clear()
+
+        with self.assertNumQueries(1):  # the identity row carries every render input
+            response = self.client.get("/u/a/plant.svg")
+        self.assertEqual(response.status_code, 200)
+
+    def test_backfill_command_repairs_digests(self):
+        identity = UserIdentity.objects.create(me_url="https://a.example/", username="a")
+        for url in URLS:
+            Harvest.objects.create(identity=identity, url=url)
+        self.assertEqual(identity.harvest_digest, "")
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("backfill_harvest_digests", stdout=out)
+
+        identity.refresh_from_db()
+        self.assertEqual(identity.harvest_digest, digest_harvest_urls(URLS))
+        self.assertIn("Updated 1 of 1", out.getvalue())
+        self.assertGreater(svg_generation("a"), 0)
+
+    def test_mastodon_merge_rebuilds_digest_and_retires_plant(self):
+        existing = UserIdentity.objects.create(me_url="https://carol.example/", username="carol-example")
+        Harvest.objects.create(identity=existing, url=URLS[0])
+        mastodon = UserIdentity.objects.create(
+            me_url="https://mastodon.example/@carol", username="mastodon-example-carol",
+            login_method="mastodon", mastodon_profile_url="https://mastodon.example/@carol",
+        )
+        Harvest.objects.create(identity=mastodon, url=URLS[1])
+        self._login(mastodon)
+
+        with patch("mastodon_auth.views.check_website_link", return_value=True), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/mastodon/verify-website/", {"website_url": "https://carol.example/"})
+
+        existing.refresh_from_db()
+        self.assertEqual(existing.harvest_digest, digest_harvest_urls(URLS[:2]))
+        self.assertGreater(svg_generation("carol-example"), 0)
@@ -176,11 +176,12 @@ class HarvestEditViewTests(TestCase):
         get_harvest_stats(self.identity.id)
         self.assertIsNotNone(cache.get(harvest_stats_cache_key(self.identity.id)))
 
-        self.client.post(
-            f"/harvest/{self.harvest.id}/edit/",
-            {"title": "Updated Title", "note": "", "tags": "python, django"},
-            HTTP_HX_REQUEST="true",
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                f"/harvest/{self.harvest.id}/edit/",
+                {"title": "Updated Title", "note": "", "tags": "python, django"},
+                HTTP_HX_REQUEST="true",
+            )
 
         self.assertIsNone(cache.get(harvest_stats_cache_key(self.identity.id)))
 
@@ -329,10 +330,11 @@ class HarvestMutationFallbackTests(TestCase):
         get_harvest_stats(self.identity.id)
         self.assertIsNotNone(cache.get(harvest_stats_cache_key(self.identity.id)))
 
-        self.client.post(
-            "/harvest/",
-            {"url": "https://example.com/new", "title": "New"},
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                "/harvest/",
+                {"url": "https://example.com/new", "title": "New"},
+            )
 
         self.assertIsNone(cache.get(harvest_stats_cache_key(self.identity.id)))
 
@@ -340,6 +342,7 @@ class HarvestMutationFallbackTests(TestCase):
         get_harvest_stats(self.identity.id)
         self.assertIsNotNone(cache.get(harvest_stats_cache_key(self.identity.id)))
 
-        self.client.post(f"/harvest/{self.harvest.id}/delete/", HTTP_HX_REQUEST="true")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/harvest/{self.harvest.id}/delete/", HTTP_HX_REQUEST="true")
 
         self.assertIsNone(cache.get(harvest_stats_cache_key(self.identity.id)))
@@ -3,7 +3,9 @@ from django.db import connection
 from django.test import TestCase
 from django.test.utils import CaptureQueriesContext
 
+from plants.cards import GardenCard
 from plants.models import UserIdentity
+from plants.views import home_cache_key
 
 
 class HomeCacheTests(TestCase):
@@ -12,8 +14,8 @@ class HomeCacheTests(TestCase):
 
     def test_home_cache_populated_after_first_request(self):
         self.client.get("/")
-        self.assertIsNotNone(cache.get("home:recent"))
-        self.assertIsNotNone(cache.get("home:popular"))
+        self.assertIsNotNone(cache.get(home_cache_key("recent")))
+        self.assertIsNotNone(cache.get(home_cache_key("popular")))
 
     def test_home_cache_used_on_second_request(self):
         self.client.get("/")  # populates cache
@@ -32,8 +34,8 @@ class HomeCacheTests(TestCase):
             username="testuser",
             display_name="Test User",
         )
-        cache.set("home:recent", [identity], timeout=60)
-        cache.set("home:popular", [], timeout=60)
+        cache.set(home_cache_key("recent"), [(identity.username, identity.display_name, identity.me_url, 0)], timeout=60)
+        cache.set(home_cache_key("popular"), [], timeout=60)
         with CaptureQueriesContext(connection) as ctx:
             response = self.client.get("/?q=test")
         self.assertEqual(response.status_code, 200)
@@ -45,3 +47,16 @@ class HomeCacheTests(TestCase):
             f"Expected only the search query, got {len(useridentity_queries)}: {useridentity_queries}",
         )
         self.assertIn("like", useridentity_queries[0].lower())
+
+    def test_cached_lists_hold_only_card_fields(self):
+        UserIdentity.objects.create(
+            me_url="https://alice.example/", username="alice", display_name="Alice",
+            bio="long bio", mastodon_access_token="secret",
+        )
+        response = self.client.get("/")
+        self.assertContains(response, "Alice")
+        rows = cache.get(home_cache_key("recent")).value
+        self.assertEqual(rows, [("alice", "Alice", "https://alice.example/", 0)])
+        # Plain tuples: nothing model-shaped (or secret) is pickled into Redis.
+        self.assertIs(type(rows[0]), tuple)
+        self.assertEqual(response.context["recent_identities"], [GardenCard("alice", "Alice", "https://alice.example/")])
@@ -0,0 +1,82 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.http import Http404
+from django.test import TestCase
+
+from plants.identity_cache import CachedIdentity, full_identity, identity_cache_key, resolve_identity
+from plants.models import UserIdentity
+
+
+class IdentityCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.identity = UserIdentity.objects.create(
+            me_url="https://alice.example/", username="alice", display_name="Alice",
+        )
+
+    def test_warm_plant_svg_needs_no_queries(self):
+        self.client.get("/u/alice/plant.svg")
+        with self.assertNumQueries(0):
+            response = self.client.get("/u/alice/plant.svg")
+        self.assertEqual(response.status_code, 200)
+
+    def test_cached_record_is_compact(self):
+        resolve_identity("alice")
+        self.assertEqual(
+            resolve_identity("alice"),
+            CachedIdentity(self.identity.id, "alice", "https://alice.example/", "Alice", False, False, True),
+        )
+        self.assertIsInstance(cache.get(identity_cache_key("alice")), tuple)
+
+    def test_record_for_a_deleted_row_is_not_found(self):
+        resolve_identity("alice")
+        record = resolve_identity("alice")
+        UserIdentity.objects.filter(pk=self.identity.pk).delete()  # its on_commit eviction never runs here
+        with self.assertRaises(Http404):
+            full_identity(record)
+
+    def test_unknown_username_is_negatively_cached(self):
+        self.assertEqual(self.client.get("/u/nobody/plant.svg").status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/api/nobody/roll.json").status_code, 404)
+            self.assertEqual(self.client.get("/u/nobody/").status_code, 404)
+
+    def test_new_identity_replaces_negative_entry(self):
+        self.assertIsNone(resolve_identity("bob"))
+        with self.captureOnCommitCallbacks(execute=True):
+            UserIdentity.objects.create(me_url="https://bob.example/", username="bob")
+        self.assertEqual(resolve_identity("bob").username, "bob")
+
+    def test_save_refreshes_record(self):
+        resolve_identity("alice")
+        self.identity.display_name = "Alice B."
+        with self.captureOnCommitCallbacks(execute=True):
+            self.identity.save(update_fields=["display_name"])
+        resolve_identity("alice")
+        self.assertEqual(resolve_identity("alice").display_name, "Alice B.")
+
+    def test_delete_evicts_record(self):
+        resolve_identity("alice")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.identity.delete()
+        self.assertIsNone(resolve_identity("alice"))
+
+    def test_verify_website_rename_evicts_old_username(self):
+        mastodon = UserIdentity.objects.create(
+            me_url="https://mastodon.example/@carol", username="mastodon-example-carol",
+            login_method="mastodon", mastodon_profile_url="https://mastodon.example/@carol",
+            website_verified=False,
+        )
+        self.assertIsNotNone(resolve_identity("mastodon-example-carol"))
+        session = self.client.session
+        session["identity_id"] = mastodon.id
+        session.save()
+
+        with patch("mastodon_auth.views.check_website_link", return_value=True), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/mastodon/verify-website/", {"website_url": "https://carol.example/"})
+        self.assertEqual(response.status_code, 302)
+
+        self.assertIsNone(resolve_identity("mastodon-example-carol"))
+        self.assertEqual(resolve_identity("carol-example").me_url, "https://carol.example/")
@@ -0,0 +1,119 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+
+from gardn.invalidation import GENERATION_TIMEOUT, bump_on_commit, delete_on_commit
+from gardn.redis_client import get_redis, redis_key
+from harvests.cache import get_harvest_stats, harvest_stats_cache_key, invalidate_harvest_stats
+from harvests.models import Harvest
+from plants.models import UserIdentity
+from plants.svg_cache import svg_generation, svg_generation_key
+
+
+class InvalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.identity = UserIdentity.objects.create(me_url="https://alice.example/", username="alice")
+
+    def test_read_between_write_and_commit_does_not_survive(self):
+        get_harvest_stats(self.identity.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            Harvest.objects.create(identity=self.identity, url="https://example.com/a")
+            invalidate_harvest_stats(self.identity.id)
+            # A reader that cannot see the transaction would cache the old totals here.
+            cache.set(harvest_stats_cache_key(self.identity.id), {"harvest_count": 0}, timeout=3600)
+        self.assertIsNone(cache.get(harvest_stats_cache_key(self.identity.id)))
+
+    def test_nothing_happens_before_commit(self):
+        cache.set("a", 1)
+        with self.captureOnCommitCallbacks() as callbacks:
+            delete_on_commit("a")
+            bump_on_commit(svg_generation_key("alice"))
+            self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(svg_generation("alice"), 0)
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get("a"))
+        self.assertGreater(svg_generation("alice"), 0)
+
+    def test_transaction_sends_one_pipeline_with_each_key_once(self):
+        cache.set("a", 1)
+        cache.set("b", 2)
+        with patch("gardn.invalidation.get_redis", wraps=get_redis) as mock_redis, \
+                patch("gardn.invalidation._generation_floor", return_value=100), \
+                self.captureOnCommitCallbacks(execute=True):
+            delete_on_commit("a", "b")
+            delete_on_commit("a")
+            bump_on_commit("gen")
+            bump_on_commit("gen")
+        self.assertEqual(mock_redis.call_count, 1)
+        self.assertIsNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("gen"), 101)
+
+    def test_rolled_back_savepoint_drops_only_its_keys(self):
+        cache.set("outer", 1)
+        cache.set("inner", 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            delete_on_commit("outer")
+            try:
+                with transaction.atomic():
+                    delete_on_commit("inner")
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertIsNone(cache.get("outer"))
+        self.assertEqual(cache.get("inner"), 2)
+
+    def test_rolled_back_transaction_leaves_nothing_for_the_next_commit(self):
+        cache.set("rolled-back", 1)
+        cache.set("committed", 2)
+        try:
+            with transaction.atomic():
+                delete_on_commit("rolled-back")
+                bump_on_commit("gen")
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        with self.captureOnCommitCallbacks(execute=True):
+            delete_on_commit("committed")
+        self.assertEqual(cache.get("rolled-back"), 1)
+        self.assertIsNone(cache.get("gen"))
+        self.assertIsNone(cache.get("committed"))
+
+    def test_bumped_counters_expire(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_on_commit("gen")
+        ttl = get_redis().ttl(redis_key("gen"))
+        self.assertGreater(ttl, 0)
+        self.assertLessEqual(ttl, GENERATION_TIMEOUT)
+
+    def test_expired_counter_restarts_above_its_old_values(self):
+        with patch("gardn.invalidation._generation_floor", return_value=100), \
+                self.captureOnCommitCallbacks(execute=True):
+            bump_on_commit("gen")
+        before = cache.get("gen")
+        get_redis(write=True).delete(redis_key("gen"))  # expired
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_on_commit("gen")
+        self.assertGreater(cache.get("gen"), before)
+
+
+class OutermostRollbackTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_keys_of_a_rolled_back_transaction_are_not_sent_by_the_next_commit(self):
+        cache.set("rolled-back", 1)
+        try:
+            with transaction.atomic():
+                delete_on_commit("rolled-back")
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        with transaction.atomic():
+            bump_on_commit("gen")
+        self.assertEqual(cache.get("rolled-back"), 1)
+        self.assertIsNotNone(cache.get("gen"))
@@ -0,0 +1,110 @@
+import time
+from unittest.mock import patch
+
+import fakeredis
+from django.test import SimpleTestCase
+
+from gardn.invalidation import _Invalidations
+from gardn.l1_cache import L1RedisCache, key_family
+
+
+def _worker(**options):
+    """A cache backend as one gunicorn worker would hold it; all of them share the fake Redis."""
+    return L1RedisCache("redis://localhost:6379/1", {
+        "OPTIONS": {
+            "connection_class": fakeredis.FakeConnection,
+            "L1_FAMILIES": ["svg", "identity"],
+            **options,
+        },
+    })
+
+
+def _wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+class L1CacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = _worker()
+        self.cache.clear()
+
+    def test_key_family(self):
+        self.assertEqual(key_family("svg-gen:v3:alice"), "svg-gen")
+        self.assertEqual(key_family("django.contrib.sessions.cacheabc"), "other")
+
+    def test_second_read_served_locally(self):
+        self.cache.set("svg:v1:alice:0", "<svg/>")
+        self.assertEqual(self.cache.get("svg:v1:alice:0"), "<svg/>")
+        self.cache._cache.get_client(write=True).delete(self.cache.make_and_validate_key("svg:v1:alice:0"))
+        self.assertEqual(self.cache.get("svg:v1:alice:0"), "<svg/>")
+        stats = self.cache.l1_stats()["svg"]
+        self.assertEqual((stats.l1_hits, stats.redis_hits, stats.misses), (1, 1, 0))
+
+    def test_other_families_always_read_redis(self):
+        self.cache.set("lock:svg:alice", "token")
+        self.cache.get("lock:svg:alice")
+        self.assertEqual(len(self.cache._lru), 0)
+        self.assertEqual(self.cache.l1_stats()["lock"].redis_hits, 1)
+
+    def test_get_many_mixes_tiers(self):
+        self.cache.set_many({"svg:a": 1, "svg:b": 2, "lock:c": 3})
+        self.cache.get("svg:a")
+        self.assertEqual(
+            self.cache.get_many(["svg:a", "svg:b", "lock:c", "svg:missing"]),
+            {"svg:a": 1, "svg:b": 2, "lock:c": 3},
+        )
+        stats = self.cache.l1_stats()["svg"]
+        self.assertEqual((stats.l1_hits, stats.redis_hits, stats.misses), (1, 2, 1))
+        self.assertAlmostEqual(stats.hit_ratio, 0.75)
+
+    def test_local_copy_expires(self):
+        cache = _worker(L1_TIMEOUT=0)
+        cache.set("svg:a", 1)
+        cache.get("svg:a")
+        cache.get("svg:a")
+        self.assertEqual(cache.l1_stats()["svg"].l1_hits, 0)
+
+    def test_memory_cap_evicts_least_recently_used(self):
+        cache = _worker(L1_MAX_BYTES=200)
+        cache.set_many({"svg:a": "x" * 60, "svg:b": "y" * 60, "svg:c": "z" * 60})
+        cache.get("svg:a")
+        cache.get("svg:b")
+        cache.get("svg:a")
+        cache.get("svg:c")
+        self.assertLessEqual(cache._lru.size, 200)
+        self.assertEqual(list(cache._lru._entries), [cache.make_and_validate_key(k) for k in ("svg:a", "svg:c")])
+
+    def test_write_in_one_worker_drops_copy_in_another(self):
+        other = _worker()
+        self.cache.set("identity:v1:alice", ("alice", 1))
+        self.assertEqual(other.get("identity:v1:alice"), ("alice", 1))
+        _wait_until(lambda: other._listener_pid is not None)
+        time.sleep(0.1)  # let the listener subscribe
+
+        self.cache.set("identity:v1:alice", ("alice", 2))
+        _wait_until(lambda: other.get("identity:v1:alice") == ("alice", 2))
+        self.cache.delete("identity:v1:alice")
+        _wait_until(lambda: other.get("identity:v1:alice") is None)
+
+    def test_read_racing_an_invalidation_is_not_kept(self):
+        self.cache.set("svg:a", "old")
+        _, epoch = self.cache._lookup([])
+        self.cache._drop([self.cache.make_and_validate_key("svg:a")])
+        self.assertEqual(self.cache._fetch([self.cache.make_and_validate_key("svg:a")], epoch), {
+            self.cache.make_and_validate_key("svg:a"): "old",
+        })
+        self.assertEqual(len(self.cache._lru), 0)
+
+    def test_raw_pipeline_writes_are_broadcast(self):
+        other = _worker()
+        self.cache.set("svg:gen", 1)
+        other.get("svg:gen")
+        time.sleep(0.1)
+        with patch("gardn.invalidation.cache", self.cache), patch("gardn.redis_client.cache", self.cache):
+            _Invalidations(bumps={"svg:gen"}).flush()
+        _wait_until(lambda: other.get("svg:gen") == 2)
+
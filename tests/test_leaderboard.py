@@ -0,0 +1,106 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from picks.leaderboard import rebuild_leaderboard, top_picked
+from picks.models import Pick
+from plants.models import UserIdentity
+from plants.views import _popular_identities
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.a = UserIdentity.objects.create(me_url="https://a.example/", username="a")
+        self.b = UserIdentity.objects.create(me_url="https://b.example/", username="b")
+        self.c = UserIdentity.objects.create(me_url="https://c.example/", username="c")
+
+    def _login(self, identity):
+        session = self.client.session
+        session["identity_id"] = identity.id
+        session.save()
+
+    def test_missing_set_reports_none(self):
+        self.assertIsNone(top_picked(12))
+
+    def test_empty_rebuild_still_counts_as_built(self):
+        self.assertEqual(rebuild_leaderboard(), 0)
+        self.assertEqual(top_picked(12), [])
+
+    def test_pick_and_unpick_maintain_scores(self):
+        rebuild_leaderboard()
+        self._login(self.a)
+        self.client.post("/pick/c/")
+        self.client.post("/pick/b/")
+        self._login(self.b)
+        self.client.post("/pick/c/")
+        self.assertEqual(top_picked(12), [(self.c.id, 2), (self.b.id, 1)])
+
+        self._login(self.a)
+        self.client.post("/unpick/b/")
+        self.assertEqual(top_picked(12), [(self.c.id, 2)])
+
+    def test_unbuilt_set_is_not_partially_populated(self):
+        self._login(self.a)
+        self.client.post("/pick/b/")
+        self.assertIsNone(top_picked(12))
+
+    def test_account_deletion_removes_given_picks(self):
+        rebuild_leaderboard()
+        self._login(self.a)
+        self.client.post("/pick/b/")
+        self.client.post("/pick/c/")
+        self._login(self.c)
+        self.client.post("/pick/a/")
+
+        self._login(self.a)
+        self.client.post("/settings/account/delete/")
+
+        self.assertEqual(top_picked(12), [])
+
+    def test_mastodon_merge_moves_score_to_survivor(self):
+        mastodon = UserIdentity.objects.create(
+            me_url="https://mastodon.example/@c", username="mastodon-example-c",
+            login_method="mastodon", mastodon_profile_url="https://mastodon.example/@c",
+        )
+        Pick.objects.create(picker=self.a, picked=mastodon)
+        Pick.objects.create(picker=self.b, picked=self.c)
+        call_command("reconcile_counters", stdout=StringIO())
+        rebuild_leaderboard()
+
+        self._login(mastodon)
+        with patch("mastodon_auth.views.check_website_link", return_value=True):
+            self.client.post("/mastodon/verify-website/", {"website_url": "https://c.example/"})
+
+        self.assertEqual(top_picked(12), [(self.c.id, 2)])
+
+    def test_rebuild_matches_counters(self):
+        Pick.objects.create(picker=self.a, picked=self.c)
+        Pick.objects.create(picker=self.b, picked=self.c)
+        Pick.objects.create(picker=self.c, picked=self.a)
+        call_command("reconcile_counters", stdout=StringIO())
+
+        out = StringIO()
+        call_command("rebuild_leaderboard", stdout=out)
+
+        self.assertIn("2 picked gardens", out.getvalue())
+        self.assertEqual(top_picked(1), [(self.c.id, 2)])
+
+    def test_popular_reads_leaderboard_when_built(self):
+        UserIdentity.objects.filter(id=self.b.id).update(incoming_pick_count=3)
+        rebuild_leaderboard()
+        with CaptureQueriesContext(connection) as ctx:
+            popular = _popular_identities()
+        self.assertEqual([(p.username, p.pick_count) for p in popular], [("b", 3)])
+        self.assertNotIn("order by", ctx.captured_queries[0]["sql"].lower())
+
+    def test_popular_falls_back_to_sql_without_leaderboard(self):
+        UserIdentity.objects.filter(id=self.b.id).update(incoming_pick_count=3)
+        UserIdentity.objects.filter(id=self.c.id).update(incoming_pick_count=5)
+        popular = _popular_identities()
+        self.assertEqual([(p.username, p.pick_count) for p in popular], [("c", 5), ("b", 3)])
@@ -0,0 +1,84 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from harvests.models import Harvest
+from picks.models import Pick
+from plants.models import UserIdentity
+from plants.page_cache import page_generation
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = UserIdentity.objects.create(
+            me_url="https://alice.example/", username="alice", display_name="Alice", show_harvests_on_profile=True,
+        )
+        self.bob = UserIdentity.objects.create(me_url="https://bob.example/", username="bob")
+
+    def _login(self, identity):
+        session = self.client.session
+        session["identity_id"] = identity.id
+        session.save()
+
+    def test_anonymous_pages_served_without_queries(self):
+        for url in ("/", "/u/alice/", "/u/alice/?picks_page=2"):
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                second = self.client.get(url)
+            self.assertEqual(second.content, first.content)
+
+    def test_other_query_strings_skip_the_cache(self):
+        self.client.get("/")
+        with self.assertNumQueries(1):  # the search itself
+            self.assertEqual(self.client.get("/", {"q": "ali"}).status_code, 200)
+
+    def test_unknown_profile_not_cached(self):
+        self.assertEqual(self.client.get("/u/nobody/").status_code, 404)
+        with self.captureOnCommitCallbacks(execute=True):
+            UserIdentity.objects.create(me_url="https://nobody.example/", username="nobody")
+        self.assertEqual(self.client.get("/u/nobody/").status_code, 200)
+
+    def test_signed_in_viewer_never_gets_the_anonymous_page(self):
+        self.client.get("/u/alice/")
+        self._login(self.bob)
+        response = self.client.get("/u/alice/")
+        self.assertContains(response, 'action="/pick/alice/"')
+        self.assertNotContains(response, "Login to pick")
+
+    def test_pick_retires_both_profiles(self):
+        self.client.get("/u/alice/")
+        self.client.get("/u/bob/")
+        self._login(self.bob)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/pick/alice/")
+        self.assertGreater(page_generation("alice"), 0)
+        self.assertGreater(page_generation("bob"), 0)
+
+        self.client.logout()
+        self.assertContains(self.client.get("/u/alice/"), "Picks: 1")
+        self.assertContains(self.client.get("/u/bob/"), "Alice")
+
+    def test_harvest_edit_retires_profile(self):
+        harvest = Harvest.objects.create(identity=self.alice, url="https://example.com/a", title="Old title")
+        self.assertContains(self.client.get("/u/alice/"), "Old title")
+        self._login(self.alice)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/harvest/{harvest.id}/edit/", {"title": "New title"})
+        self.client.logout()
+        self.assertContains(self.client.get("/u/alice/"), "New title")
+
+    def test_profile_save_retires_profile(self):
+        self.client.get("/u/alice/")
+        self.alice.display_name = "Alice B."
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alice.save(update_fields=["display_name"])
+        self.assertContains(self.client.get("/u/alice/"), "Alice B.")
+
+    def test_signed_in_viewer_reuses_public_fragments(self):
+        Pick.objects.create(picker=self.alice, picked=self.bob)
+        self._login(self.bob)
+        self.client.get("/u/alice/")
+        with self.assertNumQueries(3):  # viewer, alice, has_picked
+            response = self.client.get("/u/alice/")
+        self.assertContains(response, "Alice's picks (1)")
+        self.assertContains(response, 'action="/pick/alice/"')
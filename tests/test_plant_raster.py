@@ -0,0 +1,115 @@
+import os
+from unittest import skipUnless
+from unittest.mock import MagicMock, patch
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase
+
+from plants import svg_raster
+from plants.models import UserIdentity
+from plants.svg_cache import invalidate_svg
+
+FAKE_PNG = b"\x89PNG\r\n\x1a\nplant"
+# CI installs the raster extra and libcairo, so a missing renderer fails there instead of skipping.
+RASTER_REQUIRED = bool(os.environ.get("CI"))
+
+
+class PlantRasterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.identity = UserIdentity.objects.create(me_url="https://alice.example/", username="alice")
+        cairo = MagicMock()
+        cairo.svg2png.return_value = FAKE_PNG
+        patcher = patch.object(svg_raster, "cairosvg", cairo)
+        self.cairosvg = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _first_png(self, **params):
+        response = self.client.get("/u/alice/plant.png", params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_png_drawn_from_served_svg(self):
+        svg = self.client.get("/u/alice/plant.svg")
+        response = self._first_png()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertEqual(response.content, FAKE_PNG)
+        self.assertEqual(response["ETag"], f'{svg["ETag"][:-1]}-png"')
+        self.assertEqual(response["Last-Modified"], svg["Last-Modified"])
+        self.cairosvg.svg2png.assert_called_once_with(
+            bytestring=svg.content, output_width=600, output_height=480,
+        )
+
+    def test_thumb_size(self):
+        self._first_png(size="thumb")
+        _, kwargs = self.cairosvg.svg2png.call_args
+        self.assertEqual((kwargs["output_width"], kwargs["output_height"]), (240, 192))
+
+    def test_served_from_cache_and_revalidated_without_queries(self):
+        first = self._first_png()
+        second = self.client.get("/u/alice/plant.png")
+        self.assertEqual(self.cairosvg.svg2png.call_count, 1)
+        self.assertEqual(second["ETag"], first["ETag"])
+        with self.assertNumQueries(0):
+            response = self.client.get("/u/alice/plant.png", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_follows_svg_invalidation(self):
+        first = self._first_png()
+        UserIdentity.objects.filter(pk=self.identity.pk).update(animate_plant_motion=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_svg("alice")
+        # The previous raster is served while first the SVG and then the raster are redrawn.
+        for _ in range(2):
+            self.assertEqual(self.client.get("/u/alice/plant.png")["ETag"], first["ETag"])
+        latest = self.client.get("/u/alice/plant.png")
+        self.assertNotEqual(latest["ETag"], first["ETag"])
+        self.assertEqual(self.cairosvg.svg2png.call_count, 2)
+
+    def test_first_request_draws_inline(self):
+        # A link-preview crawler fetches og:image once and does not retry.
+        with patch("plants.tasks.render_plant_raster.delay") as mock_delay:
+            response = self.client.get("/u/alice/plant.png")
+        mock_delay.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, FAKE_PNG)
+        self.cairosvg.svg2png.assert_called_once()
+
+    def test_changed_plant_never_rasterizes_in_request(self):
+        first = self._first_png()
+        UserIdentity.objects.filter(pk=self.identity.pk).update(animate_plant_motion=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_svg("alice")
+        self.client.get("/u/alice/plant.svg")  # the new SVG is current, its raster is not
+        with patch("plants.tasks.render_plant_raster.delay") as mock_delay, \
+                patch("gardn.cache.time.sleep", side_effect=AssertionError("request waited")):
+            response = self.client.get("/u/alice/plant.png")
+        mock_delay.assert_called_once()
+        self.assertEqual(self.cairosvg.svg2png.call_count, 1)
+        self.assertEqual(response["ETag"], first["ETag"])
+
+    def test_profile_advertises_og_image(self):
+        response = self.client.get("/u/alice/")
+        self.assertContains(response, f'<meta property="og:image" content="{settings.PUBLIC_BASE_URL}/u/alice/plant.png">')
+        self.assertContains(response, '<meta property="og:image:width" content="600">')
+
+    def test_og_url_drops_the_query_string(self):
+        response = self.client.get("/u/alice/", {"picks_page": "2", "utm_source": "x"})
+        self.assertContains(response, f'<meta property="og:url" content="{settings.PUBLIC_BASE_URL}/u/alice/">')
+
+    def test_unavailable_without_cairosvg(self):
+        with patch.object(svg_raster, "cairosvg", None):
+            self.assertEqual(self.client.get("/u/alice/plant.png").status_code, 404)
+            self.assertNotContains(self.client.get("/u/alice/"), "og:image")
+
+
+@skipUnless(svg_raster.raster_available() or RASTER_REQUIRED, "the raster extra or libcairo is not installed")
+class PlantRasterPixelTests(TestCase):
+    def test_webp_is_a_webp(self):
+        cache.clear()
+        UserIdentity.objects.create(me_url="https://alice.example/", username="alice")
+        response = self.client.get("/u/alice/plant.webp")
+        self.assertEqual(response["Content-Type"], "image/webp")
+        self.assertEqual(response.content[8:12], b"WEBP")
@@ -0,0 +1,116 @@
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from gardn.middleware import IdentityMiddleware
+from picks.models import Pick
+from plants.identity_cache import _record, session_identity_cache_key
+from plants.models import UserIdentity
+
+
+class RequestIdentityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = UserIdentity.objects.create(me_url="https://alice.example/", username="alice")
+        self.bob = UserIdentity.objects.create(me_url="https://bob.example/", username="bob")
+        Pick.objects.create(picker=self.alice, picked=self.bob)
+
+    def _login(self, identity: UserIdentity) -> None:
+        session = self.client.session
+        session["identity_id"] = identity.id
+        session.save()
+
+    def _warm(self, url: str, **headers) -> None:
+        self.client.get(url, **headers)  # fills the username cache
+
+    def test_identity_resolved_lazily_and_once(self):
+        request = RequestFactory().get("/")
+        request.session = {"identity_id": self.alice.id}
+        seen = []
+        middleware = IdentityMiddleware(lambda req: seen.append(req.identity.username) or HttpResponse())
+        with self.assertNumQueries(1):
+            middleware(request)
+            self.assertEqual(request.identity.id, self.alice.id)
+        self.assertEqual(seen, ["alice"])
+
+        anonymous = RequestFactory().get("/")
+        anonymous.session = {}
+        with self.assertNumQueries(0):
+            IdentityMiddleware(lambda req: HttpResponse())(anonymous)
+            self.assertFalse(anonymous.identity)
+
+    def test_embed_plant_own_page(self):
+        self._login(self.alice)
+        self._warm("/embed/alice/plant/")
+        with self.assertNumQueries(2):  # viewer, has_picked
+            response = self.client.get("/embed/alice/plant/")
+        self.assertEqual(response.status_code, 200)
+
+    def test_embed_plant_anonymous(self):
+        self._warm("/embed/alice/plant/", HTTP_REFERER="https://alice.example/")
+        with self.assertNumQueries(1):  # the identity row, for its pick count
+            response = self.client.get("/embed/alice/plant/", HTTP_REFERER="https://alice.example/")
+        self.assertEqual(response.status_code, 200)
+
+    def test_plant_json_signed_in(self):
+        self._login(self.alice)
+        self._warm("/api/alice/plant.json")
+        with self.assertNumQueries(2):  # viewer, has_picked
+            response = self.client.get("/api/alice/plant.json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_embed_roll_signed_in(self):
+        self._login(self.alice)
+        self._warm("/embed/alice/roll/")
+        with self.assertNumQueries(1):  # viewer (for embed_allowed); the picks grid is a cached fragment
+            response = self.client.get("/embed/alice/roll/")
+        self.assertEqual(response.status_code, 200)
+
+    def test_profile_of_someone_else(self):
+        self._login(self.alice)
+        self._warm("/u/bob/")
+        with self.assertNumQueries(3):  # viewer, bob, has_picked; the picks list is a cached fragment
+            response = self.client.get("/u/bob/")
+        self.assertEqual(response.status_code, 200)
+
+    def test_profile_anonymous(self):
+        self._warm("/u/alice/")
+        with self.assertNumQueries(0):  # the whole page comes from the page cache
+            response = self.client.get("/u/alice/")
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(REQUEST_IDENTITY_CACHE_TIMEOUT=30)
+    def test_cached_viewer_skips_query_until_saved(self):
+        self._login(self.alice)
+        self._warm("/embed/alice/roll/")
+        with self.assertNumQueries(0):
+            self.client.get("/embed/alice/roll/")
+        self.alice.display_name = "Alice"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alice.save(update_fields=["display_name"])
+        with self.assertNumQueries(2):  # the save evicted both alice's username record and the viewer
+            self.client.get("/embed/alice/roll/")
+
+    @override_settings(REQUEST_IDENTITY_CACHE_TIMEOUT=30)
+    def test_cached_viewer_keeps_only_the_record(self):
+        self.alice.mastodon_access_token = "secret-token"
+        self.alice.save(update_fields=["mastodon_access_token"])
+        self._login(self.alice)
+        self.client.get("/embed/alice/roll/")
+        cached = cache.get(session_identity_cache_key(self.alice.id))
+        self.assertEqual(cached, _record(self.alice))
+        self.assertNotIn("secret-token", cached)
+
+        with self.assertNumQueries(3):  # the row, as the counters are not in the record; then the picks list
+            response = self.client.get("/dashboard/")
+        self.assertContains(response, "alice")
+
+    @override_settings(REQUEST_IDENTITY_CACHE_TIMEOUT=30)
+    def test_cached_viewer_whose_row_is_gone_is_signed_out(self):
+        self._login(self.alice)
+        self.client.get("/embed/alice/roll/")
+        UserIdentity.objects.filter(pk=self.alice.pk).delete()  # its on_commit eviction never runs here
+
+        response = self.client.get("/dashboard/")
+        self.assertRedirects(response, "/dashboard/", fetch_redirect_response=False)
+        self.assertNotIn("identity_id", self.client.session)
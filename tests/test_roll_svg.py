@@ -0,0 +1,101 @@
+import xml.etree.ElementTree as ET
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase
+
+from picks.models import Pick
+from plants.models import UserIdentity
+from plants.svg import generate_thumb_svg
+from plants.svg_cache import invalidate_svg
+
+SVG_NS = "{http://www.w3.org/2000/svg}"
+
+
+class RollSvgTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = UserIdentity.objects.create(me_url="https://owner.example/", username="owner")
+        self.picked = [
+            UserIdentity.objects.create(me_url=f"https://p{i}.example/", username=f"p{i}") for i in range(3)
+        ]
+        for identity in self.picked:
+            Pick.objects.create(picker=self.owner, picked=identity)
+        self.url = f"/u/{self.owner.username}/roll.svg"
+        # As the profile page's <use> requests it.
+        self.client.defaults["HTTP_REFERER"] = f"{settings.PUBLIC_BASE_URL}/u/{self.owner.username}/"
+
+    def _symbols(self, response):
+        return sorted(s.get("id") for s in ET.fromstring(response.content).findall(f"{SVG_NS}symbol"))
+
+    def test_sprite_holds_one_symbol_per_pick(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/svg+xml")
+        self.assertNotIn("Access-Control-Allow-Origin", response)
+        self.assertEqual(self._symbols(response), ["plant-p0", "plant-p1", "plant-p2"])
+        self.assertNotIn(b"<filter", response.content)
+
+    def test_sprite_holds_one_page_of_picks(self):
+        for i in range(3, 26):
+            identity = UserIdentity.objects.create(me_url=f"https://p{i}.example/", username=f"p{i}")
+            Pick.objects.create(picker=self.owner, picked=identity)
+        newest_first = [f"plant-p{i}" for i in range(25, -1, -1)]
+        self.assertEqual(self._symbols(self.client.get(self.url)), sorted(newest_first[:24]))
+        self.assertEqual(self._symbols(self.client.get(self.url, {"page": 2})), sorted(newest_first[24:]))
+
+        profile = self.client.get(f"/u/{self.owner.username}/", {"picks_page": 2})
+        self.assertContains(profile, f'href="{self.url}?page=2#plant-p0"')
+        embed = self.client.get(f"/embed/{self.owner.username}/roll/", HTTP_REFERER="https://owner.example/")
+        self.assertContains(embed, f'href="{self.url}#plant-p25"')
+        self.assertContains(embed, 'src="/u/p0/plant.svg?size=thumb"')
+
+    def test_sprite_follows_the_embed_domain_rules(self):
+        del self.client.defaults["HTTP_REFERER"]
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.assertEqual(self.client.get(self.url, HTTP_REFERER="https://evil.example/").status_code, 403)
+        response = self.client.get(self.url, HTTP_ORIGIN="https://owner.example")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Access-Control-Allow-Origin"], "https://owner.example")
+        self.assertIn("Origin", response["Vary"])
+        self.assertIn("Referer", response["Vary"])
+
+    def test_sprite_served_from_cache(self):
+        first = self.client.get(self.url)
+        with patch("plants.svg_cache.generate_thumb_svg") as mock_generate:
+            second = self.client.get(self.url)
+        mock_generate.assert_not_called()
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_sprite_reuses_cached_thumbs(self):
+        for identity in self.picked:
+            self.client.get(f"/u/{identity.username}/plant.svg", {"size": "thumb"})
+        with patch("plants.svg_cache.generate_thumb_svg") as mock_generate:
+            self.client.get(self.url)
+        mock_generate.assert_not_called()
+
+    def test_pick_moves_roll_to_new_sprite(self):
+        self.client.get(self.url)
+        extra = UserIdentity.objects.create(me_url="https://extra.example/", username="extra")
+        Pick.objects.create(picker=self.owner, picked=extra)
+        response = self.client.get(self.url)
+        self.assertIn(b'id="plant-extra"', response.content)
+
+    def test_invalidating_a_picked_plant_rerenders_the_roll(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_svg(self.picked[0].username)
+        with patch("plants.svg_cache.generate_thumb_svg", wraps=generate_thumb_svg) as mock_generate:
+            self.client.get(self.url)
+        mock_generate.assert_called()
+
+    def test_embed_roll_uses_sprite(self):
+        session = self.client.session
+        session["identity_id"] = self.owner.id
+        session.save()
+        response = self.client.get(f"/embed/{self.owner.username}/roll/")
+        self.assertContains(response, f'href="{self.url}#plant-p0"')
+        data = self.client.get(f"/api/{self.owner.username}/roll.json").json()
+        self.assertTrue(data["roll_svg_url"].endswith(self.url))
@@ -0,0 +1,88 @@
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+
+from plants.cards import GardenCard
+from plants.models import UserIdentity
+from plants.search import SEARCH_POPULAR_AFTER, _ranked, normalize_query, search_cache_key, search_identities
+
+
+class IdentitySearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for username, display_name in [
+            ("rosemary", "Rose Mary"),
+            ("rose", ""),
+            ("primrose", "Prim"),
+            ("alice", "Rosa Alice"),
+        ]:
+            UserIdentity.objects.create(
+                me_url=f"https://{username}.example/", username=username, display_name=display_name,
+            )
+
+    def test_exact_then_prefix_then_contains(self):
+        usernames = [card.username for card in search_identities("Rose")]
+        self.assertEqual(usernames[:2], ["rose", "rosemary"])
+        self.assertEqual(set(usernames[2:]), {"primrose"})
+
+    def test_display_name_matches(self):
+        self.assertEqual(search_identities("rosa alice"), [GardenCard("alice", "Rosa Alice", "https://alice.example/")])
+
+    def test_blank_query(self):
+        self.assertEqual(search_identities("   "), [])
+
+    def test_normalized_query(self):
+        self.assertEqual(normalize_query("  Rose   MARY "), "rose mary")
+
+    def test_popular_queries_are_cached(self):
+        for _ in range(SEARCH_POPULAR_AFTER - 1):
+            search_identities("rose")
+        self.assertIsNone(cache.get(search_cache_key("rose")))
+        expected = search_identities("ROSE ")
+        self.assertIsNotNone(cache.get(search_cache_key("rose")))
+        with self.assertNumQueries(0):
+            self.assertEqual(search_identities("rose"), expected)
+
+    def test_rare_queries_are_not_cached(self):
+        search_identities("prim")
+        self.assertIsNone(cache.get(search_cache_key("prim")))
+
+    def test_home_renders_ranked_results(self):
+        response = self.client.get("/", {"q": "rose"})
+        self.assertEqual(
+            [card.username for card in response.context["search_results"]][:2], ["rose", "rosemary"],
+        )
+
+
+@skipUnless(connection.vendor == "postgresql", "trigram indexes are Postgres-only")
+class IdentitySearchPlanTests(TestCase):
+    def setUp(self):
+        UserIdentity.objects.bulk_create(
+            UserIdentity(me_url=f"https://person-{i}.example/", username=f"person-{i}", display_name=f"Person {i}")
+            for i in range(200)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE plants_useridentity")
+            # The table is small enough that a scan would win on cost; ask whether the index can serve it at all.
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def test_extension_installed(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            self.assertIsNotNone(cursor.fetchone())
+
+    def test_search_uses_both_trigram_indexes(self):
+        plan = _ranked("son-1").explain()
+        self.assertIn("plants_identity_username_trgm", plan)
+        self.assertIn("plants_identity_display_name_trgm", plan)
+        self.assertNotIn("Seq Scan", plan)
+
+    def test_ranks_by_similarity(self):
+        UserIdentity.objects.create(me_url="https://prose.example/", username="prose")
+        UserIdentity.objects.create(me_url="https://rosebud.example/", username="xx-rosebud-xx")
+        usernames = [card.username for card in search_identities("roseb")]
+        self.assertEqual(usernames, ["xx-rosebud-xx"])
+        usernames = [card.username for card in search_identities("ose")]
+        self.assertEqual(usernames[0], "prose")
@@ -0,0 +1,70 @@
+import threading
+import time
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from gardn.cache import _Entry, get_or_compute, jittered
+
+
+class GetOrComputeTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_parallel_misses_compute_once(self):
+        calls = []
+        calls_lock = threading.Lock()
+        start = threading.Barrier(8)
+        results = []
+
+        def compute():
+            with calls_lock:
+                calls.append(1)
+            time.sleep(0.2)
+            return "fresh"
+
+        def worker():
+            start.wait()
+            results.append(get_or_compute("stampede:test", compute, 60))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["fresh"] * 8)
+
+    def test_stale_value_served_while_another_worker_recomputes(self):
+        cache.set("stampede:test", _Entry("old", time.time() - 1, 0.01), timeout=60)
+        cache.add("lock:stampede:test", "someone-else", timeout=30)
+
+        value = get_or_compute("stampede:test", lambda: "new", 60)
+
+        self.assertEqual(value, "old")
+
+    def test_expired_entry_recomputed_by_lock_holder(self):
+        cache.set("stampede:test", _Entry("old", time.time() - 1, 0.01), timeout=60)
+
+        self.assertEqual(get_or_compute("stampede:test", lambda: "new", 60), "new")
+        self.assertIsNone(cache.get("lock:stampede:test"))
+
+    def test_fresh_entry_refreshed_early_as_expiry_nears(self):
+        cache.set("stampede:test", _Entry("old", time.time() + 1, 5.0), timeout=60)
+        with patch("gardn.cache.random.random", return_value=0.99):
+            self.assertEqual(get_or_compute("stampede:test", lambda: "new", 60), "new")
+
+    def test_fresh_entry_kept_far_from_expiry(self):
+        cache.set("stampede:test", _Entry("old", time.time() + 3600, 0.01), timeout=3600)
+        self.assertEqual(get_or_compute("stampede:test", lambda: "new", 60), "old")
+
+    def test_plain_values_are_served_as_is(self):
+        cache.set("stampede:test", ["raw"], timeout=60)
+        self.assertEqual(get_or_compute("stampede:test", lambda: ["new"], 60), ["raw"])
+
+    def test_jittered_stays_within_bounds(self):
+        for _ in range(200):
+            self.assertTrue(90 <= jittered(100) <= 110)
+        self.assertEqual(jittered(0), 0)
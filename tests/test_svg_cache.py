@@ -1,10 +1,25 @@
+import gzip
 from unittest.mock import patch
 
+import brotli
+
 from django.core.cache import cache
 from django.test import TestCase
 
+from gardn.cache import acquire_lock
 from plants.models import UserIdentity
-from plants.svg_cache import svg_cache_key
+from plants.svg_cache import (
+    IDENTITY,
+    SVG_ENCODINGS,
+    THUMB,
+    current_svg_meta,
+    invalidate_svg,
+    negotiate_svg_encoding,
+    svg_cache_key,
+    svg_generation,
+    svg_meta_key,
+    svg_render_lock_name,
+)
 
 
 class SvgCacheTests(TestCase):
@@ -21,14 +36,14 @@ class SvgCacheTests(TestCase):
 
     def test_svg_view_populates_cache(self):
         cache.delete(svg_cache_key(self.identity.username))
-        with patch("plants.views.generate_svg", return_value="<svg>test</svg>"):
+        with patch("plants.svg_cache.generate_svg", return_value="<svg>test</svg>"):
             response = self.client.get(f"/u/{self.identity.username}/plant.svg")
         self.assertEqual(response.status_code, 200)
         self.assertIsNotNone(cache.get(svg_cache_key(self.identity.username)))
 
     def test_svg_view_uses_cache(self):
         cache.set(svg_cache_key(self.identity.username), "<svg>from-cache</svg>", timeout=3600)
-        with patch("plants.views.generate_svg") as mock_generate:
+        with patch("plants.svg_cache.generate_svg") as mock_generate:
             response = self.client.get(f"/u/{self.identity.username}/plant.svg")
         mock_generate.assert_not_called()
         self.assertEqual(response.status_code, 200)
@@ -38,7 +53,8 @@ class SvgCacheTests(TestCase):
         from harvests.models import Harvest
         harvest = Harvest.objects.create(identity=self.identity, url="https://example.com/article")
         cache.set(svg_cache_key(self.identity.username), "<svg>stale</svg>", timeout=3600)
-        self.client.post(f"/harvest/{harvest.id}/delete/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/harvest/{harvest.id}/delete/")
         self.assertIsNone(cache.get(svg_cache_key(self.identity.username)))
 
     def test_pick_invalidates_svg_cache_for_both_users(self):
@@ -46,9 +62,202 @@ class SvgCacheTests(TestCase):
             me_url="https://other.com/",
             username="otheruser",
             display_name="Other User",
+            incoming_pick_count=2,
         )
+        UserIdentity.objects.filter(id=self.identity.id).update(outgoing_pick_count=2)
         cache.set(svg_cache_key(self.identity.username), "<svg>picker</svg>", timeout=3600)
         cache.set(svg_cache_key(other.username), "<svg>picked</svg>", timeout=3600)
-        self.client.post(f"/pick/{other.username}/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/pick/{other.username}/")
         self.assertIsNone(cache.get(svg_cache_key(self.identity.username)))
         self.assertIsNone(cache.get(svg_cache_key(other.username)))
+
+    def test_pick_invalidation_reads_the_written_counts(self):
+        other = UserIdentity.objects.create(
+            me_url="https://other.com/", username="otheruser", incoming_pick_count=2,
+        )
+        # A stale row (a concurrent pick landed after it was read) would put 0 -> 1 in one bucket.
+        stale = UserIdentity.objects.get(id=other.id)
+        stale.incoming_pick_count = 0
+        cache.set(svg_cache_key(other.username), "<svg>picked</svg>", timeout=3600)
+        with patch("picks.views.get_full_identity_or_404", return_value=stale), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/pick/{other.username}/")
+        self.assertIsNone(cache.get(svg_cache_key(other.username)))
+        self.assertEqual(stale.incoming_pick_count, 3)
+
+    def test_invalidation_bumps_generation_without_deleting(self):
+        old_key = svg_cache_key(self.identity.username)
+        cache.set(old_key, "<svg>old</svg>", timeout=3600)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_svg(self.identity.username)
+        self.assertGreater(svg_generation(self.identity.username), 0)
+        self.assertNotEqual(svg_cache_key(self.identity.username), old_key)
+        self.assertEqual(cache.get(old_key), "<svg>old</svg>")
+
+    def test_invalidated_svg_served_stale_while_rerendering(self):
+        with patch("plants.svg_cache.generate_svg", return_value="<svg>v1</svg>"):
+            self.client.get(f"/u/{self.identity.username}/plant.svg")
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_svg(self.identity.username)
+
+        with patch("plants.svg_cache.generate_svg", return_value="<svg>v2</svg>"):
+            response = self.client.get(f"/u/{self.identity.username}/plant.svg")
+        self.assertIn(b"v1", response.content)
+        # The eager task has already stored the new generation.
+        self.assertEqual(cache.get(svg_cache_key(self.identity.username)), "<svg>v2</svg>")
+        self.assertIsNone(cache.get(f"lock:{svg_render_lock_name(self.identity.username)}"))
+
+        response = self.client.get(f"/u/{self.identity.username}/plant.svg")
+        self.assertIn(b"v2", response.content)
+
+    def test_only_one_rerender_queued_per_user(self):
+        with patch("plants.svg_cache.generate_svg", return_value="<svg>v1</svg>"):
+            self.client.get(f"/u/{self.identity.username}/plant.svg")
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_svg(self.identity.username)
+        acquire_lock(svg_render_lock_name(self.identity.username))
+
+        with patch("plants.tasks.render_plant_svg.delay") as mock_delay:
+            response = self.client.get(f"/u/{self.identity.username}/plant.svg")
+        mock_delay.assert_not_called()
+        self.assertIn(b"v1", response.content)
+
+
+class SvgConditionalRequestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.identity = UserIdentity.objects.create(me_url="https://example.com/", username="testuser")
+        self.url = f"/u/{self.identity.username}/plant.svg"
+
+    def test_response_carries_validators(self):
+        response = self.client.get(self.url)
+        self.assertTrue(response["ETag"].startswith('"'))
+        self.assertIn("Last-Modified", response)
+
+    def test_matching_etag_answered_without_identity_query_or_body(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(0), patch("plants.svg_cache.cache.get", side_effect=AssertionError):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response["Cache-Control"], "public, max-age=3600")
+
+    def test_if_modified_since_answered_from_meta(self):
+        last_modified = self.client.get(self.url)["Last-Modified"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_invalidation_retires_stored_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_svg(self.identity.username)
+        self.assertIsNone(current_svg_meta(self.identity.username))
+        with patch("plants.svg_cache.generate_svg", return_value="<svg>new</svg>"):
+            # The stale copy is still what this request serves, so the client's copy is current.
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"<svg>new</svg>")
+
+    def test_mismatched_etag_gets_body(self):
+        self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"nope"')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.startswith(b"<svg"))
+
+
+class SvgEncodingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.identity = UserIdentity.objects.create(me_url="https://example.com/", username="testuser")
+        self.url = f"/u/{self.identity.username}/plant.svg"
+        self.raw = self.client.get(self.url).content
+
+    def test_negotiation_prefers_stored_codings(self):
+        self.assertEqual(negotiate_svg_encoding(""), IDENTITY)
+        self.assertEqual(negotiate_svg_encoding("gzip, deflate"), "gzip")
+        self.assertEqual(negotiate_svg_encoding("gzip;q=0, identity"), IDENTITY)
+        self.assertEqual(negotiate_svg_encoding("*"), SVG_ENCODINGS[0])
+
+    def test_gzip_variant_served_from_cache(self):
+        with patch("plants.svg_cache.gzip.compress", side_effect=AssertionError):
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(gzip.decompress(response.content), self.raw)
+        self.assertLess(len(response.content), len(self.raw) / 3)
+
+    def test_brotli_variant_preferred(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(brotli.decompress(response.content), self.raw)
+
+    def test_each_coding_has_its_own_etag(self):
+        plain = self.client.get(self.url)
+        zipped = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip;q=1, br;q=0")
+        self.assertNotIn("Content-Encoding", plain)
+        self.assertNotEqual(plain["ETag"], zipped["ETag"])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                self.url, HTTP_ACCEPT_ENCODING="gzip;q=1, br;q=0", HTTP_IF_NONE_MATCH=zipped["ETag"],
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=zipped["ETag"]).status_code, 200)
+
+    def test_etag_without_meta_matches_stored_render(self):
+        plain = self.client.get(self.url)
+        for accept_encoding in ("gzip;q=1, br;q=0", "br"):
+            expected = self.client.get(self.url, HTTP_ACCEPT_ENCODING=accept_encoding)["ETag"]
+            cache.delete(svg_meta_key(self.identity.username))
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING=accept_encoding)
+            self.assertEqual(response["ETag"], expected)
+            self.assertTrue(response["ETag"].startswith(plain["ETag"][:-1]))
+
+
+class SvgThumbTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.identity = UserIdentity.objects.create(me_url="https://example.com/", username="testuser")
+        self.url = f"/u/{self.identity.username}/plant.svg"
+
+    def test_thumb_cached_under_its_own_key(self):
+        full = self.client.get(self.url)
+        thumb = self.client.get(self.url, {"size": "thumb"})
+        self.assertEqual(thumb.status_code, 200)
+        self.assertIn(b";thumb-->", thumb.content)
+        self.assertNotIn(b"<filter", thumb.content)
+        self.assertNotEqual(full["ETag"], thumb["ETag"])
+        self.assertEqual(cache.get(svg_cache_key(self.identity.username, size=THUMB)), thumb.content.decode())
+        self.assertEqual(cache.get(svg_cache_key(self.identity.username)), full.content.decode())
+
+    def test_thumb_revalidation_uses_thumb_meta(self):
+        etag = self.client.get(self.url, {"size": "thumb"})["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {"size": "thumb"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_invalidation_retires_thumb_too(self):
+        self.client.get(self.url, {"size": "thumb"})
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_svg(self.identity.username)
+        self.assertIsNone(current_svg_meta(self.identity.username, THUMB))
+        self.assertIsNone(cache.get(svg_cache_key(self.identity.username, size=THUMB)))
+
+    def test_unknown_size_falls_back_to_full(self):
+        response = self.client.get(self.url, {"size": "huge"})
+        self.assertIn(b"motion:0", response.content)
+
+    def test_roll_json_links_thumbs(self):
+        other = UserIdentity.objects.create(me_url="https://other.example/", username="other")
+        from picks.models import Pick
+        Pick.objects.create(picker=self.identity, picked=other)
+        session = self.client.session
+        session["identity_id"] = self.identity.id
+        session.save()
+        response = self.client.get(f"/api/{self.identity.username}/roll.json")
+        self.assertTrue(response.json()["roll"][0]["plant_svg_url"].endswith("/u/other/plant.svg?size=thumb"))
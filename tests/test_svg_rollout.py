@@ -0,0 +1,153 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from plants.models import UserIdentity
+from plants.svg import generate_svgs
+from plants.svg_cache import (
+    THUMB,
+    SvgMeta,
+    current_svg_meta,
+    invalidate_svg,
+    rollout_is_live,
+    svg_cache_key,
+    svg_latest_key,
+    svg_meta_key,
+)
+from plants.svg_rollout import prerender_batch, reset_rollout, rollout_progress
+
+
+def _store_previous(username: str, body: str) -> None:
+    """What the previous deploy left in the cache for ``username``."""
+    cache.set_many(
+        {
+            svg_latest_key(username, version="v0"): body,
+            svg_meta_key(username, version="v0"): SvgMeta(0, '"old"', 1_700_000_000),
+        },
+        timeout=None,
+    )
+
+
+@override_settings(SVG_ROLLOUT_PREVIOUS_VERSION="v0", SVG_ROLLOUT_THRESHOLD=0.5)
+class SvgRolloutTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.quiet = UserIdentity.objects.create(me_url="https://quiet.example/", username="quiet")
+        self.popular = UserIdentity.objects.create(
+            me_url="https://popular.example/", username="popular", incoming_pick_count=5,
+        )
+        for identity in (self.quiet, self.popular):
+            _store_previous(identity.username, f"<svg>old {identity.username}</svg>")
+
+    def test_previous_version_served_until_flip(self):
+        with patch("plants.svg_cache.generate_svg") as mock_generate:
+            response = self.client.get("/u/quiet/plant.svg")
+        mock_generate.assert_not_called()
+        self.assertEqual(response.content, b"<svg>old quiet</svg>")
+        self.assertEqual(response["ETag"], '"old"')
+
+    def test_revalidation_answered_from_previous_meta(self):
+        self.assertEqual(current_svg_meta("quiet").etag, '"old"')
+        with self.assertNumQueries(0):
+            response = self.client.get("/u/quiet/plant.svg", HTTP_IF_NONE_MATCH='"old"')
+        self.assertEqual(response.status_code, 304)
+
+    def test_prerender_goes_most_picked_first_and_flips_at_threshold(self):
+        progress = prerender_batch(batch_size=1)
+        self.assertEqual((progress.claimed, progress.queued, progress.rendered), (1, 2, 1))
+        self.assertIsNotNone(cache.get(svg_cache_key("popular")))
+        self.assertIsNotNone(cache.get(svg_cache_key("popular", size=THUMB)))
+        self.assertIsNone(cache.get(svg_cache_key("quiet")))
+        self.assertTrue(rollout_is_live())
+
+        with patch("plants.svg_cache.generate_svg") as mock_generate:
+            popular = self.client.get("/u/popular/plant.svg")
+        mock_generate.assert_not_called()
+        self.assertIn(b"render:", popular.content)
+        # Not pre-rendered yet: the previous version stands in while the new one renders.
+        self.assertEqual(self.client.get("/u/quiet/plant.svg").content, b"<svg>old quiet</svg>")
+
+    def test_below_threshold_keeps_serving_previous(self):
+        with self.settings(SVG_ROLLOUT_THRESHOLD=0.9):
+            prerender_batch(batch_size=1)
+            self.assertFalse(rollout_is_live())
+            self.assertEqual(self.client.get("/u/popular/plant.svg").content, b"<svg>old popular</svg>")
+
+    def test_changed_plant_leaves_previous_version(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_svg("quiet")
+        self.assertIsNone(current_svg_meta("quiet"))
+        self.client.get("/u/quiet/plant.svg")  # stale copy; the eager task renders the new one
+        self.assertIn(b"render:", self.client.get("/u/quiet/plant.svg").content)
+
+    def test_command_runs_to_completion_and_reports(self):
+        out = StringIO()
+        call_command("svg_rollout", "--run", "--batch-size", "1", stdout=out)
+        output = out.getvalue()
+        self.assertIn("2/2 pre-rendered", output)
+        self.assertIn("rendered:        2/2 (100.0%)", output)
+        self.assertIn("serving:         v", output)
+        self.assertTrue(rollout_progress().done)
+        self.assertTrue(rollout_is_live())
+
+    def test_reordering_mid_rollout_neither_skips_nor_repeats(self):
+        prerender_batch(batch_size=1)
+        # quiet overtakes popular after the first batch; an offset into the
+        # live ordering would render popular again and never reach quiet.
+        UserIdentity.objects.filter(pk=self.quiet.pk).update(incoming_pick_count=9)
+        cache.delete(svg_cache_key("popular"))
+
+        with patch("plants.svg_rollout.generate_svgs", wraps=generate_svgs) as mock_generate:
+            progress = prerender_batch(batch_size=1)
+        self.assertEqual([spec.me_url for spec in mock_generate.call_args.args[0]], ["https://quiet.example/"])
+        self.assertTrue(progress.done)
+        self.assertIsNotNone(cache.get(svg_cache_key("quiet")))
+
+    def test_concurrent_batches_claim_disjoint_identities(self):
+        claimed = []
+        with patch("plants.svg_rollout.generate_svgs", wraps=generate_svgs) as mock_generate:
+            for _ in range(3):
+                prerender_batch(batch_size=1)
+        for call in mock_generate.call_args_list:
+            claimed.extend(spec.me_url for spec in call.args[0])
+        self.assertEqual(sorted(claimed), ["https://popular.example/", "https://quiet.example/"])
+
+    def test_expired_renders_do_not_stall_the_flip(self):
+        with self.settings(SVG_ROLLOUT_THRESHOLD=1.0):
+            prerender_batch(batch_size=1)
+            cache.delete(svg_cache_key("popular"))  # expired after SVG_CACHE_TIMEOUT on a long rollout
+            progress = prerender_batch(batch_size=1)
+        self.assertEqual(progress.coverage, 1.0)
+        self.assertTrue(rollout_is_live())
+
+    def test_batch_that_dies_before_storing_renders_nothing(self):
+        with patch("plants.svg_rollout.generate_svgs", side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            prerender_batch(batch_size=1)
+        progress = rollout_progress()
+        self.assertEqual((progress.claimed, progress.rendered), (1, 0))
+        self.assertFalse(rollout_is_live())
+
+    def test_reset_takes_a_new_snapshot(self):
+        prerender_batch(batch_size=2)
+        self.assertTrue(rollout_progress().done)
+        UserIdentity.objects.create(me_url="https://late.example/", username="late")
+
+        reset_rollout()
+        self.assertEqual(rollout_progress(), (3, 3, 0))
+        self.assertEqual(prerender_batch(batch_size=3), (3, 0, 3))
+
+    def test_flip_switches_every_plant_at_once(self):
+        call_command("svg_rollout", "--flip", stdout=StringIO())
+        self.assertTrue(rollout_is_live())
+        self.assertIsNone(current_svg_meta("quiet"))
+
+
+class SvgRolloutDisabledTests(TestCase):
+    def test_no_rollout_means_live(self):
+        self.assertTrue(rollout_is_live())
+        out = StringIO()
+        call_command("svg_rollout", stdout=out)
+        self.assertIn("no rollout configured", out.getvalue())
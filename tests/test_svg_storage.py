@@ -0,0 +1,95 @@
+from unittest.mock import patch
+
+import boto3
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from moto import mock_aws
+
+from gardn.settings import _get_plant_svg_storage
+from picks.models import Pick
+from plants.models import UserIdentity
+from plants.svg_cache import THUMB, invalidate_svg, svg_cache_key
+from plants.svg_storage import offloaded_svg_url, svg_object_name
+
+BUCKET = "gardn-test"
+
+
+@override_settings(
+    AWS_STORAGE_BUCKET_NAME=BUCKET,
+    AWS_S3_REGION_NAME="us-east-1",
+    STORAGES={**settings.STORAGES, "plant_svgs": _get_plant_svg_storage(BUCKET, True)},
+)
+class SvgOffloadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        mock = mock_aws()
+        mock.start()
+        self.addCleanup(mock.stop)
+        self.s3 = boto3.client("s3", region_name="us-east-1")
+        self.s3.create_bucket(Bucket=BUCKET)
+        self.identity = UserIdentity.objects.create(me_url="https://alice.example/", username="alice")
+
+    def _bucket_keys(self) -> list[str]:
+        return [item["Key"] for item in self.s3.list_objects_v2(Bucket=BUCKET).get("Contents", [])]
+
+    def test_render_is_uploaded_under_its_content_hash(self):
+        first = self.client.get("/u/alice/plant.svg")
+        self.assertEqual(first.status_code, 200)
+
+        name = f"plants/{svg_object_name(first.content.decode())}"
+        self.assertEqual(self._bucket_keys(), [name])
+        head = self.s3.head_object(Bucket=BUCKET, Key=name)
+        self.assertEqual(head["ContentType"], "image/svg+xml")
+        self.assertEqual(head["CacheControl"], "public, max-age=31536000, immutable")
+
+        second = self.client.get("/u/alice/plant.svg")
+        self.assertEqual(second.status_code, 302)
+        self.assertTrue(second["Location"].endswith(name))
+        self.assertEqual(second["Cache-Control"], "public, max-age=60")
+
+    def test_change_uploads_new_object_and_moves_redirect(self):
+        self.client.get("/u/alice/plant.svg")
+        before = offloaded_svg_url("alice")
+
+        UserIdentity.objects.filter(pk=self.identity.pk).update(harvest_count=40)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_svg("alice")
+
+        after = offloaded_svg_url("alice")
+        self.assertIsNotNone(after)
+        self.assertNotEqual(after, before)
+        self.assertEqual(len(self._bucket_keys()), 3)  # old full, new full, new thumb
+        self.assertEqual(self.client.get("/u/alice/plant.svg")["Location"], after)
+
+    def test_stale_upload_url_not_served(self):
+        self.client.get("/u/alice/plant.svg")
+        with patch("plants.tasks.regenerate_plant_svg.delay"), \
+                self.captureOnCommitCallbacks(execute=True):
+            invalidate_svg("alice")  # committed, but the regeneration has not run yet
+        self.assertIsNone(offloaded_svg_url("alice"))
+        self.assertEqual(self.client.get("/u/alice/plant.svg").status_code, 200)
+
+    def test_json_endpoints_link_bucket(self):
+        owner = UserIdentity.objects.create(me_url="https://owner.example/", username="owner")
+        Pick.objects.create(picker=owner, picked=self.identity)
+        self.client.get("/u/alice/plant.svg")
+        self.client.get("/u/alice/plant.svg", {"size": "thumb"})
+        self.assertIsNotNone(cache.get(svg_cache_key("alice", size=THUMB)))
+
+        plant = self.client.get("/api/alice/plant.json", HTTP_ORIGIN="https://alice.example").json()
+        self.assertEqual(plant["plant_svg_url"], offloaded_svg_url("alice"))
+        roll = self.client.get("/api/owner/roll.json", HTTP_ORIGIN="https://owner.example").json()
+        self.assertEqual(roll["roll"][0]["plant_svg_url"], offloaded_svg_url("alice", THUMB))
+
+
+class PlantSvgStorageSettingsTests(SimpleTestCase):
+    def test_needs_bucket_and_flag(self):
+        self.assertIsNone(_get_plant_svg_storage("", True))
+        self.assertIsNone(_get_plant_svg_storage("my-bucket", False))
+        storage = _get_plant_svg_storage("my-bucket", True)
+        self.assertEqual(storage["BACKEND"], "storages.backends.s3boto3.S3Boto3Storage")
+        self.assertFalse(storage["OPTIONS"]["querystring_auth"])
+
+    def test_offload_off_by_default(self):
+        self.assertNotIn("plant_svgs", settings.STORAGES)